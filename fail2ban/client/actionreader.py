@@ -41,6 +41,8 @@ class ActionReader(DefinitionInitConfigReader):
 		["string", "actioncheck", None],
 		["string", "actionban", None],
 		["string", "actionunban", None],
+		["string", "actionban_batch", None],
+		["string", "actionunban_batch", None],
 	]
 
 	def __init__(self, file_, jailName, initOpts, **kwargs):
@@ -77,6 +79,10 @@ class ActionReader(DefinitionInitConfigReader):
 				stream.append(head + ["actionban", self._opts[opt]])
 			elif opt == "actionunban":
 				stream.append(head + ["actionunban", self._opts[opt]])
+			elif opt == "actionban_batch":
+				stream.append(head + ["actionban_batch", self._opts[opt]])
+			elif opt == "actionunban_batch":
+				stream.append(head + ["actionunban_batch", self._opts[opt]])
 		if self._initOpts:
 			for p in self._initOpts:
 				stream.append(head + [p, self._initOpts[p]])
@@ -130,6 +130,8 @@ Report bugs to https://github.com/fail2ban/fail2ban/issues
 			   help="Raw hosts, don't resolve dns"),
 		Option("-L", "--maxlines", type=int, default=0,
 			   help="maxlines for multi-line regex"),
+		Option("--combine-regex", action='store_true',
+			   help="Search all failregex in a single pass (combineregex)"),
 		Option("-m", "--journalmatch",
 			   help="journalctl style matches overriding filter file. "
 			   "\"systemd-journal\" only"),
@@ -233,6 +235,8 @@ class Fail2banRegex(object):
 
 		if opts.maxlines:
 			self.setMaxLines(opts.maxlines)
+		if opts.combine_regex:
+			self._filter.setCombineRegex(True)
 		if opts.journalmatch is not None:
 			self.setJournalMatch(opts.journalmatch.split())
 		if opts.datepattern:
@@ -335,7 +339,7 @@ class Fail2banRegex(object):
 		return found
 
 	def testRegex(self, line, date=None):
-		orgLineBuffer = self._filter._Filter__lineBuffer
+		orgLineBuffer = list(self._filter._Filter__lineBuffer.getLines())
 		fullBuffer = len(orgLineBuffer) >= self._filter.getMaxLines()
 		try:
 			line, ret = self._filter.processLine(line, date, checkAllRegex=True, returnRawHost=self.raw)
@@ -353,7 +357,7 @@ class Fail2banRegex(object):
 			output( "Sorry, but no <HOST> found in regex" )
 			return False
 		for bufLine in orgLineBuffer[int(fullBuffer):]:
-			if bufLine not in self._filter._Filter__lineBuffer:
+			if bufLine not in self._filter._Filter__lineBuffer.getLines():
 				try:
 					self._line_stats.missed_lines.pop(
 						self._line_stats.missed_lines.index("".join(bufLine)))
@@ -478,7 +482,8 @@ class Fail2banRegex(object):
 
 		output( "\nLines: %s" % self._line_stats, )
 		if self._time_elapsed is not None:
-			output( "[processed in %.2f sec]" % self._time_elapsed, )
+			output( "[processed in %.2f sec, %d lines/sec]" % (self._time_elapsed,
+				self._line_stats.tested / max(self._time_elapsed, 1e-6)), )
 		output( "" )
 
 		if self._print_all_matched:
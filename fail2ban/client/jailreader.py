@@ -92,11 +92,16 @@ class JailReader(ConfigReader):
 		opts = [["bool", "enabled", False],
 				["string", "logpath", None],
 				["string", "logencoding", None],
+				["bool", "logkeepopen", None],
+				["bool", "logrotated", None],
+				["string", "logworkers", None],
 				["string", "backend", "auto"],
 				["int", "maxretry", None],
 				["int", "findtime", None],
 				["int", "bantime", None],
 				["string", "usedns", None],
+				["bool", "combineregex", None],
+				["int", "perfsample", None],
 				["string", "failregex", None],
 				["string", "ignoreregex", None],
 				["string", "ignorecommand", None],
@@ -204,6 +209,12 @@ class JailReader(ConfigReader):
 						"Have not found any log file for %s jail" % self.__name)
 			elif opt == "logencoding":
 				stream.append(["set", self.__name, "logencoding", self.__opts[opt]])
+			elif opt == "logkeepopen":
+				stream.append(["set", self.__name, "logkeepopen", self.__opts[opt]])
+			elif opt == "logrotated":
+				stream.append(["set", self.__name, "logrotated", self.__opts[opt]])
+			elif opt == "logworkers":
+				stream.append(["set", self.__name, "logworkers", self.__opts[opt]])
 			elif opt == "backend":
 				backend = self.__opts[opt]
 			elif opt == "maxretry":
@@ -217,6 +228,10 @@ class JailReader(ConfigReader):
 				stream.append(["set", self.__name, "bantime", self.__opts[opt]])
 			elif opt == "usedns":
 				stream.append(["set", self.__name, "usedns", self.__opts[opt]])
+			elif opt == "combineregex":
+				stream.append(["set", self.__name, "combineregex", self.__opts[opt]])
+			elif opt == "perfsample":
+				stream.append(["set", self.__name, "perfsample", self.__opts[opt]])
 			elif opt == "failregex":
 				for regex in self.__opts[opt].split('\n'):
 					# Do not send a command if the rule is empty.
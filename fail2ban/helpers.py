@@ -138,6 +138,14 @@ def splitwords(s):
 		return []
 	return filter(bool, map(str.strip, re.split('[ ,\n]+', s)))
 
+def _as_bool(val):
+	"""Helper to convert a boolean option value (bool or string) to bool
+
+	Strings like "1", "on", "true", "yes" are True, everything else False.
+	"""
+	return bool(val) if not isinstance(val, basestring) \
+		else val.lower() in ('1', 'on', 'true', 'yes')
+
 
 #
 # Following function used for parse options from parameter (e.g. `name[p1=0, p2="..."][p3='...']`).
@@ -62,11 +62,13 @@ protocol = [
 ["get dbfile", "get the location of fail2ban persistent datastore"], 
 ["set dbpurgeage <SECONDS>", "sets the max age in <SECONDS> that history of bans will be kept"], 
 ["get dbpurgeage", "gets the max age in seconds that history of bans will be kept"], 
+["set dblogcheckpoint <SECONDS>", "sets the interval in <SECONDS> the positions of log files are written to database in (0 - on each read)"], 
+["get dblogcheckpoint", "gets the interval in seconds the positions of log files are written to database in"], 
 ['', "JAIL CONTROL", ""],
 ["add <JAIL> <BACKEND>", "creates <JAIL> using <BACKEND>"], 
 ["start <JAIL>", "starts the jail <JAIL>"], 
 ["stop <JAIL>", "stops the jail <JAIL>. The jail is removed"], 
-["status <JAIL> [FLAVOR]", "gets the current status of <JAIL>, with optional flavor or extended info"],
+["status <JAIL> [FLAVOR]", "gets the current status of <JAIL>, with optional flavor or extended info (basic, cymru, perf)"],
 ['', "JAIL CONFIGURATION", ""],
 ["set <JAIL> idle on|off", "sets the idle state of <JAIL>"], 
 ["set <JAIL> addignoreip <IP>", "adds <IP> to the ignore list of <JAIL>"], 
@@ -74,6 +76,9 @@ protocol = [
 ["set <JAIL> addlogpath <FILE> ['tail']", "adds <FILE> to the monitoring list of <JAIL>, optionally starting at the 'tail' of the file (default 'head')."], 
 ["set <JAIL> dellogpath <FILE>", "removes <FILE> from the monitoring list of <JAIL>"],
 ["set <JAIL> logencoding <ENCODING>", "sets the <ENCODING> of the log files for <JAIL>"],
+["set <JAIL> logkeepopen <VALUE>", "enables/disables keeping the log files of <JAIL> open between the reads"],
+["set <JAIL> logrotated <VALUE>", "enables/disables reading of the rotated (also compressed) log files of <JAIL> back to findtime on the first read"],
+["set <JAIL> logworkers <VALUE>", "sets the count of worker threads catching up the backlog of the log files of <JAIL> on start (or auto)"],
 ["set <JAIL> addjournalmatch <MATCH>", "adds <MATCH> to the journal filter of <JAIL>"],
 ["set <JAIL> deljournalmatch <MATCH>", "removes <MATCH> from the journal filter of <JAIL>"],
 ["set <JAIL> addfailregex <REGEX>", "adds the regular expression <REGEX> which must match failures for <JAIL>"], 
@@ -85,10 +90,13 @@ protocol = [
 ["set <JAIL> bantime <TIME>", "sets the number of seconds <TIME> a host will be banned for <JAIL>"], 
 ["set <JAIL> datepattern <PATTERN>", "sets the <PATTERN> used to match date/times for <JAIL>"],
 ["set <JAIL> usedns <VALUE>", "sets the usedns mode for <JAIL>"],
+["set <JAIL> combineregex <VALUE>", "enables/disables searching of all failregex in a single pass for <JAIL>"],
 ["set <JAIL> banip <IP>", "manually Ban <IP> for <JAIL>"], 
 ["set <JAIL> unbanip <IP>", "manually Unban <IP> in <JAIL>"], 
 ["set <JAIL> maxretry <RETRY>", "sets the number of failures <RETRY> before banning the host for <JAIL>"], 
 ["set <JAIL> maxlines <LINES>", "sets the number of <LINES> to buffer for regex search for <JAIL>"], 
+["set <JAIL> perfsample <N>", "enables cost profiling of failregex, ignoreregex and date templates for <JAIL>, measuring time of each <N>-th call (0 disables, see 'status <JAIL> perf')"],
+["set <JAIL> resetperf", "resets the cost profiling statistics for <JAIL>"],
 ["set <JAIL> addaction <ACT>[ <PYTHONFILE> <JSONKWARGS>]", "adds a new action named <ACT> for <JAIL>. Optionally for a Python based action, a <PYTHONFILE> and <JSONKWARGS> can be specified, else will be a Command Action"], 
 ["set <JAIL> delaction <ACT>", "removes the action <ACT> from <JAIL>"], 
 ["", "COMMAND ACTION CONFIGURATION", ""],
@@ -97,6 +105,8 @@ protocol = [
 ["set <JAIL> action <ACT> actioncheck <CMD>", "sets the check command <CMD> of the action <ACT> for <JAIL>"], 
 ["set <JAIL> action <ACT> actionban <CMD>", "sets the ban command <CMD> of the action <ACT> for <JAIL>"],
 ["set <JAIL> action <ACT> actionunban <CMD>", "sets the unban command <CMD> of the action <ACT> for <JAIL>"], 
+["set <JAIL> action <ACT> actionban_batch <CMD>", "sets the command <CMD> of the action <ACT> for <JAIL> banning several IPs at once"],
+["set <JAIL> action <ACT> actionunban_batch <CMD>", "sets the command <CMD> of the action <ACT> for <JAIL> unbanning several IPs at once"],
 ["set <JAIL> action <ACT> timeout <TIMEOUT>", "sets <TIMEOUT> as the command timeout in seconds for the action <ACT> for <JAIL>"],
 ["", "GENERAL ACTION CONFIGURATION", ""],
 ["set <JAIL> action <ACT> <PROPERTY> <VALUE>", "sets the <VALUE> of <PROPERTY> for the action <ACT> for <JAIL>"],
@@ -104,6 +114,9 @@ protocol = [
 ['', "JAIL INFORMATION", ""],
 ["get <JAIL> logpath", "gets the list of the monitored files for <JAIL>"],
 ["get <JAIL> logencoding", "gets the encoding of the log files for <JAIL>"],
+["get <JAIL> logkeepopen", "gets the logkeepopen setting for <JAIL>"],
+["get <JAIL> logrotated", "gets the logrotated setting for <JAIL>"],
+["get <JAIL> logworkers", "gets the count of worker threads catching up the backlog for <JAIL>"],
 ["get <JAIL> journalmatch", "gets the journal filter match for <JAIL>"],
 ["get <JAIL> ignoreip", "gets the list of ignored IP addresses for <JAIL>"],
 ["get <JAIL> ignorecommand", "gets ignorecommand of <JAIL>"],
@@ -113,8 +126,10 @@ protocol = [
 ["get <JAIL> bantime", "gets the time a host is banned for <JAIL>"],
 ["get <JAIL> datepattern", "gets the patern used to match date/times for <JAIL>"],
 ["get <JAIL> usedns", "gets the usedns setting for <JAIL>"],
+["get <JAIL> combineregex", "gets the combineregex setting for <JAIL>"],
 ["get <JAIL> maxretry", "gets the number of failures allowed for <JAIL>"],
 ["get <JAIL> maxlines", "gets the number of lines to buffer for <JAIL>"],
+["get <JAIL> perfsample", "gets the sample rate of cost profiling for <JAIL>"],
 ["get <JAIL> actions", "gets a list of actions for <JAIL>"],
 ["", "COMMAND ACTION INFORMATION",""],
 ["get <JAIL> action <ACT> actionstart", "gets the start command for the action <ACT> for <JAIL>"],
@@ -122,6 +137,8 @@ protocol = [
 ["get <JAIL> action <ACT> actioncheck", "gets the check command for the action <ACT> for <JAIL>"],
 ["get <JAIL> action <ACT> actionban", "gets the ban command for the action <ACT> for <JAIL>"],
 ["get <JAIL> action <ACT> actionunban", "gets the unban command for the action <ACT> for <JAIL>"],
+["get <JAIL> action <ACT> actionban_batch", "gets the command banning several IPs at once for the action <ACT> for <JAIL>"],
+["get <JAIL> action <ACT> actionunban_batch", "gets the command unbanning several IPs at once for the action <ACT> for <JAIL>"],
 ["get <JAIL> action <ACT> timeout", "gets the command timeout in seconds for the action <ACT> for <JAIL>"],
 ["", "GENERAL ACTION INFORMATION", ""],
 ["get <JAIL> actionproperties <ACT>", "gets a list of properties for the action <ACT> for <JAIL>"],
@@ -119,6 +119,11 @@ class ActionBase(object):
 	- ban(aInfo)
 	- unban(aInfo)
 
+	Optionally, the methods `ban_many(aInfos)` and `unban_many(aInfos)`
+	can be implemented, to handle several tickets at once (raising
+	`NotImplementedError` or any failure of them lets each ticket be
+	handled by `ban`/`unban`).
+
 	Called when action is created, but before the jail/actions is
 	started. This should carry out necessary methods to initialise
 	the action but not "start" the action.
@@ -206,9 +211,11 @@ class CommandAction(ActionBase):
 	Attributes
 	----------
 	actionban
+	actionban_batch
 	actionstart
 	actionstop
 	actionunban
+	actionunban_batch
 	timeout
 	"""
 
@@ -223,6 +230,9 @@ class CommandAction(ActionBase):
 		self.actionban = ''
 		## Command executed when an IP address gets removed.
 		self.actionunban = ''
+		## Commands executed when several IP addresses get banned/removed at once.
+		self.actionban_batch = ''
+		self.actionunban_batch = ''
 		## Command executed in order to check requirements.
 		self.actioncheck = ''
 		## Command executed in order to stop the system.
@@ -309,6 +319,42 @@ class CommandAction(ActionBase):
 		if not self._processCmd(self.actionban, aInfo):
 			raise RuntimeError("Error banning %(ip)s" % aInfo)
 
+	@property
+	def actionban_batch(self):
+		"""The command used when several bans occur at once.
+
+		The tag `<ip>` is replaced with the space separated list of the
+		IP addresses, the tag `<count>` with their count. If empty (or
+		if it fails), the "actionban" command is executed for each IP
+		address.
+		"""
+		return self._actionban_batch
+
+	@actionban_batch.setter
+	def actionban_batch(self, value):
+		self._actionban_batch = value
+		self._logSys.debug("Set actionban_batch = %s" % value)
+
+	def ban_many(self, aInfos):
+		"""Executes the "actionban_batch" command.
+
+		Parameters
+		----------
+		aInfos : list of dict
+			Dictionaries which include information in relation to
+			each ban.
+
+		Raises
+		------
+		NotImplementedError
+			If no "actionban_batch" command is set.
+		"""
+		if not self.actionban_batch:
+			raise NotImplementedError("No actionban_batch command")
+		aInfo = self._batchInfo(aInfos)
+		if not self._processCmd(self.actionban_batch, aInfo):
+			raise RuntimeError("Error banning %(ip)s" % aInfo)
+
 	@property
 	def actionunban(self):
 		"""The command used when an unban occurs.
@@ -335,6 +381,49 @@ class CommandAction(ActionBase):
 		if not self._processCmd(self.actionunban, aInfo):
 			raise RuntimeError("Error unbanning %(ip)s" % aInfo)
 
+	@property
+	def actionunban_batch(self):
+		"""The command used when several bans expire at once.
+
+		The same tags as for "actionban_batch" are replaced. If empty,
+		the "actionunban" command is executed for each IP address.
+		"""
+		return self._actionunban_batch
+
+	@actionunban_batch.setter
+	def actionunban_batch(self, value):
+		self._actionunban_batch = value
+		self._logSys.debug("Set actionunban_batch = %s" % value)
+
+	def unban_many(self, aInfos):
+		"""Executes the "actionunban_batch" command.
+
+		Parameters
+		----------
+		aInfos : list of dict
+			Dictionaries which include information in relation to
+			each ban.
+
+		Raises
+		------
+		NotImplementedError
+			If no "actionunban_batch" command is set.
+		"""
+		if not self.actionunban_batch:
+			raise NotImplementedError("No actionunban_batch command")
+		aInfo = self._batchInfo(aInfos)
+		if not self._processCmd(self.actionunban_batch, aInfo):
+			raise RuntimeError("Error unbanning %(ip)s" % aInfo)
+
+	@staticmethod
+	def _batchInfo(aInfos):
+		"""Ban information of the batch command (list of IPs and count).
+		"""
+		return {
+			"ip": " ".join(str(aInfo["ip"]) for aInfo in aInfos),
+			"count": len(aInfos),
+		}
+
 	@property
 	def actioncheck(self):
 		"""The command used to check the environment.
@@ -74,8 +74,12 @@ class Actions(JailThread, Mapping):
 		Control the idle state of the thread.
 	sleeptime : int
 		The time the thread sleeps for in the loop.
+	banBatch : int
+		Maximal count of tickets banned at once (per loop).
 	"""
 
+	BAN_BATCH = 100
+
 	def __init__(self, jail):
 		JailThread.__init__(self)
 		## The jail which contains this action.
@@ -86,6 +90,8 @@ class Actions(JailThread, Mapping):
 			self._actions = dict()
 		## The ban manager.
 		self.__banManager = BanManager()
+		## Maximal count of tickets taken from the jail queue at once.
+		self.banBatch = self.BAN_BATCH
 
 	def add(self, name, pythonModule=None, initOpts=None):
 		"""Adds a new action.
@@ -201,7 +207,7 @@ class Actions(JailThread, Mapping):
 		ticket = self.__banManager.getTicketByIP(ip)
 		if ticket is not None:
 			# Unban the IP.
-			self.__unBan(ticket)
+			self.__unBan([ticket])
 		else:
 			raise ValueError("IP %s is not banned" % ip)
 
@@ -285,57 +291,115 @@ class Actions(JailThread, Mapping):
 				exc_info=logSys.getEffectiveLevel()<=logging.DEBUG)
 		return mi[idx] if mi[idx] is not None else mi['ticket']
 
+	def __execActions(self, cmd, aInfos):
+		"""Executes the ban or unban of the tickets by all actions.
+
+		Several tickets are passed to the batch method of the action
+		(`ban_many` or `unban_many`) at once. If the action does not
+		implement it (or the batch fails), it is executed for each ticket
+		separately.
+
+		Parameters
+		----------
+		cmd : str
+			Either "ban" or "unban".
+		aInfos : list of dict
+			Information in relation to each ban.
+		"""
+		for name, action in self._actions.iteritems():
+			if len(aInfos) > 1:
+				many = getattr(action, cmd + "_many", None)
+				if many is not None:
+					try:
+						many([aInfo.copy() for aInfo in aInfos])
+						continue
+					except NotImplementedError:
+						pass
+					except Exception as e:
+						logSys.error(
+							"Failed to execute %s batch jail '%s' action '%s' "
+							"info '%r': %s, execute it per IP",
+							cmd, self._jail.name, name,
+							[aInfo["ip"] for aInfo in aInfos], e,
+							exc_info=logSys.getEffectiveLevel()<=logging.DEBUG)
+			for aInfo in aInfos:
+				try:
+					getattr(action, cmd)(aInfo.copy())
+				except Exception as e:
+					logSys.error(
+						"Failed to execute %s jail '%s' action '%s' "
+						"info '%r': %s",
+						cmd, self._jail.name, name, aInfo, e,
+						exc_info=logSys.getEffectiveLevel()<=logging.DEBUG)
+
+	def __getBanInfo(self, bTicket):
+		"""Creates the information of the ban for the actions.
+
+		Parameters
+		----------
+		bTicket : BanTicket
+			Ticket of the ban.
+
+		Returns
+		-------
+		CallingMap
+			Information in relation to the ban (the merged info of the IP
+			from the database is evaluated on demand).
+		"""
+		aInfo = CallingMap()
+		ip = bTicket.getIP()
+		aInfo["ip"] = ip
+		aInfo["failures"] = bTicket.getAttempt()
+		aInfo["time"] = bTicket.getTime()
+		aInfo["matches"] = "\n".join(bTicket.getMatches())
+		if self._jail.database is not None:
+			mi4ip = lambda overalljails=False, self=self, \
+				mi={'ip':ip, 'ticket':bTicket}: self.__getBansMerged(mi, overalljails)
+			aInfo["ipmatches"]      = lambda: "\n".join(mi4ip(True).getMatches())
+			aInfo["ipjailmatches"]  = lambda: "\n".join(mi4ip().getMatches())
+			aInfo["ipfailures"]     = lambda: mi4ip(True).getAttempt()
+			aInfo["ipjailfailures"] = lambda: mi4ip().getAttempt()
+		return aInfo
+
 	def __checkBan(self):
-		"""Check for IP address to ban.
+		"""Check for IP addresses to ban.
 
-		Look in the jail queue for FailTicket. If a ticket is available,
-		it executes the "ban" command and adds a ticket to the BanManager.
+		Look in the jail queue for FailTickets (up to `banBatch` at once).
+		The tickets are added to the BanManager, then the actions execute
+		the ban of all new banned IP addresses.
 
 		Returns
 		-------
 		bool
-			True if an IP address get banned.
+			True if some tickets were taken from the queue.
 		"""
-		ticket = self._jail.getFailTicket()
-		if ticket:
-			aInfo = CallingMap()
+		aInfos = []
+		count = 0
+		while count < self.banBatch:
+			ticket = self._jail.getFailTicket()
+			if not ticket:
+				break
+			count += 1
 			bTicket = BanManager.createBanTicket(ticket)
-			ip = bTicket.getIP()
-			aInfo["ip"] = ip
-			aInfo["failures"] = bTicket.getAttempt()
-			aInfo["time"] = bTicket.getTime()
-			aInfo["matches"] = "\n".join(bTicket.getMatches())
-			if self._jail.database is not None:
-				mi4ip = lambda overalljails=False, self=self, \
-					mi={'ip':ip, 'ticket':bTicket}: self.__getBansMerged(mi, overalljails)
-				aInfo["ipmatches"]      = lambda: "\n".join(mi4ip(True).getMatches())
-				aInfo["ipjailmatches"]  = lambda: "\n".join(mi4ip().getMatches())
-				aInfo["ipfailures"]     = lambda: mi4ip(True).getAttempt()
-				aInfo["ipjailfailures"] = lambda: mi4ip().getAttempt()
+			aInfo = self.__getBanInfo(bTicket)
 			if self.__banManager.addBanTicket(bTicket):
 				logSys.notice("[%s] Ban %s" % (self._jail.name, aInfo["ip"]))
-				for name, action in self._actions.iteritems():
-					try:
-						action.ban(aInfo.copy())
-					except Exception as e:
-						logSys.error(
-							"Failed to execute ban jail '%s' action '%s' "
-							"info '%r': %s",
-							self._jail.name, name, aInfo, e,
-							exc_info=logSys.getEffectiveLevel()<=logging.DEBUG)
-				return True
+				aInfos.append(aInfo)
 			else:
 				logSys.notice("[%s] %s already banned" % (self._jail.name,
 														aInfo["ip"]))
-		return False
+		if aInfos:
+			self.__execActions("ban", aInfos)
+		return count > 0
 
 	def __checkUnBan(self):
 		"""Check for IP address to unban.
 
 		Unban IP addresses which are outdated.
 		"""
-		for ticket in self.__banManager.unBanList(MyTime.time()):
-			self.__unBan(ticket)
+		tickets = self.__banManager.unBanList(MyTime.time())
+		if tickets:
+			self.__unBan(tickets)
 
 	def __flushBan(self):
 		"""Flush the ban list.
@@ -343,41 +407,37 @@ class Actions(JailThread, Mapping):
 		Unban all IP address which are still in the banning list.
 		"""
 		logSys.debug("Flush ban list")
-		for ticket in self.__banManager.flushBanList():
-			self.__unBan(ticket)
+		tickets = self.__banManager.flushBanList()
+		if tickets:
+			self.__unBan(tickets)
 
-	def __unBan(self, ticket):
-		"""Unbans host corresponding to the ticket.
+	def __unBan(self, tickets):
+		"""Unbans hosts corresponding to the tickets.
 
-		Executes the actions in order to unban the host given in the
-		ticket.
+		Executes the actions in order to unban the hosts given in the
+		tickets.
 
 		Parameters
 		----------
-		ticket : FailTicket
-			Ticket of failures of which to unban
+		tickets : list of FailTicket
+			Tickets of failures of which to unban
 		"""
-		aInfo = dict()
-		aInfo["ip"] = ticket.getIP()
-		aInfo["failures"] = ticket.getAttempt()
-		aInfo["time"] = ticket.getTime()
-		aInfo["matches"] = "".join(ticket.getMatches())
-		logSys.notice("[%s] Unban %s" % (self._jail.name, aInfo["ip"]))
-		for name, action in self._actions.iteritems():
-			try:
-				action.unban(aInfo.copy())
-			except Exception as e:
-				logSys.error(
-					"Failed to execute unban jail '%s' action '%s' "
-					"info '%r': %s",
-					self._jail.name, name, aInfo, e,
-					exc_info=logSys.getEffectiveLevel()<=logging.DEBUG)
+		aInfos = []
+		for ticket in tickets:
+			aInfo = dict()
+			aInfo["ip"] = ticket.getIP()
+			aInfo["failures"] = ticket.getAttempt()
+			aInfo["time"] = ticket.getTime()
+			aInfo["matches"] = "".join(ticket.getMatches())
+			logSys.notice("[%s] Unban %s" % (self._jail.name, aInfo["ip"]))
+			aInfos.append(aInfo)
+		self.__execActions("unban", aInfos)
 
 	def status(self, flavor="basic"):
 		"""Status of current and total ban counts and current banned IP list.
 		"""
 		# TODO: Allow this list to be printed as 'status' output
-		supported_flavors = ["basic", "cymru"]
+		supported_flavors = ["basic", "cymru", "perf"]
 		if flavor is None or flavor not in supported_flavors:
 			logSys.warning("Unsupported extended jail status flavor %r. Supported: %s" % (flavor, supported_flavors))
 		# Always print this information (basic)
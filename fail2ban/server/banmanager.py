@@ -24,6 +24,8 @@ __author__ = "Cyril Jaquier"
 __copyright__ = "Copyright (c) 2004 Cyril Jaquier"
 __license__ = "GPL"
 
+from heapq import heappop, heappush
+from itertools import count
 from threading import Lock
 
 from .ticket import BanTicket
@@ -50,8 +52,12 @@ class BanManager:
 	def __init__(self):
 		## Mutex used to protect the ban list.
 		self.__lock = Lock()
-		## The ban list.
-		self.__banList = list()
+		## The ban list (tickets by IP).
+		self.__banList = dict()
+		## Expiry queue, min-heap of (time of ban, seq, ip, ticket), the
+		# entries of the tickets already removed (unbanned) are skipped.
+		self.__expiry = list()
+		self.__seq = count()
 		## The amount of time an IP address gets banned.
 		self.__banTime = 600
 		## Total number of banned IP address
@@ -115,10 +121,16 @@ class BanManager:
 	def getBanList(self):
 		try:
 			self.__lock.acquire()
-			return [m.getIP() for m in self.__banList]
+			return [m.getIP() for m in self.__getTickets()]
 		finally:
 			self.__lock.release()
 
+	##
+	# Returns the tickets of the ban list in order of ban time.
+
+	def __getTickets(self):
+		return sorted(self.__banList.itervalues(), key=lambda t: t.getTime())
+
 	##
 	# Returns normalized value
 	#
@@ -149,7 +161,7 @@ class BanManager:
 			return return_dict
 		self.__lock.acquire()
 		try:
-			for banData in self.__banList:
+			for banData in self.__getTickets():
 				ip = banData.getIP()
 				# Reference: http://www.team-cymru.org/Services/ip-to-asn.html#dns
 				# TODO: IPv6 compatibility
@@ -265,7 +277,10 @@ class BanManager:
 		try:
 			self.__lock.acquire()
 			if not self._inBanList(ticket):
-				self.__banList.append(ticket)
+				ip = ticket.getIP()
+				self.__banList[ip] = ticket
+				heappush(self.__expiry,
+					(ticket.getTime(), next(self.__seq), ip, ticket))
 				self.__banTotal += 1
 				return True
 			return False
@@ -293,15 +308,13 @@ class BanManager:
 	# @return True if a ticket already exists
 	
 	def _inBanList(self, ticket):
-		for i in self.__banList:
-			if ticket.getIP() == i.getIP():
-				return True
-		return False
+		return ticket.getIP() in self.__banList
 	
 	##
 	# Get the list of IP address to unban.
 	#
-	# Return a list of BanTicket which need to be unbanned.
+	# Return a list of BanTicket which need to be unbanned. Only the expired
+	# entries of the expiry queue are visited.
 	# @param time the time
 	# @return the list of ticket to unban
 	
@@ -312,14 +325,15 @@ class BanManager:
 			if self.__banTime < 0:
 				return list()
 
-			# Gets the list of ticket to remove.
-			unBanList = [ticket for ticket in self.__banList
-						 if ticket.getTime() < time - self.__banTime]
-			
-			# Removes tickets.
-			self.__banList = [ticket for ticket in self.__banList
-							  if ticket not in unBanList]
-						
+			# Gets (and removes) the tickets banned before time - banTime.
+			limit = time - self.__banTime
+			unBanList = list()
+			expiry = self.__expiry
+			while expiry and expiry[0][0] < limit:
+				_, _, ip, ticket = heappop(expiry)
+				if self.__banList.get(ip) is ticket:
+					del self.__banList[ip]
+					unBanList.append(ticket)
 			return unBanList
 		finally:
 			self.__lock.release()
@@ -333,8 +347,9 @@ class BanManager:
 	def flushBanList(self):
 		try:
 			self.__lock.acquire()
-			uBList = self.__banList
-			self.__banList = list()
+			uBList = self.__getTickets()
+			self.__banList = dict()
+			self.__expiry = list()
 			return uBList
 		finally:
 			self.__lock.release()
@@ -347,12 +362,8 @@ class BanManager:
 		try:
 			self.__lock.acquire()
 
-			# Find the ticket the IP goes with and return it
-			for i, ticket in enumerate(self.__banList):
-				if ticket.getIP() == ip:
-					# Return the ticket after removing (popping)
-					# if from the ban list.
-					return self.__banList.pop(i)
+			# Return the ticket after removing (popping) it from the ban
+			# list (its entry in expiry queue is skipped later):
+			return self.__banList.pop(ip, None)
 		finally:
 			self.__lock.release()
-		return None						  # if none found
@@ -114,6 +114,9 @@ class Fail2BanDb(object):
 	purgeAge : int
 		Purge age in seconds, used to remove old bans from
 		database during purge.
+	logCheckpoint : int
+		Interval in seconds, the positions of the log files (and cursors
+		of the journals) are written to database (0 - on each update).
 
 	Raises
 	------
@@ -126,8 +129,9 @@ class Fail2BanDb(object):
 	----------
 	filename
 	purgeage
+	logcheckpoint
 	"""
-	__version__ = 2
+	__version__ = 4
 	# Note all _TABLE_* strings must end in ';' for py26 compatibility
 	_TABLE_fail2banDb = "CREATE TABLE fail2banDb(version INTEGER);"
 	_TABLE_jails = "CREATE TABLE jails(" \
@@ -140,6 +144,7 @@ class Fail2BanDb(object):
 			"path TEXT, " \
 			"firstlinemd5 TEXT, " \
 			"lastfilepos INTEGER DEFAULT 0, " \
+			"datetemplate TEXT, " \
 			"FOREIGN KEY(jail) REFERENCES jails(name) ON DELETE CASCADE, " \
 			"UNIQUE(jail, path)," \
 			"UNIQUE(jail, path, firstlinemd5)" \
@@ -148,8 +153,12 @@ class Fail2BanDb(object):
 			"CREATE INDEX logs_jail_path ON logs(jail, path);"
 			#TODO: systemd journal features \
 			#"journalmatch TEXT, " \
-			#"journlcursor TEXT, " \
 			#"lastfiletime INTEGER DEFAULT 0, " # is this easily available \
+	_TABLE_journals = "CREATE TABLE journals(" \
+			"jail TEXT NOT NULL UNIQUE, " \
+			"cursor TEXT, " \
+			"FOREIGN KEY(jail) REFERENCES jails(name) ON DELETE CASCADE " \
+			");"
 	_TABLE_bans = "CREATE TABLE bans(" \
 			"jail TEXT NOT NULL, " \
 			"ip TEXT, " \
@@ -162,7 +171,7 @@ class Fail2BanDb(object):
 			"CREATE INDEX bans_ip ON bans(ip);" \
 
 
-	def __init__(self, filename, purgeAge=24*60*60):
+	def __init__(self, filename, purgeAge=24*60*60, logCheckpoint=0):
 		try:
 			self._lock = RLock()
 			self._db = sqlite3.connect(
@@ -170,6 +179,12 @@ class Fail2BanDb(object):
 				detect_types=sqlite3.PARSE_DECLTYPES)
 			self._dbFilename = filename
 			self._purgeAge = purgeAge
+			self._logCheckpoint = logCheckpoint
+			# not yet written log positions: (jail, path) -> (md5, pos, template)
+			self._dirtyLogs = {}
+			# not yet written journal cursors: jail -> cursor
+			self._dirtyJournals = {}
+			self._lastCheckpoint = time.time()
 
 			self._bansMergedCache = {}
 
@@ -238,6 +253,22 @@ class Fail2BanDb(object):
 	def purgeage(self, value):
 		self._purgeAge = int(value)
 
+	@property
+	def logcheckpoint(self):
+		"""Interval in seconds, the log positions are written in.
+		"""
+		return self._logCheckpoint
+
+	@logcheckpoint.setter
+	def logcheckpoint(self, value):
+		value = int(value)
+		if value < 0:
+			raise ValueError("logcheckpoint must be positive integer or 0")
+		self._logCheckpoint = value
+		# write the pending positions, if checkpointing disabled:
+		if not value:
+			self.flushLogs()
+
 	@commitandrollback
 	def createDb(self, cur):
 		"""Creates a new database, called during initialisation.
@@ -250,6 +281,8 @@ class Fail2BanDb(object):
 		cur.executescript(Fail2BanDb._TABLE_jails)
 		# Logs
 		cur.executescript(Fail2BanDb._TABLE_logs)
+		# Journals
+		cur.executescript(Fail2BanDb._TABLE_journals)
 		# Bans
 		cur.executescript(Fail2BanDb._TABLE_bans)
 
@@ -271,14 +304,26 @@ class Fail2BanDb(object):
 		logSys.info("Database backup created: %s", self._dbBackupFilename)
 
 		if version < 2:
+			# recreates logs table in current layout (so also of next versions):
 			cur.executescript("BEGIN TRANSACTION;"
 						"CREATE TEMPORARY TABLE logs_temp AS SELECT * FROM logs;"
 						"DROP TABLE logs;"
 						"%s;"
-						"INSERT INTO logs SELECT * from logs_temp;"
+						"INSERT INTO logs(jail, path, firstlinemd5, lastfilepos) "
+							"SELECT jail, path, firstlinemd5, lastfilepos from logs_temp;"
 						"DROP TABLE logs_temp;"
-						"UPDATE fail2banDb SET version = 2;"
-						"COMMIT;" % Fail2BanDb._TABLE_logs)
+						"UPDATE fail2banDb SET version = 3;"
+						"COMMIT;" % (Fail2BanDb._TABLE_logs,))
+		elif version < 3:
+			cur.executescript("BEGIN TRANSACTION;"
+						"ALTER TABLE logs ADD COLUMN datetemplate TEXT;"
+						"UPDATE fail2banDb SET version = 3;"
+						"COMMIT;")
+		if version < 4:
+			cur.executescript("BEGIN TRANSACTION;"
+						"%s"
+						"UPDATE fail2banDb SET version = 4;"
+						"COMMIT;" % (Fail2BanDb._TABLE_journals,))
 
 		cur.execute("SELECT version FROM fail2banDb LIMIT 1")
 		return cur.fetchone()[0]
@@ -353,23 +398,30 @@ class Fail2BanDb(object):
 		-------
 		int
 			If log was already present in database, value of last position
-			in the log file; else `None`
+			in the log file; else `None`. The date template pinned for the
+			log is restored in the container as well.
 		"""
 		lastLinePos = None
+		dateTemplate = None
+		# the pending position of the log (if it was just removed):
+		self._flushLogs(cur)
 		cur.execute(
-			"SELECT firstlinemd5, lastfilepos FROM logs "
+			"SELECT firstlinemd5, lastfilepos, datetemplate FROM logs "
 				"WHERE jail=? AND path=?",
 			(jail.name, container.getFileName()))
 		try:
-			firstLineMD5, lastLinePos = cur.fetchone()
+			firstLineMD5, lastLinePos, dateTemplate = cur.fetchone()
 		except TypeError:
 			firstLineMD5 = False
+		if dateTemplate and container.getDateTemplate() is None:
+			container.setDateTemplate(dateTemplate)
 
 		cur.execute(
-				"INSERT OR REPLACE INTO logs(jail, path, firstlinemd5, lastfilepos) "
-					"VALUES(?, ?, ?, ?)",
+				"INSERT OR REPLACE INTO logs(jail, path, firstlinemd5, lastfilepos, datetemplate) "
+					"VALUES(?, ?, ?, ?, ?)",
 				(jail.name, container.getFileName(),
-					container.getHash(), container.getPos()))
+					container.getHash(), container.getPos(),
+					container.getDateTemplate()))
 		if container.getHash() != firstLineMD5:
 			lastLinePos = None
 		return lastLinePos
@@ -398,9 +450,13 @@ class Fail2BanDb(object):
 		cur.execute(query, queryArgs)
 		return set(row[0] for row in cur.fetchmany())
 
-	@commitandrollback
-	def updateLog(self, cur, *args, **kwargs):
-		"""Updates hash and last position in log file.
+	def updateLog(self, jail, container, flush=False):
+		"""Updates hash, last position and pinned date template of log file.
+
+		If the checkpoint interval (`logcheckpoint`) is set, the values are
+		kept in memory and all updated logs (of all jails) are written in one
+		transaction, as soon as the interval elapsed since last write, on
+		demand (`flush`, e.g. on rotation), or by `flushLogs` (e.g. on stop).
 
 		Parameters
 		----------
@@ -408,15 +464,89 @@ class Fail2BanDb(object):
 			Jail of which the log file belongs to.
 		container : FileContainer
 			File container of the log file being updated.
+		flush : bool
+			Write all pending positions now.
 		"""
-		self._updateLog(cur, *args, **kwargs)
+		with self._lock:
+			self._dirtyLogs[(jail.name, container.getFileName())] = (
+				container.getHash(), container.getPos(),
+				container.getDateTemplate())
+			if flush or not self._logCheckpoint \
+					or time.time() >= self._lastCheckpoint + self._logCheckpoint:
+				self.flushLogs()
 
-	def _updateLog(self, cur, jail, container):
-		cur.execute(
-			"UPDATE logs SET firstlinemd5=?, lastfilepos=? "
-				"WHERE jail=? AND path=?",
-			(container.getHash(), container.getPos(),
-				jail.name, container.getFileName()))
+	@commitandrollback
+	def getJournalCursor(self, cur, jail):
+		"""Gets the cursor of the last processed journal entry of the jail.
+
+		Parameters
+		----------
+		jail : Jail
+			Jail that journal is being monitored by.
+
+		Returns
+		-------
+		str
+			Cursor of the journal entry, or `None` if not yet known.
+		"""
+		cursor = self._dirtyJournals.get(jail.name)
+		if cursor is not None:
+			return cursor
+		cur.execute("SELECT cursor FROM journals WHERE jail=?", (jail.name,))
+		row = cur.fetchone()
+		return row[0] if row else None
+
+	def updateJournalCursor(self, jail, cursor, flush=False):
+		"""Updates the cursor of the last processed journal entry.
+
+		Same as the log positions (see `updateLog`), the cursor is written
+		at the checkpoint interval (`logcheckpoint`) or on demand.
+
+		Parameters
+		----------
+		jail : Jail
+			Jail that journal is being monitored by.
+		cursor : str
+			Cursor of the last processed journal entry.
+		flush : bool
+			Write all pending positions and cursors now.
+		"""
+		with self._lock:
+			self._dirtyJournals[jail.name] = cursor
+			if flush or not self._logCheckpoint \
+					or time.time() >= self._lastCheckpoint + self._logCheckpoint:
+				self.flushLogs()
+
+	@commitandrollback
+	def flushLogs(self, cur):
+		"""Writes the pending positions of all logs (and cursors of the
+		journals) in one transaction.
+
+		Returns
+		-------
+		int
+			Count of written logs and journals.
+		"""
+		return self._flushLogs(cur)
+
+	def _flushLogs(self, cur):
+		self._lastCheckpoint = time.time()
+		count = 0
+		if self._dirtyLogs:
+			dirty, self._dirtyLogs = self._dirtyLogs, {}
+			cur.executemany(
+				"UPDATE logs SET firstlinemd5=?, lastfilepos=?, datetemplate=? "
+					"WHERE jail=? AND path=?",
+				[(md5, pos, template, jail, path)
+					for (jail, path), (md5, pos, template) in dirty.iteritems()])
+			count += len(dirty)
+		if self._dirtyJournals:
+			dirty, self._dirtyJournals = self._dirtyJournals, {}
+			cur.executemany(
+				"INSERT OR REPLACE INTO journals(jail, cursor) VALUES(?, ?)",
+				dirty.iteritems())
+			count += len(dirty)
+		return count
 
 	@commitandrollback
 	def addBan(self, cur, jail, ticket):
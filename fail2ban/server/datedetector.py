@@ -21,9 +21,10 @@ __author__ = "Cyril Jaquier and Fail2Ban Contributors"
 __copyright__ = "Copyright (c) 2004 Cyril Jaquier"
 __license__ = "GPL"
 
-from threading import Lock
+from threading import RLock
 
 from .datetemplate import DatePatternRegex, DateTai64n, DateEpoch
+from .perfstats import PerfStats
 from ..helpers import getLogger
 
 # Gets the instance of the logger.
@@ -33,23 +34,36 @@ logSys = getLogger(__name__)
 class DateDetector(object):
 	"""Manages one or more date templates to find a date within a log line.
 
+	The search of dates is lock-free: the list of templates is never changed
+	in place, writers (append, sort) replace it with a modified copy under
+	the lock, so readers simply work on the list they have got at start.
+
 	Attributes
 	----------
 	templates
 	"""
 
 	def __init__(self):
-		self.__lock = Lock()
+		# serializes writers only:
+		self.__lock = RLock()
 		self.__templates = list()
-		self.__known_names = set()
+		# templates by name:
+		self.__known_names = dict()
+		self.__perfSample = 0
 
 	def _appendTemplate(self, template):
 		name = template.name
 		if name in self.__known_names:
 			raise ValueError(
 				"There is already a template with name %s" % name)
-		self.__known_names.add(name)
-		self.__templates.append(template)
+		template.perfStats = \
+			PerfStats(self.__perfSample) if self.__perfSample else None
+		self.__lock.acquire()
+		try:
+			self.__known_names[name] = template
+			self.__templates = self.__templates + [template]
+		finally:
+			self.__lock.release()
 
 	def appendTemplate(self, template):
 		"""Add a date template to manage and use in search of dates.
@@ -127,12 +141,35 @@ class DateDetector(object):
 		finally:
 			self.__lock.release()
 
+	def setPerfSample(self, sample):
+		"""Enables or disables the cost profiling of the templates.
+
+		Parameters
+		----------
+		sample : int
+			Measure the time of every `sample`-th call of a template
+			(0 to disable profiling).
+		"""
+		self.__perfSample = sample
+		for template in self.__templates:
+			template.perfStats = PerfStats(sample) if sample else None
+
+	def getPerfSample(self):
+		"""Returns the profiling sample rate (0 if disabled).
+		"""
+		return self.__perfSample
+
 	@property
 	def templates(self):
 		"""List of template instances managed by the detector.
 		"""
 		return self.__templates
 
+	def getTemplate(self, name):
+		"""Returns the template with given name (None if not found).
+		"""
+		return self.__known_names.get(name)
+
 	def matchTime(self, line):
 		"""Attempts to find date on a log line using templates.
 
@@ -151,17 +188,61 @@ class DateDetector(object):
 			The regex match returned from the first successfully matched
 			template.
 		"""
-		self.__lock.acquire()
-		try:
-			for template in self.__templates:
+		found = self._matchTemplate(line)
+		return found[1] if found else None
+
+	def _matchTemplate(self, line, preferred=None):
+		templates = self.__templates
+		if preferred is not None:
+			# try the preferred template first (and the full list on miss):
+			template = self.__known_names.get(preferred)
+			if template is not None:
+				templates = [template] + templates
+		for template in templates:
+			stats = template.perfStats
+			if stats is None:
 				match = template.matchDate(line)
-				if not match is None:
-					logSys.debug("Matched time template %s" % template.name)
-					template.hits += 1
-					return match
+			else:
+				started = stats.start()
+				match = template.matchDate(line)
+				stats.stop(started, match)
+			if match is not None:
+				logSys.debug("Matched time template %s", template.name)
+				template.incHits()
+				return template, match
+		return None
+
+	def findTime(self, line, preferred=None):
+		"""Finds and parses the date on a log line in a single pass.
+
+		Same as `matchTime` (also increments the hit count of the winning
+		template), but the date is parsed from the found match of the
+		template, so the line is not searched again by `getTime`.
+
+		Parameters
+		----------
+		line : str
+			Line which is searched by the date templates.
+		preferred : str, optional
+			Name of the template to try first (e.g. pinned template of a
+			log file), all templates are tried if it does not match.
+
+		Returns
+		-------
+		(float, re.MatchObject, DateTemplate)
+			The Unix timestamp (None if the matched text could not be
+			parsed by the template), the regex match and the first
+			successfully matched template, or None if no template matched.
+		"""
+		found = self._matchTemplate(line, preferred)
+		if not found:
 			return None
-		finally:
-			self.__lock.release()
+		template, match = found
+		try:
+			date = template.getDate(line, match)
+		except ValueError:
+			date = None
+		return (date[0] if date else None), match, template
 
 	def getTime(self, line):
 		"""Attempts to return the date on a log line using templates.
@@ -180,21 +261,26 @@ class DateDetector(object):
 			The Unix timestamp returned from the first successfully matched
 			template.
 		"""
-		self.__lock.acquire()
-		try:
-			for template in self.__templates:
-				try:
+		for template in self.__templates:
+			try:
+				stats = template.perfStats
+				if stats is None:
 					date = template.getDate(line)
-					if date is None:
-						continue
-					logSys.debug("Got time %f for \"%r\" using template %s" %
-						(date[0], date[1].group(), template.name))
-					return date
-				except ValueError:
-					pass
-			return None
-		finally:
-			self.__lock.release()
+				else:
+					started = stats.start()
+					date = None
+					try:
+						date = template.getDate(line)
+					finally:
+						stats.stop(started, date)
+				if date is None:
+					continue
+				logSys.debug("Got time %f for \"%r\" using template %s" %
+					(date[0], date[1].group(), template.name))
+				return date
+			except ValueError:
+				pass
+		return None
 
 	def sortTemplate(self):
 		"""Sort the date templates by number of hits
@@ -207,8 +293,12 @@ class DateDetector(object):
 		self.__lock.acquire()
 		try:
 			logSys.debug("Sorting the template list")
-			self.__templates.sort(key=lambda x: x.hits, reverse=True)
-			t = self.__templates[0]
-			logSys.debug("Winning template: %s with %d hits" % (t.name, t.hits))
+			# sort a copy, so the readers are never blocked or disturbed:
+			templates = sorted(self.__templates,
+				key=lambda x: x.hits, reverse=True)
+			self.__templates = templates
+			if templates:
+				t = templates[0]
+				logSys.debug("Winning template: %s with %d hits", t.name, t.hits)
 		finally:
 			self.__lock.release()
@@ -26,13 +26,91 @@ __license__ = "GPL"
 
 import re
 from abc import abstractmethod
+from thread import get_ident
 
-from .strptime import reGroupDictStrptime, timeRE
+from .mytime import MyTime
+from .strptime import reGroupDictStrptime, fastGroupDictStrptime, \
+	timeRE, FAST_FIELDS
 from ..helpers import getLogger
 
 logSys = getLogger(__name__)
 
 
+class DateParseCache(object):
+	"""Bounded cache of parsed dates of a template (date text -> time stamp).
+
+	Busy logs contain many lines in a row with the same date text, so
+	parsing of them can be skipped. The result of a date without year or
+	day depends on the current time (rollover heuristics), so each entry is
+	valid within a range of the current time only.
+
+	Parameters
+	----------
+	maxSize : int
+		Maximal count of entries, an arbitrary entry is dropped if exceeded.
+
+	Attributes
+	----------
+	maxSize
+	hits
+	misses
+	"""
+
+	__slots__ = ('maxSize', 'hits', 'misses', '_entries')
+
+	def __init__(self, maxSize=64):
+		self.maxSize = maxSize
+		self._entries = {}
+		self.reset()
+
+	def reset(self):
+		"""Resets the hit/miss counters.
+		"""
+		self.hits = 0
+		self.misses = 0
+
+	def clear(self):
+		"""Removes all entries.
+		"""
+		self._entries = {}
+
+	def __len__(self):
+		return len(self._entries)
+
+	def get(self, dateText, now):
+		"""Returns cached time stamp for the date text (None if not cached
+		or not valid at current time `now`).
+		"""
+		entry = self._entries.get(dateText)
+		if entry is not None and entry[1] <= now < entry[2]:
+			self.hits += 1
+			return entry[0]
+		self.misses += 1
+		return None
+
+	def set(self, dateText, date, validFrom, validTo):
+		"""Stores time stamp of the date text valid from/to given time.
+		"""
+		entries = self._entries
+		if len(entries) >= self.maxSize and dateText not in entries:
+			try:
+				entries.popitem()
+			except KeyError: # pragma: no cover - emptied concurrently
+				pass
+		entries[dateText] = (date, validFrom, validTo)
+
+	@property
+	def hitRate(self):
+		"""Ratio of hits to all lookups (0 if nothing looked up).
+		"""
+		total = self.hits + self.misses
+		return float(self.hits) / total if total else 0.0
+
+	def __str__(self):
+		return "hits: %d, misses: %d, hit rate: %.1f%%, size: %d" % (
+			self.hits, self.misses, self.hitRate * 100, len(self))
+
+
 class DateTemplate(object):
 	"""A template which searches for and returns a date from a log line.
 
@@ -43,13 +121,38 @@ class DateTemplate(object):
 	----------
 	name
 	regex
+	hits
+	perfStats
+	parseCache
 	"""
 
 	def __init__(self):
 		self._name = ""
 		self._regex = ""
 		self._cRegex = None
-		self.hits = 0
+		# hits counted per thread (thread ident -> count), so that threads
+		# sharing the template never need a lock to count them:
+		self._hits = {}
+		# cost statistics (PerfStats), maintained by DateDetector if enabled
+		self.perfStats = None
+		# cache of parsed dates (DateParseCache), if parsing is expensive
+		self.parseCache = None
+
+	@property
+	def hits(self):
+		"""Number of lines matched by the template (over all threads).
+		"""
+		return sum(self._hits.values())
+
+	@hits.setter
+	def hits(self, value):
+		self._hits = {get_ident(): value}
+
+	def incHits(self):
+		"""Counts a hit of the template in the current thread.
+		"""
+		ident = get_ident()
+		self._hits[ident] = self._hits.get(ident, 0) + 1
 
 	@property
 	def name(self):
@@ -104,7 +207,7 @@ class DateTemplate(object):
 		return dateMatch
 
 	@abstractmethod
-	def getDate(self, line):
+	def getDate(self, line, dateMatch=None):
 		"""Abstract method, which should return the date for a log line
 
 		This should return the date for a log line, typically taking the
@@ -115,6 +218,9 @@ class DateTemplate(object):
 		----------
 		line : str
 			Log line, of which the date should be extracted from.
+		dateMatch : re.MatchObject, optional
+			Already found match of the template regex in the line
+			(avoids a repeated search).
 
 		Raises
 		------
@@ -140,13 +246,15 @@ class DateEpoch(DateTemplate):
 		DateTemplate.__init__(self)
 		self.regex = r"(?:^|(?P<square>(?<=^\[))|(?P<selinux>(?<=audit\()))\d{10,11}\b(?:\.\d{3,6})?(?:(?(selinux)(?=:\d+\)))|(?(square)(?=\])))"
 
-	def getDate(self, line):
+	def getDate(self, line, dateMatch=None):
 		"""Method to return the date for a log line.
 
 		Parameters
 		----------
 		line : str
 			Log line, of which the date should be extracted from.
+		dateMatch : re.MatchObject, optional
+			Already found match of the template regex in the line.
 
 		Returns
 		-------
@@ -154,7 +262,8 @@ class DateEpoch(DateTemplate):
 			Tuple containing a Unix timestamp, and the string of the date
 			which was matched and in turned used to calculated the timestamp.
 		"""
-		dateMatch = self.matchDate(line)
+		if not dateMatch:
+			dateMatch = self.matchDate(line)
 		if dateMatch:
 			# extract part of format which represents seconds since epoch
 			return (float(dateMatch.group()), dateMatch)
@@ -188,6 +297,8 @@ class DatePatternRegex(DateTemplate):
 	def __init__(self, pattern=None):
 		super(DatePatternRegex, self).__init__()
 		self._pattern = None
+		self._fastParse = False
+		self.parseCache = DateParseCache()
 		if pattern is not None:
 			self.pattern = pattern
 
@@ -206,10 +317,15 @@ class DatePatternRegex(DateTemplate):
 	@pattern.setter
 	def pattern(self, pattern):
 		self._pattern = pattern
+		self.parseCache.clear()
 		self._name = re.sub(
 			self._patternRE, r'%(\1)s', pattern) % self._patternName
 		super(DatePatternRegex, self).setRegex(
 			re.sub(self._patternRE, r'%(\1)s', pattern) % timeRE)
+		# common formats (day, month and time) are parsed by fast parser:
+		fields = set(self._cRegex.groupindex) & set(timeRE)
+		self._fastParse = fields <= FAST_FIELDS \
+			and set(('d', 'H', 'M')) <= fields and ('b' in fields or 'm' in fields)
 
 	def setRegex(self, value):
 		raise NotImplementedError("Regex derived from pattern")
@@ -218,16 +334,20 @@ class DatePatternRegex(DateTemplate):
 	def name(self, value):
 		raise NotImplementedError("Name derived from pattern")
 
-	def getDate(self, line):
+	def getDate(self, line, dateMatch=None):
 		"""Method to return the date for a log line.
 
 		This uses a custom version of strptime, using the named groups
-		from the instances `pattern` property.
+		from the instances `pattern` property (specialized fast version for
+		the common formats). The parsed dates are cached by the matched date
+		text (see `DateParseCache`).
 
 		Parameters
 		----------
 		line : str
 			Log line, of which the date should be extracted from.
+		dateMatch : re.MatchObject, optional
+			Already found match of the template regex in the line.
 
 		Returns
 		-------
@@ -235,13 +355,25 @@ class DatePatternRegex(DateTemplate):
 			Tuple containing a Unix timestamp, and the string of the date
 			which was matched and in turned used to calculated the timestamp.
 		"""
-		dateMatch = self.matchDate(line)
+		if not dateMatch:
+			dateMatch = self.matchDate(line)
 		if dateMatch:
-			groupdict = dict(
-				(key, value)
-				for key, value in dateMatch.groupdict().iteritems()
-				if value is not None)
-			return reGroupDictStrptime(groupdict), dateMatch
+			dateText = dateMatch.group()
+			now = MyTime.time()
+			date = self.parseCache.get(dateText, now)
+			if date is None:
+				if self._fastParse:
+					date, validFrom, validTo = fastGroupDictStrptime(
+						dateMatch.groupdict(), validRange=True)
+				else:
+					groupdict = dict(
+						(key, value)
+						for key, value in dateMatch.groupdict().iteritems()
+						if value is not None)
+					date, validFrom, validTo = reGroupDictStrptime(groupdict,
+						validRange=True)
+				self.parseCache.set(dateText, date, validFrom, validTo)
+			return date, dateMatch
 
 
 class DateTai64n(DateTemplate):
@@ -259,13 +391,15 @@ class DateTai64n(DateTemplate):
 		# yoh: we should not add an additional front anchor
 		self.setRegex("@[0-9a-f]{24}", wordBegin=False)
 
-	def getDate(self, line):
+	def getDate(self, line, dateMatch=None):
 		"""Method to return the date for a log line.
 
 		Parameters
 		----------
 		line : str
 			Log line, of which the date should be extracted from.
+		dateMatch : re.MatchObject, optional
+			Already found match of the template regex in the line.
 
 		Returns
 		-------
@@ -273,7 +407,8 @@ class DateTai64n(DateTemplate):
 			Tuple containing a Unix timestamp, and the string of the date
 			which was matched and in turned used to calculated the timestamp.
 		"""
-		dateMatch = self.matchDate(line)
+		if not dateMatch:
+			dateMatch = self.matchDate(line)
 		if dateMatch:
 			# extract part of format which represents seconds since epoch
 			value = dateMatch.group()
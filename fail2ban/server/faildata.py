@@ -30,32 +30,62 @@ from ..helpers import getLogger
 logSys = getLogger(__name__)
 
 
-class FailData:
+##
+# Failures of a single IP.
+#
+# Many thousands of these are kept during large scans, so the instances have
+# no __dict__ and the list of matches is allocated on the first match only
+# and kept bounded (see inc). The matches are stored per failure: the line
+# itself for a single-line failure, a tuple of lines for a multi-line one.
+
+class FailData(object):
+
+	__slots__ = ('__retry', '__lastTime', '__lastReset', '__matches')
 	
 	def __init__(self):
 		self.__retry = 0
 		self.__lastTime = 0
 		self.__lastReset = 0
-		self.__matches = []
+		self.__matches = None
 
 	def setRetry(self, value):
 		self.__retry = value
-		# keep only the last matches or reset entirely
-		# Explicit if/else for compatibility with Python 2.4
-		if value:
-			self.__matches = self.__matches[-min(len(self.__matches, value)):]
+		# keep only the matches of the last failures or reset entirely
+		if value and self.__matches:
+			del self.__matches[:-value]
 		else:
-			self.__matches = []
+			self.__matches = None
 
 	def getRetry(self):
 		return self.__retry
 
 	def getMatches(self):
-		return self.__matches
+		matches = []
+		for failure in self.__matches or ():
+			if isinstance(failure, tuple):
+				matches.extend(failure)
+			else:
+				matches.append(failure)
+		return matches
 
-	def inc(self, matches=None):
+	##
+	# Counts a failure and adds its matched lines.
+	#
+	# @param matches the lines matched by the failure
+	# @param maxMatches keep only the lines of this many last failures,
+	# unbounded if None
+
+	def inc(self, matches=None, maxMatches=None):
 		self.__retry += 1
-		self.__matches += matches or []
+		if not matches:
+			return
+		failure = matches[0] if len(matches) == 1 else tuple(matches)
+		if self.__matches is None:
+			self.__matches = [failure]
+		else:
+			self.__matches.append(failure)
+			if maxMatches and len(self.__matches) > maxMatches:
+				del self.__matches[:-maxMatches]
 
 	def setLastTime(self, value):
 		if value > self.__lastTime:
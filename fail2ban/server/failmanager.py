@@ -24,6 +24,8 @@ __author__ = "Cyril Jaquier"
 __copyright__ = "Copyright (c) 2004 Cyril Jaquier"
 __license__ = "GPL"
 
+from heapq import heapify, heappop, heappush
+from itertools import count
 from threading import Lock
 import logging
 
@@ -35,125 +37,274 @@ from ..helpers import getLogger
 logSys = getLogger(__name__)
 
 
+##
+# Part of the failures (IPs with the same hash modulo count of shards),
+# guarded by its own lock.
+
+class _FailShard(object):
+
+	__slots__ = ('lock', 'failList', 'expiry', 'ready', 'readyQueue',
+		'failTotal')
+
+	def __init__(self):
+		self.lock = Lock()
+		self.failList = dict()
+		# expiry queue, min-heap of (lastTime, seq, ip, fData), the entries of
+		# removed or later failed IPs are skipped or rescheduled on cleanup:
+		self.expiry = list()
+		# IPs reached maxRetry, ready to ban (ip -> seq of reaching it):
+		self.ready = dict()
+		# order of ready IPs, min-heap of (seq, ip), the entries of IPs not
+		# ready anymore (or ready again later) are skipped:
+		self.readyQueue = list()
+		self.failTotal = 0
+
+	def addReady(self, ip, seq):
+		self.ready[ip] = seq
+		heappush(self.readyQueue, (seq, ip))
+		# drop the skipped entries if too many:
+		if len(self.readyQueue) > 2 * len(self.ready) + 64:
+			self.setReady(self.ready)
+
+	def setReady(self, ready):
+		self.ready = ready
+		self.readyQueue = [(seq, ip) for ip, seq in ready.iteritems()]
+		heapify(self.readyQueue)
+
+	def firstReady(self):
+		# seq and IP reached maxRetry first, or None:
+		queue = self.readyQueue
+		while queue:
+			seq, ip = queue[0]
+			if self.ready.get(ip) == seq:
+				return queue[0]
+			heappop(queue)
+		return None
+
+
+##
+# Failures of the jail.
+#
+# The IPs are distributed over several shards by hash, each with its own
+# lock, so the threads adding failures of different IPs rarely wait for
+# each other. The configuration values are plain attributes (replaced at
+# once), so reading them needs no lock at all.
+
 class FailManager:
+
+	## Default count of shards.
+	SHARDS = 16
+	## Minimal count of interned lines, before the unused are pruned.
+	INTERN_MIN = 1024
 	
-	def __init__(self):
-		self.__lock = Lock()
-		self.__failList = dict()
+	def __init__(self, shards=SHARDS):
+		self.__shards = [_FailShard() for _ in xrange(shards)]
+		# global order of entries (expiry queue ties, ready to ban order):
+		self.__seq = count(1)
 		self.__maxRetry = 3
 		self.__maxTime = 600
-		self.__failTotal = 0
+		# interned matched lines (line -> line) or None if disabled:
+		self.__lines = None
+		self.__linesKept = 0
+
+	def __getShard(self, ip):
+		return self.__shards[hash(ip) % len(self.__shards)]
 	
 	def setFailTotal(self, value):
-		try:
-			self.__lock.acquire()
-			self.__failTotal = value
-		finally:
-			self.__lock.release()
+		for shard in self.__shards:
+			with shard.lock:
+				shard.failTotal = 0
+		shard = self.__shards[0]
+		with shard.lock:
+			shard.failTotal = value
 		
 	def getFailTotal(self):
-		try:
-			self.__lock.acquire()
-			return self.__failTotal
-		finally:
-			self.__lock.release()
+		return sum(shard.failTotal for shard in self.__shards)
 	
 	def setMaxRetry(self, value):
-		try:
-			self.__lock.acquire()
-			self.__maxRetry = value
-		finally:
-			self.__lock.release()
+		self.__maxRetry = value
+		for shard in self.__shards:
+			with shard.lock:
+				# already ready IPs keep their order:
+				ready = shard.ready
+				shard.setReady(dict(
+					(ip, ready.get(ip) or next(self.__seq))
+					for ip, data in shard.failList.iteritems()
+					if data.getRetry() >= value))
 	
 	def getMaxRetry(self):
-		try:
-			self.__lock.acquire()
-			return self.__maxRetry
-		finally:
-			self.__lock.release()
+		return self.__maxRetry
 	
 	def setMaxTime(self, value):
-		try:
-			self.__lock.acquire()
-			self.__maxTime = value
-		finally:
-			self.__lock.release()
+		self.__maxTime = value
 	
 	def getMaxTime(self):
-		try:
-			self.__lock.acquire()
-			return self.__maxTime
-		finally:
-			self.__lock.release()
+		return self.__maxTime
+
+	##
+	# Set whether the matched lines are interned.
+	#
+	# Identical lines (e.g. the lines of a multi-line buffer being part of
+	# several failures) are then stored once. The lines are deduplicated by
+	# a dictionary of the manager (works also for unicode lines, that cannot
+	# be interned by python 2), the lines not used anymore are pruned from
+	# it on cleanup.
+	# @param value True to intern the lines
+
+	def setInternMatches(self, value):
+		if not value:
+			self.__lines = None
+		elif self.__lines is None:
+			self.__lines = dict()
+			self.__linesKept = 0
+
+	def getInternMatches(self):
+		return self.__lines is not None
 
 	def addFailure(self, ticket):
-		try:
-			self.__lock.acquire()
-			ip = ticket.getIP()
-			unixTime = ticket.getTime()
-			matches = ticket.getMatches()
-			if ip in self.__failList:
-				fData = self.__failList[ip]
-				if fData.getLastReset() < unixTime - self.__maxTime:
+		ip = ticket.getIP()
+		unixTime = ticket.getTime()
+		matches = ticket.getMatches()
+		lines = self.__lines
+		if matches and lines is not None:
+			matches = [lines.setdefault(line, line) for line in matches]
+		maxRetry = self.__maxRetry
+		maxTime = self.__maxTime
+		shard = self.__getShard(ip)
+		with shard.lock:
+			failList = shard.failList
+			# the matches of the last maxRetry failures are enough for a ban:
+			if ip in failList:
+				fData = failList[ip]
+				if fData.getLastReset() < unixTime - maxTime:
 					fData.setLastReset(unixTime)
 					fData.setRetry(0)
-				fData.inc(matches)
+				fData.inc(matches, maxRetry)
 				fData.setLastTime(unixTime)
 			else:
 				fData = FailData()
-				fData.inc(matches)
+				fData.inc(matches, maxRetry)
 				fData.setLastReset(unixTime)
 				fData.setLastTime(unixTime)
-				self.__failList[ip] = fData
-
-			self.__failTotal += 1
-
-			if logSys.getEffectiveLevel() <= logging.DEBUG:
-				# yoh: Since composing this list might be somewhat time consuming
-				# in case of having many active failures, it should be ran only
-				# if debug level is "low" enough
-				failures_summary = ', '.join(['%s:%d' % (k, v.getRetry())
-											  for k,v in  self.__failList.iteritems()])
-				logSys.debug("Total # of detected failures: %d. Current failures from %d IPs (IP:count): %s"
-							 % (self.__failTotal, len(self.__failList), failures_summary))
-		finally:
-			self.__lock.release()
+				failList[ip] = fData
+				heappush(shard.expiry,
+					(fData.getLastTime(), next(self.__seq), ip, fData))
+			if fData.getRetry() >= maxRetry:
+				if ip not in shard.ready:
+					shard.addReady(ip, next(self.__seq))
+			else:
+				# window was reset:
+				shard.ready.pop(ip, None)
+
+			shard.failTotal += 1
+
+		if logSys.getEffectiveLevel() <= logging.DEBUG:
+			# yoh: Since composing this list might be somewhat time consuming
+			# in case of having many active failures, it should be ran only
+			# if debug level is "low" enough
+			failures = [item for shard in self.__shards
+				for item in shard.failList.items()]
+			failures_summary = ', '.join(['%s:%d' % (k, v.getRetry())
+										  for k,v in failures])
+			logSys.debug("Total # of detected failures: %d. Current failures from %d IPs (IP:count): %s"
+						 % (self.getFailTotal(), len(failures), failures_summary))
 	
 	def size(self):
-		try:
-			self.__lock.acquire()
-			return len(self.__failList)
-		finally:
-			self.__lock.release()
+		return sum(len(shard.failList) for shard in self.__shards)
 	
+	##
+	# Removes the failures older than maxTime.
+	#
+	# Only the expired entries of the expiry queue are visited, an IP failed
+	# again meanwhile is rescheduled to its last failure time. The shards
+	# are cleaned one after another (each under its own lock).
+	# @param time the current time
+
 	def cleanup(self, time):
-		try:
-			self.__lock.acquire()
-			tmp = self.__failList.copy()
-			for item in tmp:
-				if tmp[item].getLastTime() < time - self.__maxTime:
-					self.__delFailure(item)
-		finally:
-			self.__lock.release()
+		limit = time - self.__maxTime
+		for shard in self.__shards:
+			with shard.lock:
+				expiry = shard.expiry
+				while expiry and expiry[0][0] < limit:
+					lastTime, _, ip, fData = heappop(expiry)
+					if shard.failList.get(ip) is not fData:
+						# already removed (banned) or added again:
+						continue
+					if fData.getLastTime() < limit:
+						del shard.failList[ip]
+						shard.ready.pop(ip, None)
+					else:
+						heappush(expiry,
+							(fData.getLastTime(), next(self.__seq), ip, fData))
+		lines = self.__lines
+		if lines is not None and \
+				len(lines) > max(2 * self.__linesKept, self.INTERN_MIN):
+			self.__pruneLines()
+
+	##
+	# Removes the interned lines not used by any failure anymore.
+
+	def __pruneLines(self):
+		kept = dict()
+		for shard in self.__shards:
+			with shard.lock:
+				for fData in shard.failList.itervalues():
+					for line in fData.getMatches():
+						kept[line] = line
+		if self.__lines is not None:
+			self.__lines = kept
+			self.__linesKept = len(kept)
 	
-	def __delFailure(self, ip):
-		if ip in self.__failList:
-			del self.__failList[ip]
+	@staticmethod
+	def __popTicket(shard, ip):
+		data = shard.failList.pop(ip)
+		# Create a FailTicket from BanData
+		failTicket = FailTicket(ip, data.getLastTime(), data.getMatches())
+		failTicket.setAttempt(data.getRetry())
+		return failTicket
 	
 	def toBan(self):
-		try:
-			self.__lock.acquire()
-			for ip in self.__failList:
-				data = self.__failList[ip]
-				if data.getRetry() >= self.__maxRetry:
-					self.__delFailure(ip)
-					# Create a FailTicket from BanData
-					failTicket = FailTicket(ip, data.getLastTime(), data.getMatches())
-					failTicket.setAttempt(data.getRetry())
-					return failTicket
-			raise FailManagerEmpty
-		finally:
-			self.__lock.release()
+		# the first IP reached maxRetry over all shards:
+		while True:
+			first = None
+			for shard in self.__shards:
+				if not shard.ready:
+					continue
+				with shard.lock:
+					found = shard.firstReady()
+					if found and (first is None or found[0] < first[0]):
+						first = (found[0], shard)
+			if first is None:
+				raise FailManagerEmpty
+			seq, shard = first
+			with shard.lock:
+				found = shard.firstReady()
+				if found and found[0] == seq:
+					ip = found[1]
+					del shard.ready[ip]
+					heappop(shard.readyQueue)
+					return self.__popTicket(shard, ip)
+			# changed meanwhile (by other thread), try again # pragma: no cover
+
+	##
+	# Removes all IPs reached maxRetry and returns their tickets at once.
+	#
+	# Each shard is drained under its own lock, the tickets are returned in
+	# order the IPs reached maxRetry.
+	# @return list of FailTicket (empty if nothing to ban)
+
+	def toBanAll(self):
+		tickets = []
+		for shard in self.__shards:
+			if not shard.ready:
+				continue
+			with shard.lock:
+				ready = shard.ready
+				shard.setReady(dict())
+				tickets.extend((seq, self.__popTicket(shard, ip))
+					for ip, seq in ready.iteritems())
+		tickets.sort(key=lambda t: t[0])
+		return [ticket for _, ticket in tickets]
 
 
 class FailManagerEmpty(Exception):
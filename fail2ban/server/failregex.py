@@ -21,10 +21,115 @@ __author__ = "Cyril Jaquier"
 __copyright__ = "Copyright (c) 2004 Cyril Jaquier"
 __license__ = "GPL"
 
+import bisect
+import os
 import re
 import sre_constants
+import sre_parse
+import string
 import sys
 
+from .perfstats import PerfStats
+
+
+##
+# Line buffer class.
+#
+# This class holds the last lines (as tuples prematch, datematch,
+# postdatematch) together with the text searched by the regular expressions
+# (the lines without date joined by new line). The text is maintained
+# incrementally, so it is built once per line and shared by all regular
+# expressions searching it. The offsets of the line ends allow to map a
+# position in the text to the line by binary search.
+
+class LineBuffer:
+
+	##
+	# Constructor.
+	#
+	# @param maxLines the maximal count of lines (0 for unlimited)
+	# @param tupleLines the initial list of tuple lines
+
+	def __init__(self, maxLines=0, tupleLines=()):
+		self._maxLines = maxLines
+		self.setLines(tupleLines)
+
+	def __repr__(self):
+		return repr(self._lines)
+
+	def __len__(self):
+		return len(self._lines)
+
+	##
+	# Set the maximal count of lines.
+	#
+	# @param value the maximal count of lines (0 for unlimited)
+
+	def setMaxLines(self, value):
+		self._maxLines = value
+		if value and len(self._lines) > value:
+			self.setLines(self._lines[-value:])
+
+	##
+	# Replaces the content of the buffer.
+	#
+	# @param tupleLines list of tuple lines
+
+	def setLines(self, tupleLines):
+		if self._maxLines and len(tupleLines) > self._maxLines:
+			tupleLines = tupleLines[-self._maxLines:]
+		self._lines = list(tupleLines)
+		self._base = 0
+		self._ends = []
+		text = []
+		end = 0
+		for value in self._lines:
+			line = "".join(value[::2]) + "\n"
+			text.append(line)
+			end += len(line)
+			self._ends.append(end)
+		self._text = "".join(text)
+
+	##
+	# Appends a line to the buffer, removing the oldest line(s) if the
+	# buffer is full.
+	#
+	# @param tupleLine the tuple line (prematch, datematch, postdatematch)
+
+	def append(self, tupleLine):
+		line = "".join(tupleLine[::2]) + "\n"
+		self._lines.append(tupleLine)
+		self._ends.append(
+			(self._ends[-1] if self._ends else self._base) + len(line))
+		drop = len(self._lines) - self._maxLines if self._maxLines else 0
+		if drop > 0:
+			base = self._ends[drop-1]
+			self._text = self._text[base - self._base:] + line
+			self._base = base
+			del self._lines[:drop]
+			del self._ends[:drop]
+		else:
+			self._text += line
+
+	##
+	# Returns the tuple lines of the buffer.
+
+	def getLines(self):
+		return self._lines
+
+	##
+	# Returns the searched text (lines without date, each ends with new line).
+
+	def getText(self):
+		return self._text
+
+	##
+	# Returns the count of new line chars before the position pos in text
+	# (i.e. the index of the line containing pos).
+
+	def countLines(self, pos):
+		return bisect.bisect_right(self._ends, self._base + pos)
+
 
 ##
 # Regular expression class.
@@ -33,6 +138,9 @@ import sys
 
 class Regex:
 
+	# Minimal length of the required literal fragments used to prefilter.
+	MIN_LITERAL_LEN = 3
+
 	##
 	# Constructor.
 	#
@@ -42,6 +150,7 @@ class Regex:
 	
 	def __init__(self, regex):
 		self._matchCache = None
+		self._perfStats = None
 		# Perform shortcuts expansions.
 		# Replace "<HOST>" with default regular expression for host.
 		regex = regex.replace("<HOST>", "(?:::f{4,6}:)?(?P<host>[\w\-.^_]*\w)")
@@ -58,6 +167,92 @@ class Regex:
 		except sre_constants.error:
 			raise RegexException("Unable to compile regular expression '%s'" %
 								 regex)
+		self._literals = Regex._getRequiredLiterals(regex)
+
+	##
+	# Gets the literal fragments required by the regular expression.
+	#
+	# Each string that matches the expression contains all of these fragments,
+	# so a string that does not contain any of them can be rejected without
+	# the regex engine. The longest fragments are returned first.
+	# @param regex the regular expression
+	# @return list of literal strings (empty if nothing could be extracted)
+
+	@staticmethod
+	def _getRequiredLiterals(regex):
+		try:
+			parsed = sre_parse.parse(regex, re.MULTILINE)
+			# global state of the pattern (renamed in python 3.8):
+			state = getattr(parsed, 'state', None) or parsed.pattern
+			flags = state.flags
+		except Exception: # pragma: no cover - internals of other python versions
+			return []
+		if flags & sre_constants.SRE_FLAG_IGNORECASE:
+			return []
+		literals = set()
+		def _walk(data):
+			run = []
+			for op, av in data:
+				if op is sre_constants.LITERAL and av < 128:
+					run.append(chr(av))
+					continue
+				# any other token breaks the literal sequence:
+				if len(run) >= Regex.MIN_LITERAL_LEN:
+					literals.add("".join(run))
+				run = []
+				if op is sre_constants.SUBPATTERN:
+					# python >= 3.6 contains scoped flags in subpattern:
+					if len(av) > 2 and av[1] & sre_constants.SRE_FLAG_IGNORECASE: # pragma: no cover
+						continue
+					_walk(av[-1])
+				elif op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT) \
+						and av[0] >= 1:
+					# repeated at least once - content is required:
+					_walk(av[2])
+			if len(run) >= Regex.MIN_LITERAL_LEN:
+				literals.add("".join(run))
+		try:
+			_walk(parsed.data)
+		except Exception: # pragma: no cover - internals of other python versions
+			# no prefiltering:
+			return []
+		return sorted(literals, key=lambda l: (-len(l), l))
+
+	##
+	# Enables or disables the cost profiling of the search.
+	#
+	# @param sample measure time of each sample-th search (0 to disable)
+
+	def setPerfSample(self, sample):
+		self._perfStats = PerfStats(sample) if sample else None
+
+	##
+	# Gets the cost statistics of the search.
+	#
+	# @return PerfStats object or None if profiling is disabled
+
+	def getPerfStats(self):
+		return self._perfStats
+
+	##
+	# Gets the literal fragments used to prefilter.
+	#
+	# @return list of literal strings
+
+	def getLiterals(self):
+		return self._literals
+
+	##
+	# Checks the string contains all required literal fragments.
+	#
+	# @param string the string to check
+	# @return False if the regular expression cannot match the string
+
+	def prefilter(self, string):
+		for literal in self._literals:
+			if literal not in string:
+				return False
+		return True
 
 	def __str__(self):
 		return "%s(%r)" % (self.__class__.__name__, self._regex)
@@ -76,29 +271,40 @@ class Regex:
 	# Sets an internal cache (match object) in order to avoid searching for
 	# the pattern again. This method must be called before calling any other
 	# method of this object.
-	# @param a list of tupples. The tupples are ( prematch, datematch, postdatematch )
+	# @param tupleLines a LineBuffer or a list of tupples. The tupples are
+	# ( prematch, datematch, postdatematch )
 	
 	def search(self, tupleLines):
-		self._matchCache = self._regexObj.search(
-			"\n".join("".join(value[::2]) for value in tupleLines) + "\n")
+		stats = self._perfStats
+		if stats is None:
+			return self._search(tupleLines)
+		started = stats.start()
+		self._search(tupleLines)
+		stats.stop(started, self._matchCache)
+
+	def _search(self, tupleLines):
+		if not isinstance(tupleLines, LineBuffer):
+			tupleLines = LineBuffer(0, tupleLines)
+		string = tupleLines.getText()
+		# cheap substring test before the regex engine:
+		if not self.prefilter(string):
+			self._matchCache = None
+			return
+		self._matchCache = self._regexObj.search(string)
 		if self.hasMatched():
-			# Find start of the first line where the match was found
-			try:
-				self._matchLineStart = self._matchCache.string.rindex(
-					"\n", 0, self._matchCache.start() +1 ) + 1
-			except ValueError:
-				self._matchLineStart = 0
-			# Find end of the last line where the match was found
-			try:
-				self._matchLineEnd = self._matchCache.string.index(
-					"\n", self._matchCache.end() - 1) + 1
-			except ValueError:
-				self._matchLineEnd = len(self._matchCache.string)
-
-			lineCount1 = self._matchCache.string.count(
-				"\n", 0, self._matchLineStart)
-			lineCount2 = self._matchCache.string.count(
-				"\n", 0, self._matchLineEnd)
+			# Count of lines before the first line where the match was found
+			# (a match starting at new line char belongs to the next line)
+			start = self._matchCache.start()
+			lineCount1 = tupleLines.countLines(start)
+			if string[start:start+1] == "\n":
+				lineCount1 += 1
+			# Count of lines until the end of the last line where the match
+			# was found
+			end = self._matchCache.end() - 1
+			if end < 0:
+				end = len(string) - 1
+			lineCount2 = tupleLines.countLines(end) + 1
+			tupleLines = tupleLines.getLines()
 			self._matchedTupleLines = tupleLines[lineCount1:lineCount2]
 			self._unmatchedTupleLines = tupleLines[:lineCount1]
 
@@ -186,6 +392,208 @@ class Regex:
 			return ["".join(line) for line in self._matchedTupleLines]
 
 
+##
+# Combined regular expression class.
+#
+# This class merges a list of Regex objects into as few compiled alternations
+# as possible, so that a buffer which is not matched by any of them can be
+# rejected by a single pass of the regex engine instead of one pass for each
+# expression. The common leading part of all expressions (mostly the prefix
+# line of the filter) is searched once only. Named groups are renamed per
+# alternative to avoid clashes (e.g. several "host" groups). Expressions which
+# cannot be safely merged (global inline flags, numeric back references) are
+# kept in an own chunk.
+
+class CombinedRegex:
+
+	# Maximal count of groups per compiled chunk (python 2.x supports 100).
+	MAX_GROUPS = 99
+
+	_RE_GROUP_REF = re.compile(
+		r"\\(?:(?P<num>[1-9])|.)|\(\?P<(?P<def>\w+)>|\(\?P=(?P<ref>\w+)\)|\(\?\((?P<cond>\w+)\)")
+	_RE_GLOBAL_FLAGS = re.compile(r"(?<!\\)\(\?[iLmsux]+\)")
+
+	##
+	# Constructor.
+	#
+	# @param regexes list of Regex objects
+
+	def __init__(self, regexes):
+		self._chunks = []
+		chunk = []
+		groups = 0
+		for idx, regex in enumerate(regexes):
+			body = self._branch(idx, regex)
+			if body is None:
+				self._flush(chunk)
+				chunk, groups = [], 0
+				# search this expression alone using own compiled object:
+				self._chunks.append((regex._regexObj, (regex,)))
+				continue
+			cnt = regex._regexObj.groups
+			if chunk and groups + cnt > self.MAX_GROUPS:
+				self._flush(chunk)
+				chunk, groups = [], 0
+			chunk.append((idx, body, regex))
+			groups += cnt
+		self._flush(chunk)
+
+	##
+	# Returns the expression with named groups renamed for the alternative
+	# idx, or None if the expression cannot be combined with others.
+
+	def _branch(self, idx, regex):
+		if regex._regexObj.groups > self.MAX_GROUPS:
+			return None
+		regex = regex.getRegex()
+		# global inline flags would affect all other alternatives:
+		if self._RE_GLOBAL_FLAGS.search(regex):
+			return None
+		numRef = []
+		def _rename(m):
+			if m.group('num'):
+				numRef.append(m.group('num'))
+			if m.group('def'):
+				return '(?P<_cr%d_%s>' % (idx, m.group('def'))
+			if m.group('ref'):
+				return '(?P=_cr%d_%s)' % (idx, m.group('ref'))
+			if m.group('cond'):
+				if m.group('cond').isdigit():
+					numRef.append(m.group('cond'))
+				return '(?(_cr%d_%s)' % (idx, m.group('cond'))
+			return m.group(0)
+		regex = self._RE_GROUP_REF.sub(_rename, regex)
+		if numRef:
+			return None
+		return regex
+
+	##
+	# Returns positions in the expression, where it can be split (outside of
+	# groups and character classes), or None if it contains an alternation
+	# on the top level (so cannot be split at all).
+
+	@staticmethod
+	def _escapeLength(regex, i):
+		# length of the escape sequence at position i (incl. the backslash):
+		c = regex[i+1:i+2]
+		if c in ('x', 'u', 'U'):
+			size = {'x': 2, 'u': 4, 'U': 8}[c]
+			j = i + 2
+			while j < i + 2 + size and regex[j:j+1] in string.hexdigits:
+				j += 1
+			return j - i
+		if c.isdigit():
+			# octal escape or group reference (up to 3 digits):
+			j = i + 2
+			while j < i + 4 and regex[j:j+1].isdigit():
+				j += 1
+			return j - i
+		return 2
+
+	@staticmethod
+	def _splitPoints(regex):
+		points = [0]
+		depth = 0
+		inClass = False
+		i, n = 0, len(regex)
+		while i < n:
+			c = regex[i]
+			if c == '\\':
+				i += CombinedRegex._escapeLength(regex, i)
+			elif inClass:
+				if c == ']':
+					inClass = False
+				i += 1
+			elif c == '[':
+				inClass = True
+				i += 1
+				# leading "]" (also after "^") is a literal:
+				if regex[i:i+1] == '^':
+					i += 1
+				if regex[i:i+1] == ']':
+					i += 1
+			else:
+				if c == '(':
+					depth += 1
+				elif c == ')':
+					depth -= 1
+				elif c == '|' and not depth:
+					return None
+				i += 1
+			if not depth and not inClass:
+				points.append(i)
+		return points
+
+	##
+	# Returns the length of the common leading part of all expressions, that
+	# can be searched once for all of them.
+
+	def _commonPrefix(self, bodies):
+		prefix = os.path.commonprefix(bodies)
+		if not prefix:
+			return 0
+		points = None
+		for body in bodies:
+			bodyPoints = self._splitPoints(body)
+			if bodyPoints is None:
+				return 0
+			# split points within the prefix, common to all expressions (an
+			# escape sequence may continue behind the prefix differently):
+			bodyPoints = set(p for p in bodyPoints if p <= len(prefix))
+			points = bodyPoints if points is None else (points & bodyPoints)
+		for pos in sorted(points, reverse=True):
+			# must be not followed by a repeat in any expression:
+			if not any(body[pos:pos+1] in ('*', '+', '?', '{') for body in bodies):
+				return pos
+		return 0 # pragma: no cover - 0 is always a split point
+
+	def _flush(self, chunk):
+		if not chunk:
+			return
+		if len(chunk) > 1:
+			bodies = [b for i, b, r in chunk]
+			pos = self._commonPrefix(bodies)
+			regex = "%s(?:%s)" % (bodies[0][:pos], "|".join(
+				"(?:%s)" % b[pos:] for i, b, r in chunk))
+			try:
+				self._chunks.append((re.compile(regex, re.MULTILINE),
+					[r for i, b, r in chunk]))
+				return
+			except (sre_constants.error, AssertionError, OverflowError): # pragma: no cover
+				pass
+		# single or not compilable together - search each expression alone:
+		for i, b, r in chunk:
+			self._chunks.append((r._regexObj, (r,)))
+
+	##
+	# Searches all expressions in the text.
+	#
+	# It is a prefilter only: which expression matched is not reported, the
+	# caller searches the expressions one by one (in their order) if any
+	# of them matches.
+	#
+	# @param text the (multi-line) text, as it would be searched by Regex
+	# @return True if any expression matches the text
+
+	def search(self, text):
+		for regexObj, regexes in self._chunks:
+			# skip the regex engine if no expression can match:
+			for regex in regexes:
+				if regex.prefilter(text):
+					break
+			else:
+				continue
+			if regexObj.search(text):
+				return True
+		return False
+
+	##
+	# Returns the count of compiled chunks (for diagnostic purposes).
+
+	def getChunkCount(self):
+		return len(self._chunks)
+
+
 ##
 # Exception dedicated to the class Regex.
 
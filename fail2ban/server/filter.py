@@ -25,19 +25,24 @@ import codecs
 import fcntl
 import locale
 import logging
+import multiprocessing
 import os
+from multiprocessing.pool import ThreadPool
 import re
 import sys
 
-from .failmanager import FailManagerEmpty, FailManager
+from .failmanager import FailManager
 from .ticket import FailTicket
 from .jailthread import JailThread
 from .datedetector import DateDetector
 from .datetemplate import DatePatternRegex, DateEpoch, DateTai64n
 from .mytime import MyTime
-from .failregex import FailRegex, Regex, RegexException
+from .failregex import FailRegex, Regex, RegexException, CombinedRegex, \
+	LineBuffer
 from .action import CommandAction
-from ..helpers import getLogger
+from .logcache import LogBlockCache
+from .logrotated import findRotatedLogs, openRotatedLog
+from ..helpers import getLogger, _as_bool
 
 # Gets the instance of the logger.
 logSys = getLogger(__name__)
@@ -66,8 +71,14 @@ class Filter(JailThread):
 		self.failManager = FailManager()
 		## The regular expression list matching the failures.
 		self.__failRegex = list()
+		## Search all failregex in a single pass before the regex loop.
+		self.__combineRegex = False
+		## The combined failregex (built on demand).
+		self.__failRegexCombined = None
 		## The regular expression list with expressions to ignore.
 		self.__ignoreRegex = list()
+		## Cost profiling of regex and date templates (sample rate, 0 - off)
+		self.__perfSample = 0
 		## Use DNS setting
 		self.setUseDns(useDns)
 		## The amount of time to look back.
@@ -77,7 +88,7 @@ class Filter(JailThread):
 		## Size of line buffer
 		self.__lineBufferSize = 1
 		## Line buffer
-		self.__lineBuffer = []
+		self.__lineBuffer = LineBuffer(self.__lineBufferSize)
 		## Store last time stamp, applicable for multi-line
 		self.__lastTimeText = ""
 		self.__lastDate = None
@@ -103,7 +114,9 @@ class Filter(JailThread):
 	def addFailRegex(self, value):
 		try:
 			regex = FailRegex(value)
+			regex.setPerfSample(self.__perfSample)
 			self.__failRegex.append(regex)
+			self.__failRegexCombined = None
 			if "\n" in regex.getRegex() and not self.getMaxLines() > 1:
 				logSys.warning(
 					"Mutliline regex set for jail '%s' "
@@ -115,6 +128,7 @@ class Filter(JailThread):
 	def delFailRegex(self, index):
 		try:
 			del self.__failRegex[index]
+			self.__failRegexCombined = None
 		except IndexError:
 			logSys.error("Cannot remove regular expression. Index %d is not "
 						 "valid" % index)
@@ -130,6 +144,44 @@ class Filter(JailThread):
 			failRegex.append(regex.getRegex())
 		return failRegex
 
+	##
+	# Get the literal fragments required by each failregex.
+	#
+	# A single line can produce a failure only if it contains all fragments
+	# of at least one failregex, so the lines can be prefiltered by them.
+	# @return list of lists of literal strings, or None if the lines cannot
+	# be prefiltered (no failregex, a failregex without literals or maxlines
+	# greater than 1, because each line would be part of the buffer)
+
+	def getFailRegexLiterals(self):
+		if not self.__failRegex or self.getMaxLines() > 1:
+			return None
+		literals = [regex.getLiterals() for regex in self.__failRegex]
+		if not all(literals):
+			return None
+		return literals
+
+	##
+	# Set the combined failregex mode.
+	#
+	# If enabled, all failregex are searched at once in a single pass
+	# of the regex engine, and the (more expensive) search of each regex
+	# is performed only if any of them matches.
+	# @param value boolean or string ("true", "yes", "on", "1")
+
+	def setCombineRegex(self, value):
+		self.__combineRegex = _as_bool(value)
+		self.__failRegexCombined = None
+		logSys.info("Set combineregex = %s" % self.__combineRegex)
+
+	##
+	# Get the combined failregex mode.
+	#
+	# @return True if combined failregex mode is enabled
+
+	def getCombineRegex(self):
+		return self.__combineRegex
+
 	##
 	# Add the regular expression which matches the failure.
 	#
@@ -140,6 +192,7 @@ class Filter(JailThread):
 	def addIgnoreRegex(self, value):
 		try:
 			regex = Regex(value)
+			regex.setPerfSample(self.__perfSample)
 			self.__ignoreRegex.append(regex)
 		except RegexException as e:
 			logSys.error(e)
@@ -223,6 +276,7 @@ class Filter(JailThread):
 		else:
 			template = DatePatternRegex(pattern)
 		self.dateDetector = DateDetector()
+		self.dateDetector.setPerfSample(self.__perfSample)
 		self.dateDetector.appendTemplate(template)
 		logSys.info("Date pattern set to `%r`: `%s`" %
 			(pattern, template.name))
@@ -246,6 +300,66 @@ class Filter(JailThread):
 					pattern = None
 				return pattern, templates[0].name
 
+	##
+	# Set the sample rate of the cost profiling.
+	#
+	# If enabled, calls and hits of each failregex, ignoreregex and date
+	# template are counted, and the time of each value-th call is measured.
+	# Setting it resets the statistics.
+	# @param value the sample rate (0 disables profiling)
+
+	def setPerfSample(self, value):
+		value = int(value)
+		if value < 0:
+			raise ValueError("perfsample must be positive integer or 0")
+		self.__perfSample = value
+		for regex in self.__failRegex + self.__ignoreRegex:
+			regex.setPerfSample(value)
+		if self.dateDetector is not None:
+			self.dateDetector.setPerfSample(value)
+		logSys.info("Set perfsample = %i" % value)
+
+	##
+	# Get the sample rate of the cost profiling.
+	#
+	# @return the sample rate (0 if disabled)
+
+	def getPerfSample(self):
+		return self.__perfSample
+
+	##
+	# Reset the cost statistics of failregex, ignoreregex and date templates.
+
+	def resetPerfStats(self):
+		self.setPerfSample(self.__perfSample)
+		if self.dateDetector is not None:
+			for template in self.dateDetector.templates:
+				if template.parseCache is not None:
+					template.parseCache.reset()
+
+	##
+	# Get the cost statistics as list of (name, statistic) pairs.
+	#
+	# @return the list of statistics
+
+	def getPerfStats(self):
+		ret = []
+		for name, regexs in (
+			("Failregex", self.__failRegex), ("Ignoreregex", self.__ignoreRegex)
+		):
+			for idx, regex in enumerate(regexs):
+				if regex.getPerfStats() is not None:
+					ret.append(("%s #%d" % (name, idx), str(regex.getPerfStats())))
+		if self.dateDetector is not None:
+			for template in self.dateDetector.templates:
+				if template.perfStats is not None and template.perfStats.calls:
+					ret.append(("Date template %s" % template.name,
+						str(template.perfStats)))
+				cache = template.parseCache
+				if cache is not None and (cache.hits or cache.misses):
+					ret.append(("Date cache %s" % template.name, str(cache)))
+		return ret
+
 	##
 	# Set the maximum retry value.
 	#
@@ -272,6 +386,9 @@ class Filter(JailThread):
 		if int(value) <= 0:
 			raise ValueError("maxlines must be integer greater than zero")
 		self.__lineBufferSize = int(value)
+		self.__lineBuffer.setMaxLines(self.__lineBufferSize)
+		# buffered lines are part of the matches of several failures:
+		self.failManager.setInternMatches(self.__lineBufferSize > 1)
 		logSys.info("Set maxlines = %i" % self.__lineBufferSize)
 
 	##
@@ -342,12 +459,9 @@ class Filter(JailThread):
 			self.failManager.addFailure(FailTicket(ip, unixTime))
 
 		# Perform the banning of the IP now.
-		try: # pragma: no branch - exception is the only way out
-			while True:
-				ticket = self.failManager.toBan()
-				self.jail.putFailTicket(ticket)
-		except FailManagerEmpty:
-			self.failManager.cleanup(MyTime.time())
+		for ticket in self.failManager.toBanAll():
+			self.jail.putFailTicket(ticket)
+		self.failManager.cleanup(MyTime.time())
 
 		return ip
 
@@ -442,8 +556,11 @@ class Filter(JailThread):
 				return uni_decode(x, enc, 'replace')
 
 	def processLine(self, line, date=None, returnRawHost=False,
-		checkAllRegex=False, checkFindTime=False):
+		checkAllRegex=False, checkFindTime=False, container=None):
 		"""Split the time portion from log msg and return findFailures on them
+
+		If `container` (log file) given, its pinned date template is tried
+		first, and the template matched the line gets pinned.
 		"""
 		if date:
 			tupleLine = line
@@ -451,8 +568,16 @@ class Filter(JailThread):
 			l = line.rstrip('\r\n')
 			logSys.log(7, "Working on line %r", line)
 
-			timeMatch = self.dateDetector.matchTime(l)
+			# single pass: find the time and parse it from the found match
+			if container is None:
+				timeMatch = self.dateDetector.findTime(l)
+			else:
+				timeMatch = self.dateDetector.findTime(l,
+					container.getDateTemplate())
 			if timeMatch:
+				date, timeMatch, template = timeMatch
+				if container is not None:
+					container.setDateTemplate(template.name)
 				tupleLine  = (
 					l[:timeMatch.start()],
 					l[timeMatch.start():timeMatch.end()],
@@ -463,10 +588,11 @@ class Filter(JailThread):
 		return "".join(tupleLine[::2]), self.findFailure(
 			tupleLine, date, returnRawHost, checkAllRegex, checkFindTime)
 
-	def processLineAndAdd(self, line, date=None):
+	def processLineAndAdd(self, line, date=None, container=None):
 		"""Processes the line for failures and populates failManager
 		"""
-		for element in self.processLine(line, date, checkFindTime=True)[1]:
+		for element in self.processLine(line, date, checkFindTime=True,
+				container=container)[1]:
 			ip = element[1]
 			unixTime = element[2]
 			lines = element[3]
@@ -537,9 +663,16 @@ class Filter(JailThread):
 				date, MyTime.time(), self.getFindTime())
 			return failList
 
-		self.__lineBuffer = (
-			self.__lineBuffer + [tupleLine])[-self.__lineBufferSize:]
-		logSys.log(5, "Looking for failregex match of %r" % self.__lineBuffer)
+		self.__lineBuffer.append(tupleLine)
+		logSys.log(5, "Looking for failregex match of %r", self.__lineBuffer)
+
+		# Single pass over all failregex, if nothing matches - nothing to do.
+		if self.__combineRegex and self.__failRegex:
+			if self.__failRegexCombined is None:
+				self.__failRegexCombined = CombinedRegex(self.__failRegex)
+			if not self.__failRegexCombined.search(
+					self.__lineBuffer.getText()):
+				return failList
 
 		# Iterates over all the regular expressions.
 		for failRegexIndex, failRegex in enumerate(self.__failRegex):
@@ -551,7 +684,8 @@ class Filter(JailThread):
 				if self.ignoreLine(failRegex.getMatchedTupleLines()) \
 						is not None:
 					# The ignoreregex matched. Remove ignored match.
-					self.__lineBuffer = failRegex.getUnmatchedTupleLines()
+					self.__lineBuffer.setLines(
+						failRegex.getUnmatchedTupleLines())
 					logSys.log(7, "Matched ignoreregex and was ignored")
 					if not checkAllRegex:
 						break
@@ -568,7 +702,8 @@ class Filter(JailThread):
 						"in order to get support for this format."
 						 % ("\n".join(failRegex.getMatchedLines()), timeText))
 				else:
-					self.__lineBuffer = failRegex.getUnmatchedTupleLines()
+					self.__lineBuffer.setLines(
+						failRegex.getUnmatchedTupleLines())
 					try:
 						host = failRegex.getHost()
 						if returnRawHost or self.__useDns == "raw":
@@ -593,6 +728,9 @@ class Filter(JailThread):
 		"""
 		ret = [("Currently failed", self.failManager.size()),
 		       ("Total failed", self.failManager.getFailTotal())]
+		if flavor == "perf":
+			ret.append(("Perf sample", self.__perfSample or "off"))
+			ret += self.getPerfStats()
 		return ret
 
 
@@ -602,6 +740,14 @@ class FileFilter(Filter):
 		Filter.__init__(self, jail, **kwargs)
 		## The log file path.
 		self.__logs = dict()
+		## Log files without known position (to seek to find time on first read).
+		self.__autoSeek = set()
+		## Keep the log files open between the reads.
+		self.__logKeepOpen = False
+		## Count of worker threads to catch up the backlog on start.
+		self.__logWorkers = 1
+		## Catch up the rotated siblings of log files without known position.
+		self.__logRotated = False
 
 	##
 	# Add a log file path
@@ -612,12 +758,16 @@ class FileFilter(Filter):
 		if path in self.__logs:
 			logSys.error(path + " already exists")
 		else:
-			log = FileContainer(path, self.getLogEncoding(), tail)
+			log = FileContainer(path, self.getLogEncoding(), tail,
+				self.__logKeepOpen)
+			lastpos = None
 			db = self.jail.database
 			if db is not None:
 				lastpos = db.addLog(self.jail, log)
 				if lastpos and not tail:
 					log.setPos(lastpos)
+			if not lastpos and not tail:
+				self.__autoSeek.add(path)
 			self.__logs[path] = log
 			logSys.info("Added logfile = %s" % path)
 			self._addLogPath(path)			# backend specific
@@ -637,6 +787,9 @@ class FileFilter(Filter):
 			log = self.__logs.pop(path)
 		except KeyError:
 			return
+		self.__autoSeek.discard(path)
+		# the kept open handle is closed after read (or with the container):
+		log.setKeepOpen(False)
 		db = self.jail.database
 		if db is not None:
 			db.updateLog(self.jail, log)
@@ -679,6 +832,136 @@ class FileFilter(Filter):
 	def getLog(self, path):
 		return self.__logs.get(path, None)
 
+	##
+	# Set whether the log files are kept open between the reads
+	#
+	# @param value the new value (bool or string)
+
+	def setLogKeepOpen(self, value):
+		value = _as_bool(value)
+		self.__logKeepOpen = value
+		for log in self.__logs.itervalues():
+			log.setKeepOpen(value)
+
+	def getLogKeepOpen(self):
+		return self.__logKeepOpen
+
+	##
+	# Set the count of worker threads to catch up the backlog on start
+	#
+	# @param value the count of processes or "auto" (count of CPUs)
+
+	def setLogWorkers(self, value):
+		if str(value).lower() == "auto":
+			try:
+				value = multiprocessing.cpu_count()
+			except NotImplementedError: # pragma: no cover
+				value = 1
+		value = int(value)
+		if value < 1:
+			raise ValueError("logworkers must be positive integer or 'auto'")
+		self.__logWorkers = value
+		logSys.info("Set logworkers = %i" % value)
+
+	def getLogWorkers(self):
+		return self.__logWorkers
+
+	##
+	# Set whether the rotated logs are read back to findtime on first read
+	#
+	# @param value the new value (bool or string)
+
+	def setLogRotated(self, value):
+		self.__logRotated = _as_bool(value)
+
+	def getLogRotated(self):
+		return self.__logRotated
+
+	def __getIngestOptions(self):
+		# options to build the own filter of a worker:
+		datePattern = None
+		if self.dateDetector is not None \
+				and len(self.dateDetector.templates) == 1:
+			pattern, name = self.getDatePattern()
+			datePattern = pattern if pattern is not None else name
+		return {
+			'now': MyTime.time(),
+			'failregex': self.getFailRegex(),
+			'ignoreregex': self.getIgnoreRegex(),
+			'combineregex': self.getCombineRegex(),
+			'maxlines': self.getMaxLines(),
+			'usedns': self.getUseDns(),
+			'findtime': self.getFindTime(),
+			'datepattern': datePattern,
+			'logrotated': self.__logRotated,
+		}
+
+	##
+	# Catches up the backlog of the log files in worker threads.
+	#
+	# Used on start of the filter: the files with unread content are spread
+	# over a pool of threads (reading of the files overlaps), the failures
+	# found in all files are merged into the failManager in timestamp order
+	# and the positions of the files are advanced, then the filter continues
+	# with the normal tailing. Threads are used, because a process forked
+	# in the multi-threaded server could deadlock on locks (e.g. of logging)
+	# held by other threads at fork time.
+	# @return True if the backlog was processed by the workers
+
+	def ingestLogs(self):
+		if self.__logWorkers < 2:
+			return False
+		options = self.__getIngestOptions()
+		tasks = []
+		for log in self.getLogs():
+			filename = log.getFileName()
+			try:
+				if os.path.getsize(filename) <= log.getPos():
+					continue
+			except OSError:
+				continue
+			tasks.append((options, filename, log.getEncoding(), log.getPos(),
+				log.getHash(), log.getDateTemplate(), filename in self.__autoSeek))
+		if len(tasks) < 2:
+			return False
+		workers = min(self.__logWorkers, len(tasks))
+		logSys.info("Catching up %d log files using %d workers",
+			len(tasks), workers)
+		try:
+			pool = ThreadPool(workers)
+			try:
+				results = pool.map(_ingestLog, tasks, chunksize=1)
+			finally:
+				pool.close()
+				pool.join()
+		except Exception as e:
+			logSys.error("Catching up of the logs in workers failed: %s", e)
+			return False
+		failures = []
+		db = self.jail.database
+		for result in results:
+			if result is None: # rotated meanwhile - read by the filter itself
+				continue
+			filename, pos, dateTemplate, found = result
+			log = self.getLog(filename)
+			if log is None: # removed meanwhile
+				continue
+			failures.extend(found)
+			log.setPos(pos)
+			if dateTemplate is not None:
+				log.setDateTemplate(dateTemplate)
+			self.__autoSeek.discard(filename)
+			if db is not None:
+				db.updateLog(self.jail, log)
+		# merge the failures of all files in timestamp order (stable sort):
+		failures.sort(key=lambda failure: failure[0])
+		for unixTime, ip, lines in failures:
+			if self.inIgnoreIPList(ip, log_ignore=True):
+				continue
+			logSys.info("[%s] Found %s" % (self.jail.name, ip))
+			self.failManager.addFailure(FailTicket(ip, unixTime, lines))
+		return True
+
 	##
 	# Gets all the failure in the log file.
 	#
@@ -692,6 +975,7 @@ class FileFilter(Filter):
 			logSys.error("Unable to get failures in " + filename)
 			return False
 		# Try to open log file.
+		prevHash = log.getHash()
 		try:
 			has_content = log.open()
 		# see http://python.org/dev/peps/pep-3151/
@@ -708,6 +992,19 @@ class FileFilter(Filter):
 			logSys.exception(e)
 			return False
 
+		# first read without known position - catch up the rotated logs and
+		# skip lines older as find time:
+		if filename in self.__autoSeek:
+			self.__autoSeek.discard(filename)
+			if self.__logRotated:
+				self.__readRotatedLogs(filename, log.getEncoding())
+			if has_content:
+				pos = log.seekToTime(MyTime.time() - self.getFindTime(),
+					self.__getLineTime)
+				if pos is not None:
+					logSys.info("Skipped lines older as findtime in %s, start at %d",
+						filename, pos)
+
 		# yoh: has_content is just a bool, so do not expect it to
 		# change -- loop is exited upon break, and is not entered at
 		# all if upon container opening that one was empty.  If we
@@ -718,19 +1015,34 @@ class FileFilter(Filter):
 			if not line or not self.active:
 				# The jail reached the bottom or has been stopped
 				break
-			self.processLineAndAdd(line)
+			self.processLineAndAdd(line, container=log)
 		log.close()
 		db = self.jail.database
 		if db is not None:
-			db.updateLog(self.jail, log)
+			# write the positions at once if the log was rotated:
+			db.updateLog(self.jail, log, flush=log.getHash() != prevHash)
 		return True
 
+	def __getLineTime(self, line):
+		date = self.dateDetector.getTime(line)
+		return date[0] if date else None
+
+	def __readRotatedLogs(self, filename, encoding):
+		since = MyTime.time() - self.getFindTime()
+		for line in _rotatedLogLines(filename, encoding, since,
+				self.__getLineTime):
+			if not self.active:
+				break
+			self.processLineAndAdd(line)
+
 	def status(self, flavor="basic"):
 		"""Status of Filter plus files being monitored.
 		"""
 		ret = super(FileFilter, self).status(flavor=flavor)
 		path = self.__logs.keys()
 		ret.append(("File list", path))
+		if flavor == "perf":
+			ret.append(("Shared log blocks", str(FileContainer.sharedBlocks)))
 		return ret
 
 ##
@@ -757,11 +1069,30 @@ except ImportError: # pragma: no cover
 
 class FileContainer:
 
-	def __init__(self, filename, encoding, tail = False):
+	# size of the blocks read (and decoded) at once:
+	READ_BLOCK_SIZE = 0x10000
+	# max count of lines looked for date by sampling in seekToTime:
+	SEEK_SAMPLE_LINES = 100
+	# blocks of files monitored by several jails are read and decoded once:
+	sharedBlocks = LogBlockCache()
+
+	def __init__(self, filename, encoding, tail = False, keepOpen = False,
+		shared = True):
 		self.__filename = filename
+		self.__path = LogBlockCache.getPath(filename)
+		# short-lived containers (one-shot reads) are not registered as readers:
+		if shared:
+			FileContainer.sharedBlocks.subscribe(self.__path, self)
 		self.setEncoding(encoding)
 		self.__tail = tail
+		# keep the file open between the reads (close does not close it):
+		self.__keepOpen = keepOpen
 		self.__handler = None
+		# size of the file seen by last open:
+		self.__size = 0
+		self.__resetBuffer(0)
+		# name of the date template pinned for this file (matched recently):
+		self.__dateTemplate = None
 		# Try to open the file. Raises an exception if an error occurred.
 		handler = open(filename, 'rb')
 		stats = os.fstat(handler.fileno())
@@ -798,7 +1129,21 @@ class FileContainer:
 	def setPos(self, value):
 		self.__pos = value
 
+	def getKeepOpen(self):
+		return self.__keepOpen
+
+	def setKeepOpen(self, value):
+		self.__keepOpen = value
+
+	def getDateTemplate(self):
+		return self.__dateTemplate
+
+	def setDateTemplate(self, name):
+		self.__dateTemplate = name
+
 	def open(self):
+		if self.__handler is not None and self.__reuse():
+			return self.__size > 0
 		self.__handler = open(self.__filename, 'rb')
 		# Set the file descriptor to be FD_CLOEXEC
 		fd = self.__handler.fileno()
@@ -806,6 +1151,7 @@ class FileContainer:
 		fcntl.fcntl(fd, fcntl.F_SETFD, flags | fcntl.FD_CLOEXEC)
 		# Stat the file before even attempting to read it
 		stats = os.fstat(self.__handler.fileno())
+		self.__size = stats.st_size
 		if not stats.st_size:
 			# yoh: so it is still an empty file -- nothing should be
 			#      read from it yet
@@ -826,6 +1172,164 @@ class FileContainer:
 			self.__pos = 0
 		# Sets the file pointer to the last position.
 		self.__handler.seek(self.__pos)
+		self.__resetBuffer(self.__pos)
+		return True
+
+	def __reuse(self):
+		# Checks the file is still the same, to continue with the kept open
+		# handle. Rotation is detected by the inode and size, the first line
+		# is hashed only if the size is ambiguous (shrunk, but not below the
+		# position). Returns False if the file should be opened again.
+		try:
+			stats = os.stat(self.__filename)
+		except OSError:
+			self.__closeHandler()
+			raise
+		if stats.st_ino != self.__ino:
+			# rotated (moved away) - open the new one:
+			self.__closeHandler()
+			return False
+		if stats.st_size < self.__pos:
+			logSys.log(logging.MSG, "Log truncation detected for %s", self.__filename)
+			self.__pos = 0
+			self.__handler.seek(0)
+			self.__hash = md5sum(self.__handler.readline()).hexdigest()
+		elif stats.st_size < self.__size:
+			self.__handler.seek(0)
+			myHash = md5sum(self.__handler.readline()).hexdigest()
+			if myHash != self.__hash:
+				logSys.log(logging.MSG, "Log rotation detected for %s", self.__filename)
+				self.__hash = myHash
+				self.__pos = 0
+		self.__size = stats.st_size
+		self.__handler.seek(self.__pos)
+		self.__resetBuffer(self.__pos)
+		return True
+
+	def __sampleTime(self, offset, limit, getTime):
+		# time of the first line with date, beginning in [offset, limit):
+		handler = self.__handler
+		handler.seek(offset)
+		if offset:
+			# skip the rest of the line:
+			offset += len(handler.readline())
+		for i in xrange(self.SEEK_SAMPLE_LINES):
+			if offset >= limit:
+				break
+			line = handler.readline()
+			if not line:
+				break
+			date = getTime(line.decode(self.getEncoding(), 'replace'))
+			if date is not None:
+				return offset, date
+			offset += len(line)
+		return None
+
+	def seekToTime(self, date, getTime):
+		"""Seeks to a line shortly before the first line not older as `date`.
+
+		Binary search by byte offset: the time at a sampled offset is the
+		time of the first line with date (`getTime(line)`) following it.
+
+		Returns the new position, or None if the position was not changed
+		(small file, no older lines or dates are not monotonic).
+		"""
+		lo = self.__pos
+		hi = os.fstat(self.__handler.fileno()).st_size
+		if hi - lo <= self.READ_BLOCK_SIZE:
+			return None
+		samples = []
+		found = None
+		while hi - lo > self.READ_BLOCK_SIZE:
+			mid = (lo + hi) // 2
+			sample = self.__sampleTime(mid, hi, getTime)
+			if sample is None:
+				# no line with date in the upper half:
+				hi = mid
+				continue
+			samples.append(sample)
+			if sample[1] < date:
+				lo = sample[0]
+				found = sample
+			else:
+				hi = mid
+		# sampled times should grow with the offset, otherwise read all:
+		samples.sort()
+		for prev, sample in zip(samples, samples[1:]):
+			if prev[1] > sample[1]:
+				logSys.debug("Dates in %s are not monotonic, read whole file",
+					self.__filename)
+				found = None
+				break
+		if found is None:
+			self.__handler.seek(self.__pos)
+			return None
+		self.__pos = found[0]
+		self.__handler.seek(self.__pos)
+		self.__resetBuffer(self.__pos)
+		return self.__pos
+
+	def __resetBuffer(self, pos):
+		# file position of the first line in buffer:
+		self.__bufPos = pos
+		# decoded lines read in block, their sizes in bytes and next line:
+		self.__lines = []
+		self.__sizes = []
+		self.__idx = 0
+		# incomplete last line of the block:
+		self.__tailData = b""
+
+	def __readLines(self):
+		# all lines of the previous block are consumed:
+		self.__bufPos += sum(self.__sizes)
+		self.__lines, self.__sizes, self.__idx = [], [], 0
+		sharedKey = None
+		if FileContainer.sharedBlocks.isShared(self.__path):
+			# block may be already read by another jail:
+			sharedKey = (self.__path, self.__ino, self.__hash,
+				self.getEncoding(), self.__bufPos)
+			block = FileContainer.sharedBlocks.get(sharedKey)
+			if block is not None:
+				self.__lines, self.__sizes = block
+				self.__tailData = b""
+				self.__handler.seek(self.__bufPos + sum(self.__sizes))
+				return True
+		data = self.__tailData
+		while True:
+			block = self.__handler.read(self.READ_BLOCK_SIZE)
+			if not block:
+				# EOF, last line without new line is returned as is:
+				self.__tailData = b""
+				if not data:
+					return False
+				self.__lines = [FileContainer.decode_line(
+					self.getFileName(), self.getEncoding(), data)]
+				self.__sizes = [len(data)]
+				return True
+			data += block
+			end = data.rfind(b"\n") + 1
+			if end:
+				break
+		# complete lines only, rest remains for the next block:
+		self.__tailData = data[end:]
+		data = data[:end]
+		rawLines = data.split(b"\n")
+		rawLines.pop()
+		self.__sizes = [len(l) + 1 for l in rawLines]
+		# decode whole block at once, if fails - line by line (with replace):
+		try:
+			lines = data.decode(self.getEncoding(), 'strict').split(u"\n")
+			lines.pop()
+		except (UnicodeDecodeError, UnicodeEncodeError):
+			lines = None
+		if lines is not None and len(lines) == len(rawLines):
+			self.__lines = [l + u"\n" for l in lines]
+		else:
+			self.__lines = [FileContainer.decode_line(
+					self.getFileName(), self.getEncoding(), l + b"\n")
+				for l in rawLines]
+		if sharedKey is not None:
+			FileContainer.sharedBlocks.set(sharedKey, self.__lines, self.__sizes)
 		return True
 
 	@staticmethod
@@ -851,14 +1355,27 @@ class FileContainer:
 	def readline(self):
 		if self.__handler is None:
 			return ""
-		return FileContainer.decode_line(
-			self.getFileName(), self.getEncoding(), self.__handler.readline())
+		try:
+			line = self.__lines[self.__idx]
+		except IndexError:
+			if not self.__readLines():
+				return ""
+			line = self.__lines[0]
+		self.__idx += 1
+		return line
 
 	def close(self):
 		if not self.__handler is None:
-			# Saves the last position.
-			self.__pos = self.__handler.tell()
-			# Closes the file.
+			# Saves the last position (behind the last line returned).
+			self.__pos = self.__bufPos + sum(self.__sizes[:self.__idx])
+			self.__resetBuffer(self.__pos)
+			self.__size = max(self.__size, self.__pos)
+			# Closes the file (if not kept open).
+			if not self.__keepOpen:
+				self.__closeHandler()
+
+	def __closeHandler(self):
+		if self.__handler is not None:
 			self.__handler.close()
 			self.__handler = None
 		## print "D: Closed %s with pos %d" % (handler, self.__pos)
@@ -867,6 +1384,125 @@ class FileContainer:
 _decode_line_warn = {}
 
 
+def _rotatedLogLines(filename, encoding, since, getTime):
+	"""Generates the lines of the rotated siblings of the log file.
+
+	The rotated files modified since given time are read, the oldest first.
+	Plain files are read from the first line not older as `since` (binary
+	search), the compressed files are decompressed on the fly line by line
+	and the lines older as `since` are skipped without decoding (see
+	`_skipOlderLines`).
+	"""
+	for path, compression in findRotatedLogs(filename, since):
+		logSys.info("Reading rotated log %s", path)
+		try:
+			if compression is None:
+				container = FileContainer(path, encoding, shared=False)
+				if not container.open():
+					continue
+				try:
+					container.seekToTime(since, getTime)
+					while True:
+						line = container.readline()
+						if not line:
+							break
+						yield line
+				finally:
+					container.close()
+			else:
+				handler = openRotatedLog(path, compression)
+				try:
+					for line in _skipOlderLines(path, handler, since, getTime,
+							lambda line: FileContainer.decode_line(path, encoding, line)):
+						yield line
+				finally:
+					handler.close()
+		except (IOError, OSError, EOFError) as e:
+			logSys.error("Unable to read rotated log %s: %s", path, e)
+
+
+def _skipOlderLines(path, lines, since, getTime, decode,
+	sample=FileContainer.SEEK_SAMPLE_LINES
+):
+	"""Generates the decoded lines of a stream, beginning shortly before the
+	first line not older as `since`.
+
+	A (compressed) stream cannot be positioned, so its lines are skipped in
+	blocks: only each `sample`-th line is decoded and its time checked, while
+	it is older as `since` the whole block before it is dropped (the dates are
+	expected to be monotonic, the lines are checked against findtime later).
+	"""
+	lines = iter(lines)
+	block = []
+	skipped = 0
+	for line in lines:
+		block.append(line)
+		if len(block) < sample:
+			continue
+		date = getTime(decode(line))
+		if date is None:
+			# no date in this line - check the next one:
+			continue
+		if date < since:
+			skipped += len(block)
+			block = []
+			continue
+		break
+	if skipped:
+		logSys.info("Skipped %d lines older as findtime in %s", skipped, path)
+	for line in block:
+		yield decode(line)
+	for line in lines:
+		yield decode(line)
+
+
+def _ingestLog(task):
+	"""Finds the failures in the backlog of a log file.
+
+	Worker of `FileFilter.ingestLogs`, running in a separate thread with
+	its own filter built from the given options. Returns the file name,
+	the position to continue, the matched date template and the list of
+	failures (time, ip, lines), or None if the file was rotated meanwhile.
+	"""
+	options, filename, encoding, pos, fileHash, dateTemplate, autoSeek = task
+	flt = Filter(None, useDns=options['usedns'])
+	flt.setMaxLines(options['maxlines'])
+	flt.setCombineRegex(options['combineregex'])
+	for regex in options['failregex']:
+		flt.addFailRegex(regex)
+	for regex in options['ignoreregex']:
+		flt.addIgnoreRegex(regex)
+	if options['datepattern'] is not None:
+		flt.setDatePattern(options['datepattern'])
+	flt.setFindTime(options['findtime'])
+	findTime = options['now'] - options['findtime']
+	log = FileContainer(filename, encoding, shared=False)
+	if log.getHash() != fileHash:
+		return None
+	log.setPos(pos)
+	log.setDateTemplate(dateTemplate)
+	def getLineTime(line):
+		date = flt.dateDetector.getTime(line)
+		return date[0] if date else None
+	failures = []
+	if autoSeek and options['logrotated']:
+		for line in _rotatedLogLines(filename, encoding, findTime, getLineTime):
+			for element in flt.processLine(line, checkFindTime=True)[1]:
+				failures.append((element[2], element[1], element[3]))
+	if log.open():
+		if autoSeek:
+			log.seekToTime(findTime, getLineTime)
+		while True:
+			line = log.readline()
+			if not line:
+				break
+			for element in flt.processLine(line, checkFindTime=True,
+					container=log)[1]:
+				failures.append((element[2], element[1], element[3]))
+		log.close()
+	return filename, log.getPos(), log.getDateTemplate(), failures
+
+
 ##
 # JournalFilter class.
 #
@@ -28,7 +28,6 @@ import time
 
 import gamin
 
-from .failmanager import FailManagerEmpty
 from .filter import FileFilter
 from .mytime import MyTime
 from ..helpers import getLogger
@@ -77,12 +76,9 @@ class FilterGamin(FileFilter):
 		this is a common logic and must be shared/provided by FileFilter
 		"""
 		self.getFailures(path)
-		try:
-			while True:
-				ticket = self.failManager.toBan()
-				self.jail.putFailTicket(ticket)
-		except FailManagerEmpty:
-			self.failManager.cleanup(MyTime.time())
+		for ticket in self.failManager.toBanAll():
+			self.jail.putFailTicket(ticket)
+		self.failManager.cleanup(MyTime.time())
 		self.dateDetector.sortTemplate()
 		self.__modified = False
 
@@ -110,6 +106,10 @@ class FilterGamin(FileFilter):
 	# @return True when the thread exits nicely
 
 	def run(self):
+		# catch up the backlog in worker threads (if configured):
+		if self.ingestLogs():
+			for log in self.getLogs():
+				self._process_file(log.getFileName())
 		# Gamin needs a loop to collect and dispatch events
 		while self.active:
 			if not self.idle:
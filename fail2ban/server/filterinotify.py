@@ -0,0 +1,352 @@
+# emacs: -*- mode: python; py-indent-offset: 4; indent-tabs-mode: t -*-
+# vi: set ft=python sts=4 ts=4 sw=4 noet :
+
+# This file is part of Fail2Ban.
+#
+# Fail2Ban is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# Fail2Ban is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Fail2Ban; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+__author__ = "Fail2Ban Contributors"
+__license__ = "GPL"
+
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import sys
+import time
+from os.path import dirname, basename
+from threading import Lock
+
+from .filter import FileFilter
+from .mytime import MyTime
+from ..helpers import getLogger
+
+# Gets the instance of the logger.
+logSys = getLogger(__name__)
+
+
+# Kernel inotify interface (see inotify(7)), without pyinotify:
+
+try:
+	_libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6',
+		use_errno=True)
+	_inotify_init1 = _libc.inotify_init1
+	_inotify_add_watch = _libc.inotify_add_watch
+	_inotify_rm_watch = _libc.inotify_rm_watch
+except (OSError, AttributeError) as e: # pragma: no cover - not linux
+	raise ImportError("Native inotify is not available on this system: %s" % e)
+
+_inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+
+IN_MODIFY = 0x00000002
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+
+_EVENT_HEADER = struct.Struct('iIII') # wd, mask, cookie, len
+
+
+class INotify(object):
+	"""Minimal wrapper of the kernel inotify instance.
+
+	The file descriptor is non-blocking and close-on-exec, the events are
+	read in bulk (all queued events at once).
+	"""
+
+	def __init__(self):
+		self.fd = _inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+		if self.fd < 0:
+			e = ctypes.get_errno()
+			raise ImportError("Native inotify is not functional on this system: %s"
+				% os.strerror(e))
+
+	def fileno(self):
+		return self.fd
+
+	def addWatch(self, path, mask):
+		"""Adds (or updates) watch of the path, returns watch descriptor.
+		"""
+		if isinstance(path, unicode):
+			path = path.encode('utf-8')
+		wd = _inotify_add_watch(self.fd, path, mask)
+		if wd < 0:
+			e = ctypes.get_errno()
+			raise OSError(e, os.strerror(e), path)
+		return wd
+
+	def rmWatch(self, wd):
+		"""Removes watch, returns False if it was already removed.
+		"""
+		return _inotify_rm_watch(self.fd, wd) == 0
+
+	def readEvents(self):
+		"""Returns list of queued events as tuples (wd, mask, name).
+		"""
+		events = []
+		while True:
+			try:
+				buf = os.read(self.fd, 0x10000)
+			except OSError as e:
+				if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+					break
+				if e.errno == errno.EINTR: # pragma: no cover
+					continue
+				raise
+			if not buf: # pragma: no cover
+				break
+			pos = 0
+			size = len(buf)
+			while pos < size:
+				wd, mask, cookie, nlen = _EVENT_HEADER.unpack_from(buf, pos)
+				pos += _EVENT_HEADER.size
+				name = buf[pos:pos+nlen].rstrip(b'\0')
+				if not isinstance(name, str): # pragma: no cover - python 3
+					# compared with the names of the monitored files:
+					name = name.decode(sys.getfilesystemencoding(), 'surrogateescape')
+				pos += nlen
+				events.append((wd, mask, name))
+		return events
+
+	def close(self):
+		if self.fd >= 0:
+			os.close(self.fd)
+			self.fd = -1
+
+
+##
+# Log reader class.
+#
+# This class reads a log file and detects login failures or anything else
+# that matches a given regular expression. This class is instantiated by
+# a Jail object.
+#
+# It uses the kernel inotify interface directly and waits for the events in
+# its own thread (no separate notifier thread). The modifications of a file
+# are coalesced within a short time window, so each modified file is read
+# once per batch of events, regardless of the count of events.
+
+class FilterInotify(FileFilter):
+
+	## Time window in seconds to coalesce the events of a batch.
+	COALESCE_TIME = 0.05
+
+	_FILE_MASK = IN_MODIFY | IN_MOVE_SELF | IN_DELETE_SELF
+	_DIR_MASK = IN_CREATE | IN_MOVED_TO
+
+	##
+	# Constructor.
+	#
+	# Initialize the filter object with default values.
+	# @param jail the jail object
+
+	def __init__(self, jail):
+		FileFilter.__init__(self, jail)
+		self.__lock = Lock()
+		self.__notify = INotify()
+		# watch descriptors by path (files and directories) and back:
+		self.__watches = dict()
+		self.__paths = dict()
+		# watched directories -> set of the monitored file names:
+		self.__dirs = dict()
+		## Count of read events and processed batches.
+		self.__events = 0
+		self.__batches = 0
+		logSys.debug("Created FilterInotify")
+
+	def __addWatch(self, path, mask):
+		wd = self.__notify.addWatch(path, mask)
+		self.__watches[path] = wd
+		self.__paths[wd] = path
+		return wd
+
+	def __delWatch(self, path):
+		wd = self.__watches.pop(path, None)
+		if wd is None:
+			return False
+		if self.__paths.get(wd) == path:
+			del self.__paths[wd]
+		return self.__notify.rmWatch(wd)
+
+	def __rewatch(self, path):
+		# file was replaced (rotated) - watch the new file:
+		self.__delWatch(path)
+		try:
+			self.__addWatch(path, self._FILE_MASK)
+			logSys.debug("Renewed file watcher for %s", path)
+		except OSError as e:
+			logSys.debug("Unable to watch %s: %s", path, e)
+
+	##
+	# Add a log file path
+	#
+	# @param path log file path
+
+	def _addLogPath(self, path):
+		path_dir = dirname(path)
+		with self.__lock:
+			if path_dir not in self.__dirs:
+				# we need to watch also the directory for IN_CREATE
+				self.__addWatch(path_dir, self._DIR_MASK)
+				self.__dirs[path_dir] = set()
+				logSys.debug("Added monitor for the parent directory %s", path_dir)
+			self.__dirs[path_dir].add(basename(path))
+			try:
+				self.__addWatch(path, self._FILE_MASK)
+				logSys.debug("Added file watcher for %s", path)
+			except OSError as e:
+				# will be watched as soon as created in the directory:
+				logSys.error("Unable to watch %s: %s", path, e)
+		# not started yet - the backlog will be caught up on start:
+		if self.active:
+			self._process_files([path])
+
+	##
+	# Delete a log path
+	#
+	# @param path the log file to delete
+
+	def _delLogPath(self, path):
+		path_dir = dirname(path)
+		with self.__lock:
+			if not self.__delWatch(path):
+				logSys.debug("Watch on path %s was already removed", path)
+			names = self.__dirs.get(path_dir)
+			if names is not None:
+				names.discard(basename(path))
+				if not names:
+					# no other monitored file under this directory
+					del self.__dirs[path_dir]
+					self.__delWatch(path_dir)
+					logSys.debug("Removed monitor for the parent directory %s", path_dir)
+
+	def _process_files(self, paths):
+		"""Process given files, then pass the tickets to the jail once.
+		"""
+		for path in paths:
+			if self.containsLogPath(path) and os.path.exists(path):
+				self.getFailures(path)
+		for ticket in self.failManager.toBanAll():
+			self.jail.putFailTicket(ticket)
+		self.failManager.cleanup(MyTime.time())
+		self.dateDetector.sortTemplate()
+
+	def _collect(self, events):
+		"""Maps the events to the set of files to process (coalesced).
+		"""
+		modified = set()
+		with self.__lock:
+			for wd, mask, name in events:
+				if mask & IN_Q_OVERFLOW:
+					# events are lost - check all files:
+					logSys.warning("Inotify event queue overflowed, rescan all logs")
+					modified.update(log.getFileName() for log in self.getLogs())
+					continue
+				path = self.__paths.get(wd)
+				if path is None:
+					continue
+				if mask & IN_IGNORED:
+					# watch removed by kernel (file deleted or unmounted):
+					if self.__watches.get(path) == wd:
+						del self.__watches[path]
+					del self.__paths[wd]
+					continue
+				if path in self.__dirs:
+					# created or moved into the directory:
+					if mask & IN_ISDIR or name not in self.__dirs[path]:
+						continue
+					path = os.path.join(path, name)
+					logSys.debug("Log %s was created or moved in", path)
+					self.__rewatch(path)
+				elif mask & (IN_MOVE_SELF | IN_DELETE_SELF):
+					# rotated - new file (if already created) will be watched:
+					logSys.debug("Log %s was moved or deleted", path)
+					if os.path.exists(path):
+						self.__rewatch(path)
+				modified.add(path)
+		return modified
+
+	##
+	# Main loop.
+	#
+	# Waits for the inotify events (up to sleeptime, to be able to exit),
+	# collects all events arrived within the coalesce window and processes
+	# each modified file once.
+	# @return True when the thread exits nicely
+
+	def run(self):
+		poller = select.poll()
+		poller.register(self.__notify.fileno(), select.POLLIN)
+		try:
+			# catch up the backlog (if configured, in worker threads):
+			self.ingestLogs()
+			self._process_files([log.getFileName() for log in self.getLogs()])
+			while self.active:
+				try:
+					ready = poller.poll(self.sleeptime * 1000)
+				except select.error as e: # pragma: no cover
+					if e.args[0] == errno.EINTR:
+						continue
+					raise
+				if not ready:
+					continue
+				# let the writer(s) finish the burst, to read it in one go:
+				time.sleep(self.COALESCE_TIME)
+				events = self.__notify.readEvents()
+				self.__events += len(events)
+				modified = self._collect(events)
+				if self.idle or not modified:
+					continue
+				self.__batches += 1
+				logSys.debug("Processing %d file(s) for %d event(s)",
+					len(modified), len(events))
+				self._process_files(modified)
+		finally:
+			self.__cleanup()
+		logSys.debug(
+			(self.jail is not None and self.jail.name or "jailless") +
+					 " filter terminated")
+		return True
+
+	def stop(self):
+		super(FilterInotify, self).stop()
+		if not self.isAlive():
+			self.__cleanup()
+
+	def status(self, flavor="basic"):
+		ret = super(FilterInotify, self).status(flavor=flavor)
+		if flavor == "perf":
+			ret.append(("Inotify events", "events: %d, batches: %d" % (
+				self.__events, self.__batches)))
+		return ret
+
+	##
+	# Deallocates the inotify instance (removes all watches).
+
+	def __cleanup(self):
+		with self.__lock:
+			self.__notify.close()
+			self.__watches.clear()
+			self.__paths.clear()
+			self.__dirs.clear()
@@ -24,10 +24,11 @@ __author__ = "Cyril Jaquier, Yaroslav Halchenko"
 __copyright__ = "Copyright (c) 2004 Cyril Jaquier; 2012 Yaroslav Halchenko"
 __license__ = "GPL"
 
+import heapq
 import os
 import time
+from threading import Lock
 
-from .failmanager import FailManagerEmpty
 from .filter import FileFilter
 from .mytime import MyTime
 from ..helpers import getLogger
@@ -42,21 +43,41 @@ logSys = getLogger(__name__)
 # This class reads a log file and detects login failures or anything else
 # that matches a given regular expression. This class is instantiated by
 # a Jail object.
+#
+# The polling is adaptive: a modified file is checked each sleeptime, each
+# check without modification doubles the interval of the file (up to
+# sleeptime * maxbackoff, by default 8 times sleeptime).
+# The checks of the files are spread over the interval (in POLL_SLICES
+# slices), so the stat calls do not come in bursts.
 
 class FilterPoll(FileFilter):
 
+	## Default maximal poll interval of idle files (in sleeptime units).
+	MAX_BACKOFF = 8
+	## Count of slices of sleeptime, the checks are spread over.
+	POLL_SLICES = 10
+
 	##
 	# Constructor.
 	#
 	# Initialize the filter object with default values.
 	# @param jail the jail object
+	# @param maxbackoff maximal poll interval of idle files (in sleeptime units)
 
-	def __init__(self, jail):
+	def __init__(self, jail, maxbackoff=MAX_BACKOFF):
 		FileFilter.__init__(self, jail)
 		self.__modified = False
 		## The time of the last modification of the file.
 		self.__prevStats = dict()
 		self.__file404Cnt = dict()
+		## Poll state of the file: [next check, interval, checks, added].
+		self.__polls = dict()
+		## Schedule of the checks (heap of next check time and path).
+		self.__schedule = []
+		## Guards the poll states and the schedule (paths are added and
+		# removed by other threads).
+		self.__lock = Lock()
+		self.maxBackoff = max(1, int(maxbackoff))
 		logSys.debug("Created FilterPoll")
 
 	##
@@ -67,6 +88,13 @@ class FilterPoll(FileFilter):
 	def _addLogPath(self, path):
 		self.__prevStats[path] = (0, None, None)	 # mtime, ino, size
 		self.__file404Cnt[path] = 0
+		# spread the first checks of the files over the interval:
+		now = time.time()
+		with self.__lock:
+			nextCheck = now + self.sleeptime * (
+				len(self.__polls) % self.POLL_SLICES) / float(self.POLL_SLICES)
+			self.__polls[path] = [nextCheck, self.sleeptime, 0, now]
+			heapq.heappush(self.__schedule, (nextCheck, path))
 
 	##
 	# Delete a log path
@@ -76,6 +104,71 @@ class FilterPoll(FileFilter):
 	def _delLogPath(self, path):
 		del self.__prevStats[path]
 		del self.__file404Cnt[path]
+		# the entry of the schedule gets obsolete (skipped later):
+		with self.__lock:
+			del self.__polls[path]
+
+	##
+	# Returns the files, which should be checked now (removes them from schedule).
+	#
+	# @param now current time
+	# @return list of paths
+
+	def _getDuePolls(self, now):
+		due = []
+		with self.__lock:
+			schedule = self.__schedule
+			while schedule and schedule[0][0] <= now:
+				nextCheck, path = heapq.heappop(schedule)
+				poll = self.__polls.get(path)
+				# skip obsolete entries (removed or rescheduled path):
+				if poll is not None and poll[0] == nextCheck:
+					due.append(path)
+		return due
+
+	##
+	# Schedules the next check of the file.
+	#
+	# A modified file is checked again after sleeptime, the interval of the
+	# file without modification is doubled up to sleeptime * maxBackoff.
+	# @param path log file path
+	# @param modified whether the file was modified by the last check
+	# @param now current time
+
+	def _schedulePoll(self, path, modified, now):
+		with self.__lock:
+			poll = self.__polls.get(path)
+			if poll is None:
+				return
+			if modified:
+				interval = self.sleeptime
+			else:
+				interval = min(poll[1] * 2, self.sleeptime * self.maxBackoff)
+			# keep the phase of the file (spreading), if not overdue:
+			nextCheck = poll[0] + interval
+			if nextCheck <= now:
+				nextCheck = now + interval
+			poll[0] = nextCheck
+			poll[1] = interval
+			poll[2] += 1
+			heapq.heappush(self.__schedule, (nextCheck, path))
+
+	##
+	# Returns the poll interval of the file (None if not monitored).
+
+	def getPollInterval(self, path):
+		poll = self.__polls.get(path)
+		return poll[1] if poll is not None else None
+
+	##
+	# Returns the effective poll rate of the file (checks per second).
+
+	def getPollRate(self, path, now=None):
+		poll = self.__polls.get(path)
+		if poll is None:
+			return None
+		elapsed = (now or time.time()) - poll[3]
+		return poll[2] / elapsed if elapsed > 0 else 0.0
 
 	##
 	# Main loop.
@@ -85,28 +178,29 @@ class FilterPoll(FileFilter):
 	# @return True when the thread exits nicely
 
 	def run(self):
+		# catch up the backlog (if configured, in worker threads):
+		self.ingestLogs()
 		while self.active:
 			if logSys.getEffectiveLevel() <= 6:
 				logSys.log(6, "Woke up idle=%s with %d files monitored",
 						   self.idle, len(self.getLogs()))
 			if not self.idle:
-				# Get file modification
-				for container in self.getLogs():
-					filename = container.getFileName()
-					if self.isModified(filename):
+				# Get file modification (of files, which check is due)
+				now = time.time()
+				for filename in self._getDuePolls(now):
+					modified = self.isModified(filename)
+					if modified:
 						self.getFailures(filename)
 						self.__modified = True
+					self._schedulePoll(filename, modified, now)
 
 				if self.__modified:
-					try:
-						while True:
-							ticket = self.failManager.toBan()
-							self.jail.putFailTicket(ticket)
-					except FailManagerEmpty:
-						self.failManager.cleanup(MyTime.time())
+					for ticket in self.failManager.toBanAll():
+						self.jail.putFailTicket(ticket)
+					self.failManager.cleanup(MyTime.time())
 					self.dateDetector.sortTemplate()
 					self.__modified = False
-				time.sleep(self.sleeptime)
+				time.sleep(self.__getWaitTime())
 			else:
 				time.sleep(self.sleeptime)
 		logSys.debug(
@@ -114,6 +208,28 @@ class FilterPoll(FileFilter):
 					 " filter terminated")
 		return True
 
+	def __getWaitTime(self):
+		# sleep till the next scheduled check (at least one slice, at most sleeptime):
+		with self.__lock:
+			if not self.__schedule:
+				return self.sleeptime
+			nextCheck = self.__schedule[0][0]
+		tick = self.sleeptime / float(self.POLL_SLICES)
+		wait = nextCheck - time.time()
+		return min(max(wait, tick), self.sleeptime)
+
+	def status(self, flavor="basic"):
+		ret = super(FilterPoll, self).status(flavor=flavor)
+		if flavor == "perf":
+			now = time.time()
+			with self.__lock:
+				rates = [
+					"%s: %.2f/s (interval %gs)" % (
+						path, self.getPollRate(path, now), self.getPollInterval(path))
+					for path in sorted(self.__polls)]
+			ret.append(("Poll rates", rates))
+		return ret
+
 	##
 	# Checks if the log file has been modified.
 	#
@@ -29,7 +29,6 @@ from os.path import dirname, sep as pathsep
 
 import pyinotify
 
-from .failmanager import FailManagerEmpty
 from .filter import FileFilter
 from .mytime import MyTime
 from ..helpers import getLogger
@@ -102,12 +101,9 @@ class FilterPyinotify(FileFilter):
 		this is a common logic and must be shared/provided by FileFilter
 		"""
 		self.getFailures(path)
-		try:
-			while True:
-				ticket = self.failManager.toBan()
-				self.jail.putFailTicket(ticket)
-		except FailManagerEmpty:
-			self.failManager.cleanup(MyTime.time())
+		for ticket in self.failManager.toBanAll():
+			self.jail.putFailTicket(ticket)
+		self.failManager.cleanup(MyTime.time())
 		self.dateDetector.sortTemplate()
 		self.__modified = False
 
@@ -167,6 +163,10 @@ class FilterPyinotify(FileFilter):
 	# loop is necessary
 
 	def run(self):
+		# catch up the backlog in worker threads (if configured):
+		if self.ingestLogs():
+			for log in self.getLogs():
+				self._process_file(log.getFileName())
 		self.__notifier = pyinotify.ThreadedNotifier(self.__monitor,
 			ProcessPyinotify(self))
 		self.__notifier.start()
@@ -30,7 +30,6 @@ from systemd import journal
 if LooseVersion(getattr(journal, '__version__', "0")) < '204':
 	raise ImportError("Fail2Ban requires systemd >= 204")
 
-from .failmanager import FailManagerEmpty
 from .filter import JournalFilter, Filter
 from .mytime import MyTime
 from ..helpers import getLogger, logging, splitwords
@@ -47,16 +46,31 @@ logSys = getLogger(__name__)
 # a Jail object.
 
 class FilterSystemd(JournalFilter): # pragma: systemd no cover
+
+	## Initial (minimal) count of entries processed per batch.
+	MIN_BATCH = 100
+	## Default maximal count of entries processed per batch.
+	MAX_BATCH = 10000
+
 	##
 	# Constructor.
 	#
 	# Initialize the filter object with default values.
 	# @param jail the jail object
+	# @param journalbatch maximal count of entries processed per batch
 
-	def __init__(self, jail, **kwargs):
+	def __init__(self, jail, journalbatch=MAX_BATCH, **kwargs):
 		jrnlargs = FilterSystemd._getJournalArgs(kwargs)
 		JournalFilter.__init__(self, jail, **kwargs)
 		self.__modified = 0
+		# batch grows while there is a backlog, up to the maximum:
+		self.__maxBatch = max(1, int(journalbatch))
+		self.__batch = min(self.MIN_BATCH, self.__maxBatch)
+		# cursor of the last processed entry:
+		self.__cursor = None
+		## Count of read entries and entries skipped by the prefilter.
+		self.__entries = 0
+		self.__skipped = 0
 		# Initialise systemd-journal connection
 		self.__journal = journal.Reader(**jrnlargs)
 		self.__matches = []
@@ -183,14 +197,14 @@ class FilterSystemd(JournalFilter): # pragma: systemd no cover
 		return self.__journal
 
 	##
-	# Format journal log entry into syslog style
+	# Format the leading elements (host, identifier and PID) of log line
 	#
 	# @param entry systemd journal entry dict
-	# @return format log line
+	# @param uni_decode function used to decode the fields
+	# @return list of the elements
 
-	def formatJournalEntry(self, logentry):
-		# Be sure, all argument of line tuple should have the same type:
-		uni_decode = self.uni_decode
+	@staticmethod
+	def _formatJournalHead(logentry, uni_decode):
 		logelements = []
 		v = logentry.get('_HOSTNAME')
 		if v:
@@ -212,6 +226,50 @@ class FilterSystemd(JournalFilter): # pragma: systemd no cover
 				else:
 					monotonic = logentry.get('__MONOTONIC_TIMESTAMP')[0]
 				logelements.append("[%12.6f]" % monotonic.total_seconds())
+		return logelements
+
+	##
+	# Check the journal entry may match any failregex
+	#
+	# The literal fragments of failregex are searched in the message and in
+	# the leading part of line (not decoded), so only the entries passed this
+	# check are formatted and processed.
+	# @param entry systemd journal entry dict
+	# @param literals literal fragments of each failregex
+	# @return False if no failregex can match the line of the entry
+
+	def prefilterJournalEntry(self, logentry, literals):
+		msg = logentry.get('MESSAGE', '')
+		try:
+			if isinstance(msg, list):
+				msg = " ".join(msg)
+			elif isinstance(msg, bytes) and bytes is not str:
+				msg = self.uni_decode(msg)
+			head = " ".join(self._formatJournalHead(logentry, lambda v: v))
+			if head:
+				# the fragment may also span the boundary to the message:
+				head += " " + msg[:max(
+					len(l) for fragments in literals for l in fragments) - 1]
+		except (TypeError, UnicodeError): # pragma: no cover - mixed types
+			return True
+		for fragments in literals:
+			for l in fragments:
+				if l not in msg and l not in head:
+					break
+			else:
+				return True
+		return False
+
+	##
+	# Format journal log entry into syslog style
+	#
+	# @param entry systemd journal entry dict
+	# @return format log line
+
+	def formatJournalEntry(self, logentry):
+		# Be sure, all argument of line tuple should have the same type:
+		uni_decode = self.uni_decode
+		logelements = self._formatJournalHead(logentry, uni_decode)
 		msg = logentry.get('MESSAGE','')
 		if isinstance(msg, list):
 			logelements.append(" ".join(uni_decode(v) for v in msg))
@@ -233,6 +291,42 @@ class FilterSystemd(JournalFilter): # pragma: systemd no cover
 			date = datetime.datetime.fromtimestamp(date)
 		self.__journal.seek_realtime(date)
 
+	##
+	# Seek to the entry following the last processed one
+	#
+	# @param cursor cursor of the last processed entry (stored in database)
+	# @param start_time entries older as this are not needed
+	# @return True if positioned, False if the cursor is not usable
+
+	def seekToCursor(self, cursor, start_time):
+		try:
+			self.__journal.seek_cursor(cursor)
+			logentry = self.__journal.get_next()
+		except (OSError, ValueError) as e:
+			logSys.warning("Unable to seek to journal cursor %r: %s", cursor, e)
+			return False
+		date = logentry and logentry.get('__REALTIME_TIMESTAMP')
+		if not date or date < start_time:
+			# unknown or too old - continue from findtime:
+			return False
+		if logentry.get('__CURSOR') != cursor:
+			# entry itself is gone (vacuumed), this one is not yet processed:
+			self.__journal.get_previous()
+		return True
+
+	def __updateCursor(self, flush=False):
+		db = self.jail.database if self.jail is not None else None
+		if db is not None and self.__cursor is not None:
+			db.updateJournalCursor(self.jail, self.__cursor, flush=flush)
+
+	##
+	# Get current (adaptive) batch size
+	#
+	# @return count of entries processed per batch
+
+	def getJournalBatch(self):
+		return self.__batch
+
 	##
 	# Main loop.
 	#
@@ -247,16 +341,22 @@ class FilterSystemd(JournalFilter): # pragma: systemd no cover
 				"Jail regexs will be checked against all journal entries, "
 				"which is not advised for performance reasons.")
 
-		# Seek to now - findtime in journal
 		start_time = datetime.datetime.now() - \
 				datetime.timedelta(seconds=int(self.getFindTime()))
-		self.seekToTime(start_time)
-		# Move back one entry to ensure do not end up in dead space
-		# if start time beyond end of journal
-		try:
-			self.__journal.get_previous()
-		except OSError:
-			pass # Reading failure, so safe to ignore
+		# Resume after last processed entry (if known), or
+		# seek to now - findtime in journal
+		db = self.jail.database if self.jail is not None else None
+		cursor = db.getJournalCursor(self.jail) if db is not None else None
+		if cursor is not None and self.seekToCursor(cursor, start_time):
+			logSys.info("Resume journal after cursor %r", cursor)
+		else:
+			self.seekToTime(start_time)
+			# Move back one entry to ensure do not end up in dead space
+			# if start time beyond end of journal
+			try:
+				self.__journal.get_previous()
+			except OSError:
+				pass # Reading failure, so safe to ignore
 
 		while self.active:
 			# wait for records (or for timeout in sleeptime seconds):
@@ -267,6 +367,8 @@ class FilterSystemd(JournalFilter): # pragma: systemd no cover
 				time.sleep(self.sleeptime)
 				continue
 			self.__modified = 0
+			# cheap check of the entries (failregex could be changed meanwhile):
+			literals = self.getFailRegexLiterals()
 			while self.active:
 				logentry = None
 				try:
@@ -276,22 +378,31 @@ class FilterSystemd(JournalFilter): # pragma: systemd no cover
 						e, exc_info=logSys.getEffectiveLevel() <= logging.DEBUG)
 				self.ticks += 1
 				if logentry:
-					self.processLineAndAdd(
-						*self.formatJournalEntry(logentry))
+					self.__entries += 1
+					if literals is None \
+							or self.prefilterJournalEntry(logentry, literals):
+						self.processLineAndAdd(
+							*self.formatJournalEntry(logentry))
+					else:
+						self.__skipped += 1
+					self.__cursor = logentry.get('__CURSOR')
 					self.__modified += 1
-					if self.__modified >= 100: # todo: should be configurable
+					if self.__modified >= self.__batch:
+						# backlog - process larger batches next time:
+						self.__batch = min(self.__batch * 2, self.__maxBatch)
 						break
 				else:
+					# caught up - back to small batches:
+					self.__batch = min(self.MIN_BATCH, self.__maxBatch)
 					break
 			if self.__modified:
-				try:
-					while True:
-						ticket = self.failManager.toBan()
-						self.jail.putFailTicket(ticket)
-				except FailManagerEmpty:
-					self.failManager.cleanup(MyTime.time())
+				self.__updateCursor()
+				for ticket in self.failManager.toBanAll():
+					self.jail.putFailTicket(ticket)
+				self.failManager.cleanup(MyTime.time())
 
-		# close journal:
+		# store the position (pending cursor) and close journal:
+		self.__updateCursor(flush=True)
 		try:
 			if self.__journal:
 				self.__journal.close()
@@ -306,4 +417,7 @@ class FilterSystemd(JournalFilter): # pragma: systemd no cover
 		ret = super(FilterSystemd, self).status(flavor=flavor)
 		ret.append(("Journal matches",
 			[" + ".join(" ".join(match) for match in self.__matches)]))
+		if flavor == "perf":
+			ret.append(("Journal entries", "read: %d, prefiltered out: %d, batch: %d" % (
+				self.__entries, self.__skipped, self.__batch)))
 		return ret
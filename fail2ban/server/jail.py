@@ -64,7 +64,7 @@ class Jail:
 	#Known backends. Each backend should have corresponding __initBackend method
 	# yoh: stored in a list instead of a tuple since only
 	#      list had .index until 2.6
-	_BACKENDS = ['pyinotify', 'gamin', 'polling', 'systemd']
+	_BACKENDS = ['pyinotify', 'inotify', 'gamin', 'polling', 'systemd']
 
 	def __init__(self, name, backend = "auto", db=None):
 		self.__db = db
@@ -130,6 +130,12 @@ class Jail:
 		logSys.info("Jail '%s' uses Gamin %r" % (self.name, kwargs))
 		self.__filter = FilterGamin(self, **kwargs)
 
+	def _initInotify(self, **kwargs):
+		# Try to use native inotify (linux only)
+		from filterinotify import FilterInotify
+		logSys.info("Jail '%s' uses inotify %r" % (self.name, kwargs))
+		self.__filter = FilterInotify(self, **kwargs)
+
 	def _initPyinotify(self, **kwargs):
 		# Try to import pyinotify
 		from filterpyinotify import FilterPyinotify
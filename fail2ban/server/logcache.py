@@ -0,0 +1,124 @@
+# emacs: -*- mode: python; py-indent-offset: 4; indent-tabs-mode: t -*-
+# vi: set ft=python sts=4 ts=4 sw=4 noet :
+
+# This file is part of Fail2Ban.
+#
+# Fail2Ban is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# Fail2Ban is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Fail2Ban; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+__author__ = "Fail2Ban Contributors"
+__license__ = "GPL"
+
+import os
+import weakref
+from collections import deque
+from threading import Lock
+
+
+class LogBlockCache(object):
+	"""Server-wide cache of read and decoded blocks of log files.
+
+	If several jails monitor the same (physical) log file, each of them
+	keeps its own position in the file, but only the first one reading a
+	block of lines at some position really reads and decodes it, the other
+	jails get the decoded lines from the cache. Blocks are cached for the
+	files watched by more than one reader only.
+
+	Parameters
+	----------
+	maxBlocks : int
+		Maximal count of cached blocks (the oldest are dropped).
+
+	Attributes
+	----------
+	maxBlocks
+	hits
+	misses
+	"""
+
+	def __init__(self, maxBlocks=16):
+		self.maxBlocks = maxBlocks
+		self.__lock = Lock()
+		self.__blocks = dict()
+		# keys of the blocks in order of caching (the oldest first):
+		self.__keys = deque()
+		# readers by real path of the file (dict of weak references by id of
+		# the reader, an entry is removed if the reader is destroyed):
+		self.__readers = dict()
+		self.hits = 0
+		self.misses = 0
+
+	@staticmethod
+	def getPath(filename):
+		"""Returns the path identifying the physical file.
+		"""
+		return os.path.realpath(filename)
+
+	def subscribe(self, path, reader):
+		"""Registers reader of the file (released if reader is destroyed).
+		"""
+		key = id(reader)
+		with self.__lock:
+			readers = self.__readers.get(path)
+			if readers is None:
+				readers = self.__readers[path] = dict()
+			# (no lock in callback - may be called by garbage collector anywhere,
+			# dict.pop is atomic):
+			readers[key] = weakref.ref(reader,
+				lambda ref, readers=readers, key=key: readers.pop(key, None))
+
+	def isShared(self, path):
+		"""Whether the file is read by more than one reader.
+		"""
+		readers = self.__readers.get(path)
+		return readers is not None and len(readers) > 1
+
+	def get(self, key):
+		"""Returns cached block (lines, sizes) or None.
+
+		The key identifies the content of the file and the position of the
+		block, e.g. (path, inode, hash of first line, encoding, position).
+		"""
+		with self.__lock:
+			block = self.__blocks.get(key)
+			if block is None:
+				self.misses += 1
+			else:
+				self.hits += 1
+		return block
+
+	def set(self, key, lines, sizes):
+		"""Stores the block (decoded lines and their sizes in bytes).
+		"""
+		with self.__lock:
+			if key not in self.__blocks:
+				self.__keys.append(key)
+			self.__blocks[key] = (lines, sizes)
+			while len(self.__keys) > self.maxBlocks:
+				del self.__blocks[self.__keys.popleft()]
+
+	def clear(self):
+		"""Drops all blocks and resets statistic.
+		"""
+		with self.__lock:
+			self.__blocks.clear()
+			self.__keys.clear()
+			self.hits = self.misses = 0
+
+	def __len__(self):
+		return len(self.__blocks)
+
+	def __str__(self):
+		return "hits: %d, misses: %d, blocks: %d" % (
+			self.hits, self.misses, len(self))
@@ -0,0 +1,110 @@
+# emacs: -*- mode: python; py-indent-offset: 4; indent-tabs-mode: t -*-
+# vi: set ft=python sts=4 ts=4 sw=4 noet :
+
+# This file is part of Fail2Ban.
+#
+# Fail2Ban is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# Fail2Ban is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Fail2Ban; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+__author__ = "Fail2Ban Contributors"
+__license__ = "GPL"
+
+import bz2
+import gzip
+import os
+import re
+
+try:
+	import lzma
+except ImportError: # pragma: no cover - python 2
+	try:
+		from backports import lzma
+	except ImportError:
+		lzma = None
+
+from ..helpers import getLogger
+
+# Gets the instance of the logger.
+logSys = getLogger(__name__)
+
+# Suffix of rotated siblings of a log file (logrotate naming, numbered or
+# with dateext), optionally compressed, e.g. auth.log.1, auth.log.2.gz or
+# auth.log-20170101.xz:
+ROTATED_SUFFIX_RE = re.compile(r'^[.-](\d+)(?:\.(gz|bz2|xz))?$')
+
+_openers = {
+	'gz': gzip.GzipFile,
+	'bz2': bz2.BZ2File,
+}
+if lzma is not None: # pragma: no cover - python 3 or backports.lzma
+	_openers['xz'] = lzma.LZMAFile
+
+
+def findRotatedLogs(path, since):
+	"""Finds the rotated siblings of the log file, modified since given time.
+
+	A rotated file not modified since the time contains older lines only,
+	so it is not needed (as well as all older rotated files).
+
+	Parameters
+	----------
+	path : str
+		Path of the (live) log file.
+	since : float
+		Unix time, the lines older as this are not needed.
+
+	Returns
+	-------
+	list of (str, str)
+		Paths of the rotated files and their compression (or None), the
+		oldest file first.
+	"""
+	found = []
+	dirName, baseName = os.path.split(path)
+	try:
+		names = os.listdir(dirName or os.curdir)
+	except OSError: # pragma: no cover
+		return found
+	for name in names:
+		if not name.startswith(baseName):
+			continue
+		match = ROTATED_SUFFIX_RE.match(name[len(baseName):])
+		if not match:
+			continue
+		sibling = os.path.join(dirName, name)
+		try:
+			stats = os.stat(sibling)
+		except OSError: # pragma: no cover - removed meanwhile
+			continue
+		if stats.st_mtime < since or not stats.st_size:
+			continue
+		compression = match.group(2)
+		if compression is not None and compression not in _openers:
+			logSys.warning("Unable to read rotated log %s: %s compression is "
+				"not supported (module lzma not available)", sibling, compression)
+			continue
+		found.append((stats.st_mtime, sibling, compression))
+	found.sort()
+	return [(sibling, compression) for _, sibling, compression in found]
+
+
+def openRotatedLog(path, compression):
+	"""Opens the rotated log file for the streaming read of (binary) lines.
+
+	The compressed file is decompressed on the fly while reading, it is never
+	decompressed into memory at once.
+	"""
+	if compression is None:
+		return open(path, 'rb')
+	return _openers[compression](path, 'rb')
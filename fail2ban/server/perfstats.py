@@ -0,0 +1,92 @@
+# emacs: -*- mode: python; py-indent-offset: 4; indent-tabs-mode: t -*-
+# vi: set ft=python sts=4 ts=4 sw=4 noet :
+
+# This file is part of Fail2Ban.
+#
+# Fail2Ban is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# Fail2Ban is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Fail2Ban; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+__author__ = "Fail2Ban Contributors"
+__license__ = "GPL"
+
+import time
+
+
+class PerfStats(object):
+	"""Cost statistics of an operation (e.g. search of a regex).
+
+	Counts all calls and hits, but measures the wall time of every
+	`sample`-th call only, so the overhead is small enough to keep it
+	enabled under real load. The total time is estimated from the
+	sampled calls.
+
+	Parameters
+	----------
+	sample : int
+		Measure the time of every `sample`-th call (1 - each call).
+
+	Attributes
+	----------
+	calls
+	hits
+	sampled
+	sampledTime
+	"""
+
+	__slots__ = ('sample', 'calls', 'hits', 'sampled', 'sampledTime')
+
+	def __init__(self, sample=1):
+		self.sample = max(1, int(sample))
+		self.reset()
+
+	def reset(self):
+		"""Resets all counters.
+		"""
+		self.calls = 0
+		self.hits = 0
+		self.sampled = 0
+		self.sampledTime = 0.0
+
+	def start(self):
+		"""Counts the call, returns start time if this call is sampled.
+		"""
+		self.calls += 1
+		if self.calls % self.sample:
+			return None
+		return time.time()
+
+	def stop(self, started, hit):
+		"""Counts the hit and the time of sampled call (started by `start`).
+		"""
+		if hit:
+			self.hits += 1
+		if started is not None:
+			self.sampledTime += time.time() - started
+			self.sampled += 1
+
+	@property
+	def avgTime(self):
+		"""Average time of the call in seconds (estimated from samples).
+		"""
+		return self.sampledTime / self.sampled if self.sampled else 0.0
+
+	@property
+	def totalTime(self):
+		"""Estimated total time of all calls in seconds.
+		"""
+		return self.avgTime * self.calls
+
+	def __str__(self):
+		return "calls: %d, hits: %d, time: ~%.3f sec (%.1f us/call)" % (
+			self.calls, self.hits, self.totalTime, self.avgTime * 1e6)
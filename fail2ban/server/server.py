@@ -168,6 +168,9 @@ class Server:
 			self.__lock.acquire()
 			if self.__jails[name].is_alive():
 				self.__jails[name].stop()
+				# write the pending log positions:
+				if self.__db is not None:
+					self.__db.flushLogs()
 				self.delJail(name)
 		finally:
 			self.__lock.release()
@@ -242,6 +245,45 @@ class Server:
 	def getLogEncoding(self, name):
 		filter_ = self.__jails[name].filter
 		return filter_.getLogEncoding()
+
+	def setLogKeepOpen(self, name, value):
+		filter_ = self.__jails[name].filter
+		if isinstance(filter_, FileFilter):
+			filter_.setLogKeepOpen(value)
+
+	def getLogKeepOpen(self, name):
+		filter_ = self.__jails[name].filter
+		if isinstance(filter_, FileFilter):
+			return filter_.getLogKeepOpen()
+		else: # pragma: systemd no cover
+			logSys.info("Jail %s is not a FileFilter instance" % name)
+			return False
+
+	def setLogRotated(self, name, value):
+		filter_ = self.__jails[name].filter
+		if isinstance(filter_, FileFilter):
+			filter_.setLogRotated(value)
+
+	def getLogRotated(self, name):
+		filter_ = self.__jails[name].filter
+		if isinstance(filter_, FileFilter):
+			return filter_.getLogRotated()
+		else: # pragma: systemd no cover
+			logSys.info("Jail %s is not a FileFilter instance" % name)
+			return False
+
+	def setLogWorkers(self, name, value):
+		filter_ = self.__jails[name].filter
+		if isinstance(filter_, FileFilter):
+			filter_.setLogWorkers(value)
+
+	def getLogWorkers(self, name):
+		filter_ = self.__jails[name].filter
+		if isinstance(filter_, FileFilter):
+			return filter_.getLogWorkers()
+		else: # pragma: systemd no cover
+			logSys.info("Jail %s is not a FileFilter instance" % name)
+			return 1
 	
 	def setFindTime(self, name, value):
 		self.__jails[name].filter.setFindTime(value)
@@ -285,6 +327,12 @@ class Server:
 	def getUseDns(self, name):
 		return self.__jails[name].filter.getUseDns()
 	
+	def setCombineRegex(self, name, value):
+		self.__jails[name].filter.setCombineRegex(value)
+	
+	def getCombineRegex(self, name):
+		return self.__jails[name].filter.getCombineRegex()
+	
 	def setMaxRetry(self, name, value):
 		self.__jails[name].filter.setMaxRetry(value)
 	
@@ -297,6 +345,15 @@ class Server:
 	def getMaxLines(self, name):
 		return self.__jails[name].filter.getMaxLines()
 	
+	def setPerfSample(self, name, value):
+		self.__jails[name].filter.setPerfSample(value)
+	
+	def getPerfSample(self, name):
+		return self.__jails[name].filter.getPerfSample()
+	
+	def resetPerfStats(self, name):
+		self.__jails[name].filter.resetPerfStats()
+	
 	# Action
 	def addAction(self, name, value, *args):
 		self.__jails[name].actions.add(value, *args)
@@ -29,7 +29,11 @@ timeRE = TimeRE()
 timeRE['z'] = r"(?P<z>Z|[+-]\d{2}(?::?[0-5]\d)?)"
 
 
-def reGroupDictStrptime(found_dict):
+def _toTimestamp(dt):
+	return time.mktime(dt.timetuple()) + dt.microsecond / 1000000.0
+
+
+def reGroupDictStrptime(found_dict, validRange=False):
 	"""Return time from dictionary of strptime fields
 
 	This is tweaked from python built-in _strptime.
@@ -39,11 +43,18 @@ def reGroupDictStrptime(found_dict):
 	found_dict : dict
 		Dictionary where keys represent the strptime fields, and values the
 		respective value.
+	validRange : bool
+		Return also the range of the current time, within which the result
+		stays the same (if year or day is not given, the result depends on
+		the current time, e.g. rollover at midnight or new year).
 
 	Returns
 	-------
 	float
 		Unix time stamp.
+	(float, float, float)
+		Unix time stamp and the range of the current time as unix time stamps
+		(valid from, valid to exclusive), if `validRange` is set.
 	"""
 
 	now = MyTime.now()
@@ -179,17 +190,184 @@ def reGroupDictStrptime(found_dict):
 	if gmtoff:
 		date_result = date_result - datetime.timedelta(seconds=gmtoff)
 
-	if date_result > now and assume_today:
-		# Rollover at midnight, could mean it's yesterday...
-		date_result = date_result - datetime.timedelta(days=1)
-	if date_result > now and assume_year:
-		# Could be last year?
-		# also reset month and day as it's not yesterday...
-		date_result = date_result.replace(
-			year=year-1, month=month, day=day)
+	# Range of current time giving the same result (bounded by the assumed
+	# day or year and the rollover conditions below):
+	validFrom = validTo = None
+	if assume_today:
+		validFrom = datetime.datetime(now.year, now.month, now.day)
+		validTo = validFrom + datetime.timedelta(days=1)
+	elif assume_year:
+		validFrom = datetime.datetime(now.year, 1, 1)
+		validTo = datetime.datetime(now.year + 1, 1, 1)
+
+	if assume_today:
+		if date_result > now:
+			# Rollover at midnight, could mean it's yesterday...
+			validTo = min(validTo, date_result)
+			date_result = date_result - datetime.timedelta(days=1)
+		else:
+			validFrom = max(validFrom, date_result)
+	if assume_year:
+		if date_result > now:
+			# Could be last year?
+			# also reset month and day as it's not yesterday...
+			validTo = min(validTo, date_result)
+			date_result = date_result.replace(
+				year=year-1, month=month, day=day)
+		else:
+			validFrom = max(validFrom, date_result)
 
 	if gmtoff is not None:
-		return calendar.timegm(date_result.utctimetuple())
+		date_result = calendar.timegm(date_result.utctimetuple())
+	else:
+		date_result = time.mktime(date_result.timetuple())
+	if not validRange:
+		return date_result
+	if validFrom is None:
+		return date_result, float('-inf'), float('inf')
+	return date_result, _toTimestamp(validFrom), _toTimestamp(validTo)
+
+
+
+# Fields handled by the fast parser (common formats: syslog, ISO 8601, apache):
+FAST_FIELDS = frozenset(('a', 'b', 'd', 'f', 'H', 'm', 'M', 'S', 'y', 'Y', 'z'))
+
+# Month numbers by (lower-case) abbreviated month names:
+_monthNum = dict(
+	(name, num) for num, name in enumerate(locale_time.a_month) if name)
+
+# Time stamps of the day begin (midnight) by date (and local time zone):
+_dayBases = {}
+
+
+def _getDayBase(year, month, day, utc=False):
+	"""Return time stamp of midnight of the given day (cached)
+
+	Returns None for local days with DST change (not 24 hours long), where
+	the time of day cannot be simply added to the begin of the day.
+	"""
+	if utc:
+		key = (year, month, day)
+	else:
+		key = (year, month, day, time.timezone, time.altzone, time.tzname)
+	try:
+		return _dayBases[key]
+	except KeyError:
+		pass
+	date = datetime.date(year, month, day)
+	if utc:
+		base = calendar.timegm(date.timetuple())
 	else:
-		return time.mktime(date_result.timetuple())
+		base = time.mktime(date.timetuple())
+		if time.mktime((date + datetime.timedelta(days=1)).timetuple()) \
+				- base != 86400:
+			base = None
+	if len(_dayBases) >= 1024:
+		_dayBases.clear()
+	_dayBases[key] = base
+	return base
+
+
+def _genericStrptime(groups, validRange):
+	return reGroupDictStrptime(
+		dict((key, value) for key, value in groups.iteritems()
+			if value is not None), validRange)
+
+
+def fastGroupDictStrptime(groups, validRange=False):
+	"""Return time from groups of the common date formats (fast version)
+
+	Specialized version of `reGroupDictStrptime` for the fields in
+	`FAST_FIELDS` (day, month, time and optional year, fraction and zone):
+	converts the groups straight to the time stamp using a month table and
+	cached time stamps of the day begin. The rare cases (e.g. day of DST
+	change, zone without year) are passed to the generic version, so the
+	result is always the same as of `reGroupDictStrptime`.
+
+	Parameters
+	----------
+	groups : dict
+		Groups of the date match (missing fields are None or absent).
+	validRange : bool
+		Return also the range of the current time, within which the result
+		stays the same (see `reGroupDictStrptime`).
+
+	Returns
+	-------
+	float
+		Unix time stamp.
+	(float, float, float)
+		Unix time stamp and the range of the current time, if `validRange`
+		is set.
+	"""
+	get = groups.get
+	day, hour, minute = get('d'), get('H'), get('M')
+	month, monthName = get('m'), get('b')
+	if month is None and monthName is not None:
+		monthName = monthName.lower()
+	if day is None or hour is None or minute is None or (
+			month is None and monthName not in _monthNum):
+		return _genericStrptime(groups, validRange)
+	second = get('S')
+	day, hour, minute = int(day), int(hour), int(minute)
+	second = int(second) if second else 0
+	if hour > 23 or minute > 59 or second > 59:
+		# invalid (leap second etc) - let generic version raise
+		return _genericStrptime(groups, validRange)
+	month = int(month) if month is not None else _monthNum[monthName]
+	daySecs = hour * 3600 + minute * 60 + second
+	year = get('Y')
+	if year is not None:
+		year = int(year)
+	else:
+		year = get('y')
+		if year is not None:
+			year = int(year)
+			year += 2000 if year <= 68 else 1900
+
+	z = get('z')
+	if z is not None:
+		# zone without year needs the rollover compared to naive local time:
+		if year is None:
+			return _genericStrptime(groups, validRange)
+		tzoffset = 0
+		if z != "Z":
+			tzoffset = int(z[1:3]) * 60
+			if len(z) > 3:
+				tzoffset += int(z[-2:])
+			if z.startswith("-"):
+				tzoffset = -tzoffset
+		date = _getDayBase(year, month, day, True) + daySecs - tzoffset * 60
+		return (date, float('-inf'), float('inf')) if validRange else date
+
+	if year is not None:
+		base = _getDayBase(year, month, day)
+		if base is None:
+			return _genericStrptime(groups, validRange)
+		date = base + daySecs
+		return (date, float('-inf'), float('inf')) if validRange else date
 
+	# Fail2Ban will assume it's this year (or last year if in the future):
+	now = MyTime.time()
+	year = time.localtime(now).tm_year
+	base = _getDayBase(year, month, day)
+	if base is None:
+		return _genericStrptime(groups, validRange)
+	date = base + daySecs
+	fraction = get('f')
+	exact = date + (int(fraction + "0" * (6 - len(fraction))) / 1000000.0
+		if fraction else 0)
+	validFrom = validTo = None
+	if validRange:
+		validFrom = time.mktime((year, 1, 1, 0, 0, 0, 0, 1, -1))
+		validTo = time.mktime((year + 1, 1, 1, 0, 0, 0, 0, 1, -1))
+	if exact > now:
+		base = _getDayBase(year - 1, month, day)
+		if base is None:
+			return _genericStrptime(groups, validRange)
+		date = base + daySecs
+		if validRange:
+			validTo = min(validTo, exact)
+	elif validRange:
+		validFrom = max(validFrom, exact)
+	return (date, validFrom, validTo) if validRange else date
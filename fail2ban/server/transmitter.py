@@ -144,6 +144,14 @@ class Transmitter:
 			else:
 				db.purgeage = command[1]
 				return db.purgeage
+		elif name == "dblogcheckpoint":
+			db = self.__server.getDatabase()
+			if db is None:
+				logSys.warning("dblogcheckpoint setting was not in effect since no db yet")
+				return None
+			else:
+				db.logcheckpoint = command[1]
+				return db.logcheckpoint
 		# Jail
 		elif command[1] == "idle":
 			if command[2] == "on":
@@ -186,6 +194,18 @@ class Transmitter:
 			value = command[2]
 			self.__server.setLogEncoding(name, value)
 			return self.__server.getLogEncoding(name)
+		elif command[1] == "logkeepopen":
+			value = command[2]
+			self.__server.setLogKeepOpen(name, value)
+			return self.__server.getLogKeepOpen(name)
+		elif command[1] == "logrotated":
+			value = command[2]
+			self.__server.setLogRotated(name, value)
+			return self.__server.getLogRotated(name)
+		elif command[1] == "logworkers":
+			value = command[2]
+			self.__server.setLogWorkers(name, value)
+			return self.__server.getLogWorkers(name)
 		elif command[1] == "addjournalmatch": # pragma: systemd no cover
 			value = command[2:]
 			self.__server.addJournalMatch(name, value)
@@ -214,6 +234,10 @@ class Transmitter:
 			value = command[2]
 			self.__server.setUseDns(name, value)
 			return self.__server.getUseDns(name)
+		elif command[1] == "combineregex":
+			value = command[2]
+			self.__server.setCombineRegex(name, value)
+			return self.__server.getCombineRegex(name)
 		elif command[1] == "findtime":
 			value = command[2]
 			self.__server.setFindTime(name, int(value))
@@ -230,6 +254,13 @@ class Transmitter:
 			value = command[2]
 			self.__server.setMaxLines(name, int(value))
 			return self.__server.getMaxLines(name)
+		elif command[1] == "perfsample":
+			value = command[2]
+			self.__server.setPerfSample(name, int(value))
+			return self.__server.getPerfSample(name)
+		elif command[1] == "resetperf":
+			self.__server.resetPerfStats(name)
+			return None
 		# command
 		elif command[1] == "bantime":
 			value = command[2]
@@ -287,11 +318,23 @@ class Transmitter:
 				return None
 			else:
 				return db.purgeage
+		elif name == "dblogcheckpoint":
+			db = self.__server.getDatabase()
+			if db is None:
+				return None
+			else:
+				return db.logcheckpoint
 		# Filter
 		elif command[1] == "logpath":
 			return self.__server.getLogPath(name)
 		elif command[1] == "logencoding":
 			return self.__server.getLogEncoding(name)
+		elif command[1] == "logkeepopen":
+			return self.__server.getLogKeepOpen(name)
+		elif command[1] == "logrotated":
+			return self.__server.getLogRotated(name)
+		elif command[1] == "logworkers":
+			return self.__server.getLogWorkers(name)
 		elif command[1] == "journalmatch": # pragma: systemd no cover
 			return self.__server.getJournalMatch(name)
 		elif command[1] == "ignoreip":
@@ -304,6 +347,8 @@ class Transmitter:
 			return self.__server.getIgnoreRegex(name)
 		elif command[1] == "usedns":
 			return self.__server.getUseDns(name)
+		elif command[1] == "combineregex":
+			return self.__server.getCombineRegex(name)
 		elif command[1] == "findtime":
 			return self.__server.getFindTime(name)
 		elif command[1] == "datepattern":
@@ -312,6 +357,8 @@ class Transmitter:
 			return self.__server.getMaxRetry(name)
 		elif command[1] == "maxlines":
 			return self.__server.getMaxLines(name)
+		elif command[1] == "perfsample":
+			return self.__server.getPerfSample(name)
 		# Action
 		elif command[1] == "bantime":
 			return self.__server.getBanTime(name)
@@ -141,6 +141,59 @@ class ExecuteActions(LogCaptureTestCase):
 		self.__actions.join()
 		self.assertLogged("Failed to stop")
 
+	def testBanActionsBatch(self):
+		self.defaultActions()
+		self.__ip.actioncheck = ''
+		self.__ip.actionban_batch = \
+			'echo ip ban batch <count>: <ip> >> "%s"' % self.__tmpfilename
+		for ip in ("192.0.2.1", "192.0.2.2", "192.0.2.3"):
+			self.__jail.putFailTicket(FailTicket(ip, 0))
+		# already banned IP in the batch is skipped (dummy jail queue is LIFO):
+		self.__jail.putFailTicket(FailTicket("192.0.2.1", 0))
+		self.__actions.banBatch = 2
+		self.assertTrue(self.__actions._Actions__checkBan())
+		self.assertTrue(self.__actions._Actions__checkBan())
+		self.assertFalse(self.__actions._Actions__checkBan())
+		self.assertLogged("192.0.2.1 already banned")
+		self.assertEqual(self.__actions.status()[0][1], 3)
+		# no unban batch command - per IP:
+		self.__actions._Actions__flushBan()
+		with open(self.__tmpfilename) as f:
+			lines = f.read().splitlines()
+		self.assertEqual(lines[:2], [
+			"ip ban batch 2: 192.0.2.1 192.0.2.3",
+			"ip ban 192.0.2.2",
+		])
+		self.assertEqual(sorted(lines[2:]), [
+			"ip unban 192.0.2.1",
+			"ip unban 192.0.2.2",
+			"ip unban 192.0.2.3",
+		])
+		self.assertNotLogged("Failed to execute")
+
+	def testBanActionsBatchDatabase(self):
+		class _Database(object):
+			def getBansMerged(self, ip, jail=None):
+				return None # falls back to own ticket
+		self.__jail.database = _Database()
+		self.defaultActions()
+		self.__ip.actioncheck = ''
+		self.__ip.actionban = 'echo ip ban <ip> <ipjailfailures> <ipmatches> >> "%s"' \
+			% self.__tmpfilename
+		# failed batch - each IP is banned separately:
+		self.__ip.actionban_batch = 'false'
+		for ip, failures in (("192.0.2.1", 3), ("192.0.2.2", 7)):
+			ticket = FailTicket(ip, 0, ["failure-of-%s" % ip])
+			ticket.setAttempt(failures)
+			self.__jail.putFailTicket(ticket)
+		self.assertTrue(self.__actions._Actions__checkBan())
+		self.assertLogged("Failed to execute ban batch")
+		with open(self.__tmpfilename) as f:
+			self.assertEqual(sorted(f.read().splitlines()), [
+				"ip ban 192.0.2.1 3 failure-of-192.0.2.1",
+				"ip ban 192.0.2.2 7 failure-of-192.0.2.2",
+			])
+
 	def testBanActionsAInfo(self):
 		# Action which deletes IP address from aInfo
 		self.__actions.add(
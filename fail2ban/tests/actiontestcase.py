@@ -242,6 +242,21 @@ class CommandActionTest(LogCaptureTestCase):
 		self.__action.ban(aInfo)
 		self.__action.unban(aInfo)
 
+	def testExecuteActionBanMany(self):
+		# without batch command - executed per IP by caller:
+		self.assertRaises(NotImplementedError,
+			self.__action.ban_many, [{'ip': "192.0.2.1"}])
+		self.assertRaises(NotImplementedError,
+			self.__action.unban_many, [{'ip': "192.0.2.1"}])
+		self.__action.actionban_batch = "echo ban <count>: <ip>"
+		self.assertEqual(self.__action.actionban_batch, "echo ban <count>: <ip>")
+		self.__action.ban_many([{'ip': "192.0.2.1"}, {'ip': "192.0.2.2"}])
+		self.assertLogged("echo ban 2: 192.0.2.1 192.0.2.2 -- returned successfully")
+		self.__action.actionunban_batch = "false <ip>"
+		self.assertRaises(RuntimeError, self.__action.unban_many,
+			[{'ip': "192.0.2.1"}, {'ip': "192.0.2.2"}])
+		self.assertLogged("false 192.0.2.1 192.0.2.2 -- returned 1")
+
 	def testExecuteActionStartEmpty(self):
 		self.__action.actionstart = ""
 		self.__action.start()
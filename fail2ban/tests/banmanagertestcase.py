@@ -56,6 +56,32 @@ class AddFailure(unittest.TestCase):
 		ticket = BanTicket('111.111.1.111', 1167605999.0)
 		self.assertFalse(self.__banManager._inBanList(ticket))
 
+	def testUnBanList(self):
+		banManager = BanManager()
+		banManager.setBanTime(100)
+		for i, t in enumerate((1030, 1010, 1020, 1040)):
+			self.assertTrue(banManager.addBanTicket(
+				BanTicket('192.0.2.%d' % i, t)))
+		# enumerated in order of ban time:
+		self.assertEqual(banManager.getBanList(),
+			['192.0.2.1', '192.0.2.2', '192.0.2.0', '192.0.2.3'])
+		# manually unbanned - not returned by unBanList:
+		self.assertEqual(banManager.getTicketByIP('192.0.2.2').getTime(), 1020)
+		self.assertEqual(banManager.getTicketByIP('192.0.2.2'), None)
+		self.assertEqual(
+			[t.getIP() for t in banManager.unBanList(1131)], ['192.0.2.1', '192.0.2.0'])
+		self.assertEqual(banManager.unBanList(1131), [])
+		self.assertEqual(banManager.getBanList(), ['192.0.2.3'])
+		# banned again after unban:
+		self.assertTrue(banManager.addBanTicket(BanTicket('192.0.2.1', 1200)))
+		self.assertEqual(banManager.size(), 2)
+		# permanent ban:
+		banManager.setBanTime(-1)
+		self.assertEqual(banManager.unBanList(2000), [])
+		self.assertEqual(
+			[t.getIP() for t in banManager.flushBanList()], ['192.0.2.3', '192.0.2.1'])
+		self.assertEqual(banManager.size(), 0)
+
 
 class StatusExtendedCymruInfo(unittest.TestCase):
 	def setUp(self):
@@ -102,6 +102,38 @@ class DatabaseTest(LogCaptureTestCase):
 		self.assertRaises(NotImplementedError, self.db.updateDb, Fail2BanDb.__version__ + 1)
 		os.remove(self.db._dbBackupFilename)
 
+	def testUpdateDb_v2(self):
+		if Fail2BanDb is None: # pragma: no cover
+			return
+		os.remove(self.dbFilename)
+		db = sqlite3.connect(self.dbFilename)
+		db.executescript(
+			"CREATE TABLE fail2banDb(version INTEGER);"
+			"INSERT INTO fail2banDb(version) VALUES(2);"
+			"CREATE TABLE jails(name TEXT NOT NULL UNIQUE, "
+				"enabled INTEGER NOT NULL DEFAULT 1);"
+			"CREATE TABLE logs(jail TEXT NOT NULL, path TEXT, firstlinemd5 TEXT, "
+				"lastfilepos INTEGER DEFAULT 0, "
+				"FOREIGN KEY(jail) REFERENCES jails(name) ON DELETE CASCADE, "
+				"UNIQUE(jail, path), UNIQUE(jail, path, firstlinemd5));"
+			"CREATE TABLE bans(jail TEXT NOT NULL, ip TEXT, "
+				"timeofban INTEGER NOT NULL, data JSON, "
+				"FOREIGN KEY(jail) REFERENCES jails(name));"
+			"INSERT INTO jails(name) VALUES('test');"
+			"INSERT INTO logs VALUES('test', '/tmp/test.log', 'abc', 10);")
+		db.commit()
+		db.close()
+		self.db = Fail2BanDb(self.dbFilename)
+		self.assertEqual(self.db.getLogPaths(), set(['/tmp/test.log']))
+		cur = self.db._db.cursor()
+		cur.execute("SELECT version FROM fail2banDb")
+		self.assertEqual(cur.fetchone()[0], Fail2BanDb.__version__)
+		cur.execute("SELECT lastfilepos, datetemplate FROM logs")
+		self.assertEqual(cur.fetchone(), (10, None))
+		cur.execute("SELECT count(*) FROM journals")
+		self.assertEqual(cur.fetchone()[0], 0)
+		os.remove(self.db._dbBackupFilename)
+
 	def testAddJail(self):
 		if Fail2BanDb is None: # pragma: no cover
 			return
@@ -141,15 +173,18 @@ class DatabaseTest(LogCaptureTestCase):
 		# Capture position which should be after line just written
 		lastPos = self.fileContainer.getPos()
 		self.assertTrue(lastPos > 0)
+		self.fileContainer.setDateTemplate("Epoch")
 		self.db.updateLog(self.jail, self.fileContainer)
 
 		# New FileContainer for file
 		self.fileContainer = FileContainer(filename, "utf-8")
 		self.assertEqual(self.fileContainer.getPos(), 0)
+		self.assertEqual(self.fileContainer.getDateTemplate(), None)
 
-		# Database should return previous position in file
+		# Database should return previous position in file (and pinned template)
 		self.assertEqual(
 			self.db.addLog(self.jail, self.fileContainer), lastPos)
+		self.assertEqual(self.fileContainer.getDateTemplate(), "Epoch")
 
 		# Change md5sum
 		file_ = open(filename, "w") # Truncate
@@ -165,6 +200,78 @@ class DatabaseTest(LogCaptureTestCase):
 			self.db.addLog(self.jail, self.fileContainer), None)
 		os.remove(filename)
 
+	def testLogCheckpoint(self):
+		if Fail2BanDb is None: # pragma: no cover
+			return
+		self.testAddLog() # Add log file
+		filename = self.fileContainer.getFileName()
+		def _dbPos():
+			cur = self.db._db.cursor()
+			cur.execute("SELECT lastfilepos FROM logs WHERE jail=? AND path=?",
+				(self.jail.name, filename))
+			return cur.fetchone()[0]
+		self.db.logcheckpoint = 3600
+		self.assertEqual(self.db.logcheckpoint, 3600)
+		self.assertRaises(ValueError, setattr, self.db, 'logcheckpoint', -1)
+		# position is kept in memory:
+		self.fileContainer.setPos(10)
+		self.db.updateLog(self.jail, self.fileContainer)
+		self.fileContainer.setPos(20)
+		self.db.updateLog(self.jail, self.fileContainer)
+		self.assertEqual(_dbPos(), 0)
+		# written on demand (rotation) or by flush:
+		self.db.updateLog(self.jail, self.fileContainer, flush=True)
+		self.assertEqual(_dbPos(), 20)
+		self.fileContainer.setPos(30)
+		self.db.updateLog(self.jail, self.fileContainer)
+		self.assertEqual(self.db.flushLogs(), 1)
+		self.assertEqual(self.db.flushLogs(), 0)
+		self.assertEqual(_dbPos(), 30)
+		# pending position is written before the log is added again:
+		self.fileContainer.setPos(40)
+		self.db.updateLog(self.jail, self.fileContainer)
+		open(filename, 'w').close()
+		try:
+			self.assertEqual(
+				self.db.addLog(self.jail, FileContainer(filename, "utf-8")), 40)
+		finally:
+			os.remove(filename)
+		# after the interval:
+		self.fileContainer.setPos(50)
+		self.db.updateLog(self.jail, self.fileContainer)
+		self.assertEqual(_dbPos(), 0)
+		self.db.logcheckpoint = 1
+		self.db._lastCheckpoint -= 2
+		self.db.updateLog(self.jail, self.fileContainer)
+		self.assertEqual(_dbPos(), 50)
+		# disabled - pending positions written, then each update:
+		self.db.logcheckpoint = 0
+		self.fileContainer.setPos(60)
+		self.db.updateLog(self.jail, self.fileContainer)
+		self.assertEqual(_dbPos(), 60)
+
+	def testJournalCursor(self):
+		if Fail2BanDb is None: # pragma: no cover
+			return
+		self.testAddJail()
+		self.assertEqual(self.db.getJournalCursor(self.jail), None)
+		self.db.updateJournalCursor(self.jail, "s=1;i=10")
+		self.assertEqual(self.db.getJournalCursor(self.jail), "s=1;i=10")
+		# pending cursor (checkpoint) is returned, but written by flush only:
+		self.db.logcheckpoint = 3600
+		self.db.updateJournalCursor(self.jail, "s=1;i=20")
+		self.assertEqual(self.db.getJournalCursor(self.jail), "s=1;i=20")
+		cur = self.db._db.cursor()
+		cur.execute("SELECT cursor FROM journals WHERE jail=?", (self.jail.name,))
+		self.assertEqual(cur.fetchone()[0], "s=1;i=10")
+		self.assertEqual(self.db.flushLogs(), 1)
+		cur.execute("SELECT cursor FROM journals WHERE jail=?", (self.jail.name,))
+		self.assertEqual(cur.fetchone()[0], "s=1;i=20")
+		# removed together with the jail:
+		self.db.delJail(self.jail)
+		self.db.purge()
+		self.assertEqual(self.db.getJournalCursor(self.jail), None)
+
 	def testAddBan(self):
 		if Fail2BanDb is None: # pragma: no cover
 			return
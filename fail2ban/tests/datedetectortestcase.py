@@ -24,13 +24,20 @@ __author__ = "Cyril Jaquier"
 __copyright__ = "Copyright (c) 2004 Cyril Jaquier"
 __license__ = "GPL"
 
+import glob
+import os
 import unittest
+import threading
 import time
 import datetime
 
 from ..server.datedetector import DateDetector
-from ..server.datetemplate import DateTemplate
-from .utils import setUpMyTime, tearDownMyTime
+from ..server.datetemplate import DateTemplate, DatePatternRegex
+from ..server.mytime import MyTime
+from ..server.strptime import reGroupDictStrptime, fastGroupDictStrptime
+from .utils import setUpMyTime, tearDownMyTime, logSys
+
+TEST_FILES_DIR = os.path.join(os.path.dirname(__file__), "files")
 
 
 class DateDetectorTest(unittest.TestCase):
@@ -75,6 +82,24 @@ class DateDetectorTest(unittest.TestCase):
 		self.assertEqual(datelog, dateUnix)
 		self.assertEqual(matchlog.group(), 'Jan 23 21:59:59')
 
+	def testPerfStats(self):
+		self.assertEqual(self.__datedetector.getPerfSample(), 0)
+		self.assertEqual(self.__datedetector.templates[0].perfStats, None)
+		self.__datedetector.setPerfSample(2)
+		log = "Jan 23 21:59:59 [sshd] error: PAM: Authentication failure"
+		for i in xrange(3):
+			self.assertTrue(self.__datedetector.matchTime(log))
+			self.assertTrue(self.__datedetector.getTime(log))
+		stats = self.__datedetector.templates[0].perfStats
+		self.assertEqual((stats.calls, stats.hits, stats.sampled), (6, 6, 3))
+		self.assertTrue(stats.totalTime >= stats.sampledTime)
+		# not matched templates are counted as well:
+		self.__datedetector.getTime("no date here")
+		self.assertEqual((stats.calls, stats.hits), (7, 6))
+		self.assertEqual(self.__datedetector.templates[1].perfStats.hits, 0)
+		self.__datedetector.setPerfSample(0)
+		self.assertEqual(self.__datedetector.templates[0].perfStats, None)
+
 	def testVariousTimes(self):
 		"""Test detection of various common date/time formats f2b should understand
 		"""
@@ -126,8 +151,62 @@ class DateDetectorTest(unittest.TestCase):
 						self.assertEqual(logMatch.group(), '1106513999.000')
 					else:
 						self.assertEqual(logMatch.group(), sdate)
+					# single pass (match and parse) gives the same:
+					( logUnix, logMatch2, template ) = self.__datedetector.findTime(log)
+					self.assertEqual(logUnix, dateUnix)
+					self.assertEqual(logMatch2.group(), logMatch.group())
 				else:
 					self.assertEqual(logtime, None, "getTime should have not matched for %r Got: %s" % (sdate, logtime))
+					self.assertEqual(self.__datedetector.findTime(log), None)
+
+	def testFindTimeHitsThreads(self):
+		log = "2005-01-23 21:59:59 [sshd] error: PAM: Authentication failure"
+		template = self.__datedetector.getTemplate(
+			"Year(?P<_sep>[-/.])Month(?P=_sep)Day 24hour:Minute:Second(?:,Microseconds)?")
+		self.assertNotEqual(template, None)
+		def _find():
+			for i in xrange(100):
+				self.assertEqual(self.__datedetector.findTime(log)[0], 1106513999.0)
+		threads = [threading.Thread(target=_find) for i in xrange(4)]
+		for t in threads:
+			t.start()
+		# sort concurrently to readers (copy-on-write, no lock in readers):
+		for i in xrange(10):
+			self.__datedetector.sortTemplate()
+		for t in threads:
+			t.join()
+		# hits of all threads are counted:
+		self.assertEqual(template.hits, 400)
+		self.__datedetector.sortTemplate()
+		self.assertEqual(self.__datedetector.templates[0], template)
+		# parse failure of matched template still gives its match:
+		date, match, _ = self.__datedetector.findTime("2005-02-30 21:59:59 fail")
+		self.assertEqual(date, None)
+		self.assertEqual(match.group(), "2005-02-30 21:59:59")
+		template.hits = 0
+		self.assertEqual(template.hits, 0)
+
+	def testFindTimePreferred(self):
+		log = "2005-01-23 21:59:59 [sshd] error: PAM: Authentication failure"
+		iso = self.__datedetector.getTemplate(
+			"Year-Month-Day[T ]24hour:Minute:Second(?:\\.Microseconds)?(?:Zone offset)?")
+		self.assertNotEqual(iso, None)
+		self.assertEqual(self.__datedetector.getTemplate("unknown"), None)
+		# first matching template:
+		date, match, template = self.__datedetector.findTime(log)
+		self.assertEqual(date, 1106513999.0)
+		self.assertNotEqual(template, iso)
+		# preferred template matches too (tried first):
+		date, match, template = self.__datedetector.findTime(log, iso.name)
+		self.assertEqual(date, 1106513999.0)
+		self.assertEqual(template, iso)
+		# preferred template does not match - full list:
+		date, match, template = self.__datedetector.findTime(
+			"Jan 23 21:59:59 [sshd] error", iso.name)
+		self.assertEqual(date, 1106513999.0)
+		self.assertEqual(template, self.__datedetector.templates[0])
+		# unknown preferred template is ignored:
+		self.assertEqual(self.__datedetector.findTime(log, "unknown")[0], 1106513999.0)
 
 	def testStableSortTemplate(self):
 		old_names = [x.name for x in self.__datedetector.templates]
@@ -140,6 +219,137 @@ class DateDetectorTest(unittest.TestCase):
 		self.assertRaises(ValueError, self.__datedetector.appendTemplate,
 						  self.__datedetector.templates[0])
 
+	def testParseCache(self):
+		def _mktime(*args):
+			return time.mktime(datetime.datetime(*args).timetuple())
+		cached = {}
+		def _check(pattern, line, expected):
+			# cached template and parse without cache should give the same:
+			template = cached.get(pattern)
+			if template is None:
+				template = cached[pattern] = DatePatternRegex(pattern)
+			self.assertEqual(template.getDate(line)[0], expected)
+			fresh = DatePatternRegex(pattern)
+			fresh.parseCache.maxSize = 0
+			self.assertEqual(fresh.getDate(line)[0], expected)
+			return template.parseCache
+		# now is Sun Aug 14 12:00:00 2005:
+		syslog = "%b %d %H:%M:%S"
+		for i in xrange(3):
+			cache = _check(syslog, "Aug 14 11:00:00 x", _mktime(2005, 8, 14, 11, 0, 0))
+		self.assertEqual((cache.hits, cache.misses), (2, 1))
+		self.assertEqual(cache.hitRate, 2 / 3.0)
+		# in the future - last year, until this time is reached:
+		_check(syslog, "Aug 14 13:00:00 x", _mktime(2004, 8, 14, 13, 0, 0))
+		MyTime.setTime(_mktime(2005, 8, 14, 13, 0, 0))
+		_check(syslog, "Aug 14 13:00:00 x", _mktime(2005, 8, 14, 13, 0, 0))
+		# time set backwards:
+		MyTime.setTime(_mktime(2005, 8, 14, 12, 0, 0))
+		_check(syslog, "Aug 14 13:00:00 x", _mktime(2004, 8, 14, 13, 0, 0))
+		# new year rollover:
+		MyTime.setTime(_mktime(2005, 12, 31, 23, 59, 59))
+		_check(syslog, "Jan 01 00:00:05 x", _mktime(2005, 1, 1, 0, 0, 5))
+		MyTime.setTime(_mktime(2006, 1, 1, 0, 0, 10))
+		_check(syslog, "Jan 01 00:00:05 x", _mktime(2006, 1, 1, 0, 0, 5))
+		_check(syslog, "Dec 31 23:59:59 x", _mktime(2005, 12, 31, 23, 59, 59))
+		# time only - rollover at midnight:
+		MyTime.setTime(_mktime(2005, 8, 14, 12, 0, 0))
+		_check("^%H:%M:%S", "23:00:00 x", _mktime(2005, 8, 13, 23, 0, 0))
+		MyTime.setTime(_mktime(2005, 8, 15, 0, 30, 0))
+		_check("^%H:%M:%S", "23:00:00 x", _mktime(2005, 8, 14, 23, 0, 0))
+		cache = _check("^%H:%M:%S", "00:10:00 x", _mktime(2005, 8, 15, 0, 10, 0))
+		self.assertEqual((cache.hits, cache.misses), (0, 3))
+		# full date does not depend on current time:
+		for i in xrange(2):
+			MyTime.setTime(_mktime(2005 + i, 8, 14, 12, 0, 0))
+			cache = _check("%Y-%m-%d %H:%M:%S", "2005-01-23 21:59:59",
+				_mktime(2005, 1, 23, 21, 59, 59))
+		self.assertEqual((cache.hits, cache.misses), (1, 1))
+		# bounded:
+		cache.maxSize = 2
+		for i in xrange(5):
+			_check("%Y-%m-%d %H:%M:%S", "2005-01-23 21:59:5%d" % i,
+				_mktime(2005, 1, 23, 21, 59, 50 + i))
+		self.assertEqual(len(cache), 2)
+		self.assertTrue(str(cache).startswith("hits: 1, misses: 6,"))
+
+	def _compareParsers(self, template, line, validRange=False):
+		# fast parser and generic one should give the same result (or error):
+		match = template.matchDate(line)
+		if not match:
+			return None
+		groups = match.groupdict()
+		try:
+			generic = reGroupDictStrptime(
+				dict((k, v) for k, v in groups.iteritems() if v is not None),
+				validRange)
+		except ValueError:
+			self.assertRaises(ValueError, fastGroupDictStrptime, groups, validRange)
+			return None
+		fast = fastGroupDictStrptime(groups, validRange)
+		self.assertEqual(fast, generic, "%r: %r != %r (generic), now %s" % (
+			line, fast, generic, MyTime.time()))
+		return fast
+
+	def testFastParser(self):
+		templates = [t for t in self.__datedetector.templates
+			if getattr(t, '_fastParse', False)]
+		self.assertEqual(len(templates), 11)
+		lines = (
+			"Jan 23 21:59:59", "Sun Jan 23 21:59:59.011 2005", "Dec 31 23:59:59",
+			"Jan 01 00:00:00", "Aug 14 12:00:00", "Aug 14 12:00:00.500",
+			"Aug 14 11:59:59.999", "Feb 29 10:00:00", "Feb 29 10:00:00 2004",
+			"Mar 27 02:30:00", "Mar 27 12:00:00", "Oct 30 02:30:00",
+			"Oct 30 12:00:00", "Sep 31 12:00:00", "Jan 23 21:59:60",
+			"2005-01-23 21:59:59,000", "2005.03.27 02:30:00", "23/01/05 21:59:59",
+			"23/Jan/2005:21:59:59 +0100", "23-Jan-2005 21:59:59 -0530",
+			"23/Jan/2005:21:59:59 +0000", "26-Jul-2007 15:20:52.252",
+			"2005-01-23T20:59:59.252Z", "2005-01-23T15:59:59-05:00",
+			"2005-01-23T21:59:59", "<01/23/05@21:59:59>", "050123 21:59:59",
+			"Jan-23-05 21:59:59", "01-23-2005 21:59:59.252",
+		)
+		# now at different time (also DST change days in CET):
+		for now in (1124013600, 1106513999, 1104537599, 1104537600,
+				1111887000, 1130632200, 1109617200):
+			MyTime.setTime(now)
+			for line in lines:
+				for template in templates:
+					self._compareParsers(template, line)
+					self._compareParsers(template, line, True)
+
+	def testFastParserSampleLogs(self):
+		# compare fast parser with generic one on sample logs (benchmark):
+		templates = [t for t in self.__datedetector.templates
+			if getattr(t, '_fastParse', False)]
+		matches = []
+		for fn in glob.glob(os.path.join(TEST_FILES_DIR, "*.log")) + \
+				glob.glob(os.path.join(TEST_FILES_DIR, "logs", "*")):
+			if not os.path.isfile(fn):
+				continue
+			with open(fn, 'rb') as f:
+				for line in f:
+					line = line.decode('utf-8', 'replace')
+					for template in templates:
+						match = template.matchDate(line)
+						if match:
+							matches.append(match.groupdict())
+							self._compareParsers(template, line)
+							break
+		self.assertTrue(len(matches) > 1000)
+		def _bench(parse, preparse):
+			started = time.time()
+			for groups in matches:
+				try:
+					parse(preparse(groups))
+				except ValueError:
+					pass
+			return time.time() - started
+		genericTime = _bench(reGroupDictStrptime,
+			lambda groups: dict((k, v) for k, v in groups.iteritems() if v is not None))
+		fastTime = _bench(fastGroupDictStrptime, lambda groups: groups)
+		logSys.info("Parsed %d dates of sample logs: generic %.3f sec, fast %.3f sec",
+			len(matches), genericTime, fastTime)
+
 	def testFullYearMatch_gh130(self):
 		# see https://github.com/fail2ban/fail2ban/pull/130
 		# yoh: unfortunately this test is not really effective to reproduce the
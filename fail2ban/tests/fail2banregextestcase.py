@@ -134,6 +134,17 @@ class Fail2banRegexTest(LogCaptureTestCase):
 		self.assertLogged('Dez 31 11:59:59 [sshd] error: PAM: Authentication failure for kevin from 193.168.0.128')
 		self.assertLogged('Dec 31 11:59:59 [sshd] error: PAM: Authentication failure for kevin from 87.142.124.10')
 
+	def testDirectRE_1combined(self):
+		(opts, args, fail2banRegex) = _Fail2banRegex(
+			"--print-all-matched", "--combine-regex",
+			Fail2banRegexTest.FILENAME_01, 
+			Fail2banRegexTest.FILTER_SSHD
+		)
+		self.assertTrue(fail2banRegex.start(opts, args))
+		self.assertTrue(fail2banRegex._filter.getCombineRegex())
+		self.assertLogged('Lines: 19 lines, 0 ignored, 7 matched, 12 missed')
+		self.assertLogged('lines/sec]')
+
 	def testDirectRE_1raw(self):
 		(opts, args, fail2banRegex) = _Fail2banRegex(
 			"--print-all-matched", "--raw",
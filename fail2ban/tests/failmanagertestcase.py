@@ -24,10 +24,24 @@ __author__ = "Cyril Jaquier"
 __copyright__ = "Copyright (c) 2004 Cyril Jaquier"
 __license__ = "GPL"
 
+import sys
+import threading
 import unittest
 
+from ..server.faildata import FailData
 from ..server.failmanager import FailManager, FailManagerEmpty
 from ..server.ticket import FailTicket
+from ..helpers import getLogger
+
+logSys = getLogger("fail2ban")
+
+
+def _failData(failManager):
+	# failure data of all IPs (from all shards):
+	failList = {}
+	for shard in failManager._FailManager__shards:
+		failList.update(shard.failList)
+	return failList
 
 
 class AddFailure(unittest.TestCase):
@@ -83,7 +97,27 @@ class AddFailure(unittest.TestCase):
 		timestamp = 1167605990.0
 		self.__failManager.cleanup(timestamp)
 		self.assertEqual(self.__failManager.size(), 2)
-	
+
+	def testCleanupExpiry(self):
+		failManager = FailManager()
+		failManager.setMaxTime(100)
+		failManager.setMaxRetry(2)
+		for ip, t in (("192.0.2.1", 1000), ("192.0.2.2", 1010),
+				("192.0.2.3", 1020), ("192.0.2.1", 1050)):
+			failManager.addFailure(FailTicket(ip, t))
+		# 192.0.2.1 failed again - rescheduled, not removed:
+		failManager.cleanup(1115)
+		self.assertEqual(failManager.size(), 2)
+		# banned and added again - the old entry does not remove it:
+		self.assertEqual(failManager.toBan().getIP(), "192.0.2.1")
+		failManager.addFailure(FailTicket("192.0.2.1", 1200))
+		failManager.cleanup(1151)
+		self.assertEqual(failManager.size(), 1)
+		failManager.cleanup(1299)
+		self.assertEqual(failManager.size(), 1)
+		failManager.cleanup(1301)
+		self.assertEqual(failManager.size(), 0)
+
 	def testbanOK(self):
 		self.__failManager.setMaxRetry(5)
 		#ticket = FailTicket('193.168.0.128', None)
@@ -120,3 +154,147 @@ class AddFailure(unittest.TestCase):
 		ticket = self.__failManager.toBan()
 		self.assertNotEqual(ticket.getIP(), "100.100.10.10")
 		self.assertRaises(FailManagerEmpty, self.__failManager.toBan)
+
+	def testToBanAll(self):
+		tickets = self.__failManager.toBanAll()
+		self.assertEqual(sorted(t.getIP() for t in tickets),
+			["193.168.0.128", "87.142.124.10"])
+		self.assertEqual(self.__failManager.size(), 1)
+		self.assertEqual(self.__failManager.toBanAll(), [])
+		self.assertRaises(FailManagerEmpty, self.__failManager.toBan)
+
+	def testReadyToBan(self):
+		failManager = FailManager()
+		failManager.setMaxTime(100)
+		for t in (1000, 1010):
+			failManager.addFailure(FailTicket("192.0.2.1", t))
+		# ready after change of maxretry:
+		self.assertEqual(failManager.toBanAll(), [])
+		failManager.setMaxRetry(2)
+		self.assertEqual([t.getAttempt() for t in failManager.toBanAll()], [2])
+		# reset of the window - no more ready:
+		failManager.setMaxRetry(3)
+		for t in (1020, 1030, 1040):
+			failManager.addFailure(FailTicket("192.0.2.2", t))
+		failManager.addFailure(FailTicket("192.0.2.2", 1200))
+		self.assertEqual(failManager.toBanAll(), [])
+		# in order of reaching maxretry:
+		for ip in ("192.0.2.3", "192.0.2.2", "192.0.2.3"):
+			for t in (1201, 1202):
+				failManager.addFailure(FailTicket(ip, t))
+		self.assertEqual([t.getIP() for t in failManager.toBanAll()],
+			["192.0.2.2", "192.0.2.3"])
+
+	def testFailDataMatches(self):
+		data = FailData()
+		self.assertFalse(hasattr(data, '__dict__'))
+		self.assertEqual(data.getMatches(), [])
+		data.inc()
+		self.assertEqual((data.getRetry(), data.getMatches()), (1, []))
+		for i in xrange(5):
+			data.inc(["line %d" % i], 3)
+		# bounded to the last 3 failures:
+		self.assertEqual(data.getRetry(), 6)
+		self.assertEqual(data.getMatches(), ["line 2", "line 3", "line 4"])
+		# multi-line failures:
+		data.inc(["line 5a", "line 5b"], 2)
+		data.inc(["line 6a", "line 6b"], 2)
+		self.assertEqual(data.getMatches(),
+			["line 5a", "line 5b", "line 6a", "line 6b"])
+		# trimmed by failures (of different count of lines):
+		data.inc(["line 7a", "line 7b", "line 7c"], 2)
+		self.assertEqual(data.getMatches(),
+			["line 6a", "line 6b", "line 7a", "line 7b", "line 7c"])
+		data.inc(["line 8"], 2)
+		self.assertEqual(data.getMatches(),
+			["line 7a", "line 7b", "line 7c", "line 8"])
+		data.setRetry(1)
+		self.assertEqual(data.getMatches(), ["line 8"])
+		data.setRetry(0)
+		self.assertEqual(data.getMatches(), [])
+
+	def testInternMatches(self):
+		failManager = FailManager()
+		failManager.setMaxRetry(10)
+		self.assertFalse(failManager.getInternMatches())
+		failManager.setInternMatches(True)
+		# decoded lines are unicode (cannot be interned by python 2):
+		for i in xrange(2):
+			failManager.addFailure(FailTicket("192.0.2.1", 1000 + i,
+				[u"".join((u"shared", u" line")), u"line %d" % i]))
+		matches = _failData(failManager)["192.0.2.1"].getMatches()
+		self.assertEqual(len(matches), 4)
+		self.assertTrue(matches[0] is matches[2])
+		# unused lines are pruned on cleanup:
+		failManager.setMaxTime(100)
+		for i in xrange(FailManager.INTERN_MIN):
+			failManager.addFailure(FailTicket("192.0.2.2", 1000,
+				[u"other line %d" % i]))
+		lines = failManager._FailManager__lines
+		self.assertTrue(len(lines) > FailManager.INTERN_MIN)
+		# (the window of 192.0.2.1 is reset, so it keeps the last line only)
+		failManager.addFailure(FailTicket("192.0.2.1", 1200, [u"line 2"]))
+		failManager.cleanup(1250)
+		self.assertEqual(failManager.size(), 1)
+		self.assertEqual(list(failManager._FailManager__lines), [u"line 2"])
+		failManager.setInternMatches(False)
+		self.assertFalse(failManager.getInternMatches())
+
+	def testMemoryPerIP(self):
+		# memory benchmark: bytes per tracked IP (without the IP strings)
+		failManager = FailManager()
+		failManager.setMaxRetry(5)
+		count = 2000
+		for i in xrange(count):
+			ip = "10.%d.%d.%d" % (i >> 16, (i >> 8) & 255, i & 255)
+			for t in xrange(20):
+				failManager.addFailure(FailTicket(ip, 1000 + t,
+					["%s failure %d" % (ip, t)]))
+		self.assertEqual(failManager.size(), count)
+		size = sum(sys.getsizeof(shard.failList)
+			for shard in failManager._FailManager__shards)
+		failList = _failData(failManager)
+		for data in failList.itervalues():
+			matches = data.getMatches()
+			self.assertEqual(len(matches), 5)
+			size += sys.getsizeof(data) + sys.getsizeof(matches) + \
+				sum(sys.getsizeof(line) for line in matches)
+		logSys.info("Tracked %d IPs with %d failures each: %d bytes per IP",
+			count, 20, size // count)
+		# the matches of 5 failures (strings ~60 bytes) and small overhead:
+		self.assertTrue(size // count < 800, size // count)
+
+	def testShards(self):
+		failManager = FailManager(shards=4)
+		failManager.setMaxRetry(2)
+		ips = ["192.0.2.%d" % i for i in xrange(20)]
+		for t in (1000, 1001):
+			for ip in ips:
+				failManager.addFailure(FailTicket(ip, t))
+		self.assertEqual(failManager.size(), 20)
+		self.assertEqual(failManager.getFailTotal(), 40)
+		self.assertTrue(len([s for s in failManager._FailManager__shards
+			if s.failList]) > 1)
+		# order of reaching maxretry over all shards:
+		self.assertEqual(failManager.toBan().getIP(), ips[0])
+		self.assertEqual([t.getIP() for t in failManager.toBanAll()], ips[1:])
+		failManager.setFailTotal(5)
+		self.assertEqual(failManager.getFailTotal(), 5)
+
+	def testShardsThreads(self):
+		failManager = FailManager()
+		failManager.setMaxRetry(1000)
+		def _add(n):
+			for i in xrange(500):
+				failManager.addFailure(FailTicket("192.0.%d.%d" % (n, i % 50), 1000 + i))
+		threads = [threading.Thread(target=_add, args=(n,)) for n in xrange(4)]
+		for thread in threads:
+			thread.start()
+		for thread in threads:
+			thread.join()
+		self.assertEqual(failManager.size(), 200)
+		self.assertEqual(failManager.getFailTotal(), 2000)
+		failManager.setMaxRetry(10)
+		tickets = failManager.toBanAll()
+		self.assertEqual(len(tickets), 200)
+		self.assertEqual(set(t.getAttempt() for t in tickets), set([10]))
@@ -23,6 +23,9 @@ __copyright__ = "Copyright (c) 2004 Cyril Jaquier; 2012 Yaroslav Halchenko"
 __license__ = "GPL"
 
 from __builtin__ import open as fopen
+import bz2
+import datetime
+import gzip
 import unittest
 import getpass
 import os
@@ -38,8 +41,13 @@ except ImportError:
 
 from ..server.jail import Jail
 from ..server.filterpoll import FilterPoll
+try:
+	from ..server.filterinotify import FilterInotify
+except ImportError: # pragma: no cover
+	FilterInotify = None
 from ..server.filter import Filter, FileFilter, FileContainer, locale, DNSUtils
 from ..server.failmanager import FailManagerEmpty
+from ..server.logcache import LogBlockCache
 from ..server.mytime import MyTime
 from .utils import setUpMyTime, tearDownMyTime, mtimesleep, LogCaptureTestCase
 from .dummyjail import DummyJail
@@ -214,6 +222,30 @@ class BasicFilter(unittest.TestCase):
 		self.filter.setUseDns(False)
 		self.assertEqual(self.filter.getUseDns(), 'no')
 
+	def testGetSetCombineRegex(self):
+		# default is off
+		self.assertEqual(self.filter.getCombineRegex(), False)
+		self.filter.setCombineRegex(True)
+		self.assertEqual(self.filter.getCombineRegex(), True)
+		self.filter.setCombineRegex("false")
+		self.assertEqual(self.filter.getCombineRegex(), False)
+		self.filter.setCombineRegex("yes")
+		self.assertEqual(self.filter.getCombineRegex(), True)
+
+	def testFailRegexLiterals(self):
+		self.assertEqual(self.filter.getFailRegexLiterals(), None)
+		self.filter.addFailRegex("sshd\\[\\d+\\]: Failed password for .* from <HOST>")
+		self.filter.addFailRegex("Invalid user .* from <HOST>")
+		self.assertEqual(self.filter.getFailRegexLiterals(), [
+			[']: Failed password for ', ' from ', 'sshd['],
+			['Invalid user ', ' from ']])
+		# not possible with multi-line buffer or a failregex without literals:
+		self.filter.setMaxLines(2)
+		self.assertEqual(self.filter.getFailRegexLiterals(), None)
+		self.filter.setMaxLines(1)
+		self.filter.addFailRegex("^<HOST>$")
+		self.assertEqual(self.filter.getFailRegexLiterals(), None)
+
 	def testGetSetDatePattern(self):
 		self.assertEqual(self.filter.getDatePattern(),
 			(None, "Default Detectors"))
@@ -397,6 +429,331 @@ class LogFileMonitor(LogCaptureTestCase):
 		# shorter wait time for not modified status
 		return not self.isModified(0.4)
 
+	def testAdaptivePolling(self):
+		f = self.filter
+		f.sleeptime = 1
+		# by default idle files back off up to 8 times sleeptime:
+		self.assertEqual(f.maxBackoff, FilterPoll.MAX_BACKOFF)
+		self.assertEqual(f.maxBackoff, 8)
+		self.assertEqual(FilterPoll(DummyJail(), maxbackoff=0).maxBackoff, 1)
+		now = time.time()
+		# first check within the sleeptime:
+		self.assertEqual(f._getDuePolls(now + 1), [self.name])
+		self.assertEqual(f._getDuePolls(now + 1), [])
+		self.assertEqual(f.getPollInterval(self.name), 1)
+		# idle file backs off exponentially (up to sleeptime * maxBackoff),
+		# overdue check reschedules from now:
+		intervals = []
+		t = now + 10
+		for i in xrange(6):
+			f._schedulePoll(self.name, False, t)
+			intervals.append(f.getPollInterval(self.name))
+			self.assertEqual(f._getDuePolls(t + intervals[-1] - 0.01), [])
+			t += intervals[-1]
+			self.assertEqual(f._getDuePolls(t), [self.name])
+		self.assertEqual(intervals, [2, 4, 8, 8, 8, 8])
+		# modified file is polled each sleeptime again:
+		f._schedulePoll(self.name, True, t)
+		self.assertEqual(f.getPollInterval(self.name), 1)
+		self.assertTrue(f.getPollRate(self.name, now + 100) > 0)
+		status = dict(f.status(flavor="perf"))
+		self.assertEqual(len(status["Poll rates"]), 1)
+		self.assertTrue(status["Poll rates"][0].startswith(self.name + ': '))
+		# removed file is not polled anymore:
+		f.delLogPath(self.name)
+		self.assertEqual(f._getDuePolls(t + 100), [])
+		self.assertEqual(f.getPollInterval(self.name), None)
+		# checks of many files are spread over the interval:
+		f = FilterPoll(DummyJail())
+		names = ["%s.%d" % (self.name, i) for i in xrange(20)]
+		try:
+			now = time.time()
+			for name in names:
+				open(name, 'w').close()
+				f.addLogPath(name)
+			due = f._getDuePolls(now + 0.05)
+			self.assertTrue(0 < len(due) < 20)
+			self.assertEqual(len(f._getDuePolls(now + 1)) + len(due), 20)
+		finally:
+			for name in names:
+				_killfile(None, name)
+
+	def testReadBlocks(self):
+		lines = [b"line %d\n" % i for i in xrange(50)]
+		lines[7] = b"broken \xc3 utf-8\n"
+		lines[8] = b"valid g\xc3\xb6ran\n"
+		lines[20] = b"\n"
+		lines[30] = b"long " + b"x" * 200 + b"\n"
+		lines.append(b"incomplete last line")
+		with fopen(self.name, 'ab') as f:
+			f.write(b"".join(lines))
+		expected = [FileContainer.decode_line(self.name, 'utf-8', l) for l in lines]
+		for blockSize in (16, 100, 0x10000):
+			log = FileContainer(self.name, 'utf-8')
+			log.READ_BLOCK_SIZE = blockSize
+			read = []
+			# stop and continue reading at different places - position is exact:
+			for stop in (5, 8, 25, 51, 60):
+				self.assertTrue(log.open())
+				while len(read) < stop:
+					line = log.readline()
+					if not line:
+						break
+					read.append(line)
+				log.close()
+				self.assertEqual(log.getPos(), len(b"".join(lines[:len(read)])))
+			self.assertEqual(read, expected)
+
+	def testLogKeepOpen(self):
+		self.filter.setLogKeepOpen(True)
+		self.assertEqual(self.filter.getLogKeepOpen(), True)
+		log = self.filter.getLog(self.name)
+		def _write(n, mode='a'):
+			with open(self.name, mode) as f:
+				for i in xrange(n):
+					f.write("Aug 14 11:59:59 Authentication failure for root from 192.0.2.%d\n" % i)
+		def _failures():
+			total = self.filter.failManager.getFailTotal()
+			self.filter.getFailures(self.name)
+			return self.filter.failManager.getFailTotal() - total
+		_write(3)
+		self.assertEqual(_failures(), 3)
+		handler = log._FileContainer__handler
+		self.assertNotEqual(handler, None)
+		# appended - the same handle is used:
+		_write(2)
+		self.assertEqual(_failures(), 2)
+		self.assertTrue(log._FileContainer__handler is handler)
+		self.assertEqual(_failures(), 0)
+		# truncated:
+		_write(1, 'w')
+		self.assertEqual(_failures(), 1)
+		self.assertTrue(self._is_logged("Log truncation detected"))
+		# rewritten (shrunk, but not below position of a partial read),
+		# first line differs - read from begin:
+		_write(4)
+		self.assertEqual(_failures(), 4)
+		log.setPos(10)
+		with open(self.name, 'w') as f:
+			f.write("Aug 14 11:59:58 other first line\n")
+		_write(2)
+		self.assertEqual(_failures(), 2)
+		# the same first line - continue at position:
+		_write(2)
+		self.assertEqual(_failures(), 2)
+		size = os.path.getsize(self.name)
+		log.setPos(size - 10)
+		with open(self.name, 'r+') as f:
+			f.truncate(size - 5)
+		self.assertEqual(_failures(), 0)
+		# rotated (new inode):
+		os.rename(self.name, self.name + '.1')
+		try:
+			_write(3, 'w')
+			self.assertEqual(_failures(), 3)
+			self.assertFalse(log._FileContainer__handler is handler)
+		finally:
+			os.remove(self.name + '.1')
+		# disabled - closed after read:
+		self.filter.setLogKeepOpen("false")
+		self.assertEqual(_failures(), 0)
+		self.assertEqual(log._FileContainer__handler, None)
+
+	def testSharedBlocks(self):
+		cache = FileContainer.sharedBlocks
+		cache.clear()
+		self.file.write("".join("line %d\n" % i for i in xrange(1000)))
+		self.file.flush()
+		def _read(log, n=None):
+			log.open()
+			lines = []
+			while n is None or len(lines) < n:
+				line = log.readline()
+				if not line:
+					break
+				lines.append(line)
+			log.close()
+			return lines
+		# file monitored by the filter only - nothing cached:
+		log = self.filter.getLog(self.name)
+		log.READ_BLOCK_SIZE = 1000
+		self.assertEqual(len(_read(log, 10)), 10)
+		self.assertEqual((cache.hits, cache.misses, len(cache)), (0, 0, 0))
+		# short-lived (not shared) container is not a reader:
+		log1 = FileContainer(self.name, log.getEncoding(), shared=False)
+		self.assertFalse(cache.isShared(LogBlockCache.getPath(self.name)))
+		del log1
+		# second reader (other jail) of the same file - blocks are shared:
+		log2 = FileContainer(self.name, log.getEncoding())
+		log2.READ_BLOCK_SIZE = 1000
+		lines = _read(log)
+		self.assertEqual(len(lines), 990)
+		self.assertTrue(cache.misses > 0)
+		misses = cache.misses
+		self.assertEqual(cache.hits, 0)
+		lines2 = _read(log2, 10)
+		lines2 += _read(log2)
+		self.assertEqual(lines2[10:], lines)
+		self.assertTrue(cache.hits > 0)
+		# positions are per reader:
+		self.assertEqual(log.getPos(), os.path.getsize(self.name))
+		self.assertEqual(log2.getPos(), os.path.getsize(self.name))
+		self.assertTrue(str(cache).startswith("hits: %d, misses: " % cache.hits))
+		# released reader:
+		del log2
+		self.assertFalse(cache.isShared(LogBlockCache.getPath(self.name)))
+		cache.clear()
+
+	def testSeekToFindTime(self):
+		# now is 2005-08-14 12:00:00, lines from 08:00:00 each 5 seconds:
+		start = MyTime.time() - 4 * 60 * 60
+		def _lines(order):
+			for i in order:
+				yield "%s sshd[1]: Authentication failure for root from 192.0.2.%d\n" % (
+					time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(start + i * 5)),
+					i % 100)
+		for order, skipped in (
+			(xrange(2880), True),
+			# not monotonic - fallback to read whole file:
+			(reversed(xrange(2880)), False),
+		):
+			self.tearDown()
+			self.setUp()
+			self.file.write("".join(_lines(order)))
+			self.file.flush()
+			self.assertTrue(os.path.getsize(self.name) > FileContainer.READ_BLOCK_SIZE)
+			self.filter.getFailures(self.name)
+			# only lines within find time (10 minutes):
+			self.assertEqual(self.filter.failManager.getFailTotal(), 120)
+			self.assertEqual(self._is_logged("Skipped lines older as findtime"), skipped)
+			pos = self.filter.getLog(self.name).getPos()
+			self.assertEqual(pos, os.path.getsize(self.name))
+
+	def testLogRotated(self):
+		now = MyTime.time()
+		def _lines(times):
+			return "".join(
+				"%s sshd[1]: Authentication failure for root from 192.0.2.%d\n" % (
+					time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(now - t)), t % 100)
+				for t in times)
+		# rotated files (plain, gzip, bzip2) and live file, only lines within
+		# findtime (600 sec) are counted:
+		rotated = (
+			# not modified within findtime - skipped without read:
+			(".3.bz2", bz2.BZ2File, xrange(100, 50, -5), 900),
+			(".2.gz", gzip.GzipFile, xrange(2000, 400, -10), 400),
+			(".1", fopen, xrange(2000, 200, -10), 200),
+			(".bak", fopen, xrange(150, 100, -5), 100),
+		)
+		try:
+			for suffix, opener, times, mtime in rotated:
+				f = opener(self.name + suffix, 'wb')
+				f.write(_lines(times).encode('ascii'))
+				f.close()
+				os.utime(self.name + suffix, (now - mtime, now - mtime))
+			self.file.write(_lines(xrange(100, 0, -10)))
+			self.file.flush()
+			self.filter.setLogRotated(True)
+			self.assertTrue(self.filter.getLogRotated())
+			self.filter.getFailures(self.name)
+			self.assertTrue(self._is_logged("Reading rotated log %s.2.gz" % self.name))
+			self.assertTrue(self._is_logged("Reading rotated log %s.1" % self.name))
+			# old lines of the compressed file skipped (in blocks) without decoding:
+			self.assertTrue(self._is_logged(
+				"Skipped 100 lines older as findtime in %s.2.gz" % self.name))
+			self.assertFalse(self._is_logged("Reading rotated log %s.3.bz2" % self.name))
+			self.assertFalse(self._is_logged(".bak"))
+			self.assertEqual(self.filter.failManager.getFailTotal(),
+				len(xrange(600, 400, -10)) + len(xrange(600, 200, -10)) + 10)
+			# not read again (position is known):
+			self.filter.getFailures(self.name)
+			self.assertEqual(self.filter.failManager.getFailTotal(),
+				len(xrange(600, 400, -10)) + len(xrange(600, 200, -10)) + 10)
+		finally:
+			for suffix, _, _, _ in rotated:
+				_killfile(None, self.name + suffix)
+
+	def testIngestLogs(self):
+		# backlog of 3 files (interleaved in time), with 2 workers:
+		start = MyTime.time() - 5 * 60
+		names = ["%s.%d" % (self.name, k) for k in xrange(3)]
+		def _tickets(flt):
+			tickets = []
+			try:
+				while True:
+					tickets.append(_ticket_tuple(flt.failManager.toBan()))
+			except FailManagerEmpty:
+				pass
+			return sorted(tickets)
+		try:
+			for k, name in enumerate(names):
+				with open(name, 'w') as f:
+					for i in xrange(k, 300, 3):
+						f.write("%s sshd[1]: Authentication failure for root from 192.0.2.%d\n" % (
+							time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(start + i)), i % 7))
+			filters = []
+			for workers in (1, 2):
+				flt = FilterPoll(DummyJail())
+				flt.setLogWorkers(workers)
+				flt.active = True
+				flt.addFailRegex("Authentication failure for .* from <HOST>")
+				for name in names:
+					flt.addLogPath(name)
+				filters.append(flt)
+			# sequential (no workers):
+			self.assertFalse(filters[0].ingestLogs())
+			for name in names:
+				filters[0].getFailures(name)
+			# parallel:
+			self.assertTrue(filters[1].ingestLogs())
+			self.assertTrue(self._is_logged("Catching up 3 log files using 2 workers"))
+			for name in names:
+				self.assertEqual(filters[1].getLog(name).getPos(), os.path.getsize(name))
+				# nothing to read anymore:
+				filters[1].getFailures(name)
+			self.assertEqual(filters[1].failManager.getFailTotal(), 300)
+			self.assertEqual(filters[1].failManager.getFailTotal(),
+				filters[0].failManager.getFailTotal())
+			# same tickets, but the matches of parallel are in timestamp order,
+			# so the kept (last maxretry) matches are the latest failures
+			# (sequential reads the files one after another):
+			tickets = _tickets(filters[1])
+			self.assertEqual(len(tickets), 7)
+			for ticket in tickets:
+				self.assertEqual(len(ticket[3]), 3)
+				self.assertEqual(ticket[3], sorted(ticket[3]))
+				self.assertTrue(ticket[3][-1].startswith(
+					time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(ticket[2]))))
+			self.assertEqual(
+				[t[:3] for t in tickets],
+				[t[:3] for t in _tickets(filters[0])])
+		finally:
+			for name in names:
+				_killfile(None, name)
+
+	def testDateTemplatePinning(self):
+		detector = self.filter.dateDetector
+		syslog = detector.getTemplate(
+			"(?:DAY )?MON Day 24hour:Minute:Second(?:\\.Microseconds)?(?: Year)?")
+		iso = detector.getTemplate(
+			"Year-Month-Day[T ]24hour:Minute:Second(?:\\.Microseconds)?(?:Zone offset)?")
+		log = self.filter.getLog(self.name)
+		self.assertEqual(log.getDateTemplate(), None)
+		self.file.write("2005-01-23T21:59:59 line in iso format\n")
+		self.file.write("Aug 14 11:58:59 line in syslog format\n")
+		self.file.flush()
+		self.filter.getFailures(self.name)
+		# pinned template of the last line:
+		self.assertEqual(log.getDateTemplate(), syslog.name)
+		self.assertTrue(syslog.matchDate("Aug 14 11:58:59 line in syslog format"))
+		self.assertFalse(syslog.matchDate("2005-01-23T21:59:59 line in iso format"))
+		self.file.write("2005-01-23 21:59:59 matches also iso template\n")
+		self.file.flush()
+		log.setDateTemplate(iso.name)
+		self.filter.getFailures(self.name)
+		# pinned template matched, so it is retained:
+		self.assertEqual(log.getDateTemplate(), iso.name)
+
 	def testUnaccessibleLogFile(self):
 		os.chmod(self.name, 0)
 		self.filter.getFailures(self.name)
@@ -713,6 +1070,46 @@ def get_monitor_failures_testcase(Filter_):
 	return MonitorFailures
 
 
+class MonitorInotifyFailures(unittest.TestCase):
+	"""Tests specific to the native inotify backend.
+	"""
+
+	def setUp(self):
+		"""Call before every test case."""
+		if FilterInotify is None: # pragma: no cover
+			raise unittest.SkipTest("Native inotify is not available")
+		setUpMyTime()
+		self.name = tempfile.mktemp('fail2ban', 'monitorinotify')
+		self.file = open(self.name, 'a')
+		self.jail = DummyJail()
+		self.filter = FilterInotify(self.jail)
+		self.filter.addLogPath(self.name)
+		self.filter.active = True
+		self.filter.addFailRegex("(?:(?:Authentication failure|Failed [-/\w+]+) for(?: [iI](?:llegal|nvalid) user)?|[Ii](?:llegal|nvalid) user|ROOT LOGIN REFUSED) .*(?: from|FROM) <HOST>")
+		self.filter.start()
+
+	def tearDown(self):
+		tearDownMyTime()
+		self.filter.stop()
+		self.filter.join()
+		_killfile(self.file, self.name)
+
+	def test_coalesce_events(self):
+		# burst of modifications is read in few batches
+		for i in xrange(50):
+			self.file.write("noise line %d\n" % i)
+			self.file.flush()
+		_copy_lines_between_files(GetFailures.FILENAME_01, self.file, n=100)
+		time0 = time.time()
+		while not len(self.jail) and time.time() < time0 + 20:
+			time.sleep(0.1)
+		_assert_correct_last_attempt(self, self.jail, GetFailures.FAILURES_01)
+		stats = dict(self.filter.status(flavor="perf"))["Inotify events"]
+		events, batches = [int(x.split(': ')[1]) for x in stats.split(', ')]
+		self.assertTrue(events >= batches)
+		self.assertTrue(0 < batches < 10, stats)
+
+
 def get_monitor_failures_journal_testcase(Filter_): # pragma: systemd no cover
 	"""Generator of TestCase's for journal based filters/backends
 	"""
@@ -751,6 +1148,22 @@ def get_monitor_failures_journal_testcase(Filter_): # pragma: systemd no cover
 		def testJournalFlagsArg(self):
 			self._initFilter(journalflags=2) # journal.RUNTIME_ONLY
 
+		def testPrefilterJournalEntry(self):
+			self._initFilter()
+			literals = self.filter.getFailRegexLiterals()
+			entry = {'SYSLOG_IDENTIFIER': u'sshd', 'SYSLOG_PID': 1234,
+				'MESSAGE': u'Failed password for root from 192.0.2.1 port 22'}
+			self.assertTrue(self.filter.prefilterJournalEntry(entry, literals))
+			entry['MESSAGE'] = u'Accepted password for root from 192.0.2.1 port 22'
+			self.assertFalse(self.filter.prefilterJournalEntry(entry, literals))
+			# fragment spanning the boundary of identifier and message:
+			literals = [['d[1234]: Acc']]
+			self.assertTrue(self.filter.prefilterJournalEntry(entry, literals))
+			self.assertEqual(
+				self.filter.formatJournalEntry(dict(entry,
+					__REALTIME_TIMESTAMP=datetime.datetime.now()))[0][2],
+				'sshd[1234]: Accepted password for root from 192.0.2.1 port 22')
+
 		def __str__(self):
 			return "MonitorJournalFailures%s(%s)" \
 			  % (Filter_, hasattr(self, 'name') and self.name or 'tempfile')
@@ -946,9 +1359,10 @@ class GetFailures(LogCaptureTestCase):
 		_killfile(fout, fname)
 
 	def testGetFailures02(self):
+		# 4 attempts, but matches of the last maxretry (3) failures only:
 		output = ('141.3.81.106', 4, 1124013539.0,
 				  [u'Aug 14 11:%d:59 i60p295 sshd[12365]: Failed publickey for roehl from ::ffff:141.3.81.106 port 51332 ssh2'
-				   % m for m in 53, 54, 57, 58])
+				   % m for m in 54, 57, 58])
 
 		self.filter.addLogPath(GetFailures.FILENAME_02)
 		self.filter.addFailRegex("Failed .* from <HOST>")
@@ -1047,6 +1461,10 @@ class GetFailures(LogCaptureTestCase):
 		self.filter.getFailures(GetFailures.FILENAME_02)
 		_assert_correct_last_attempt(self, self.filter, output)
 
+	def testGetFailuresMultiRegexCombined(self):
+		self.filter.setCombineRegex(True)
+		self.testGetFailuresMultiRegex()
+
 	def testGetFailuresIgnoreRegex(self):
 		self.filter.addLogPath(GetFailures.FILENAME_02)
 		self.filter.addFailRegex("Failed .* from <HOST>")
@@ -1111,6 +1529,10 @@ class GetFailures(LogCaptureTestCase):
 				break
 		self.assertEqual(sorted(foundList), sorted(output))
 
+	def testGetFailuresMultiLineMultiRegexCombined(self):
+		self.filter.setCombineRegex(True)
+		self.testGetFailuresMultiLineMultiRegex()
+
 
 class DNSUtilsTests(unittest.TestCase):
 
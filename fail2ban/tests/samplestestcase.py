@@ -31,7 +31,7 @@ import re
 import sys
 import time
 import unittest
-from ..server.failregex import Regex
+from ..server.failregex import Regex, FailRegex, CombinedRegex
 from ..server.filter import Filter
 from ..client.filterreader import FilterReader
 from .utils import setUpMyTime, tearDownMyTime, CONFIG_DIR
@@ -78,6 +78,37 @@ class FilterSamplesRegex(unittest.TestCase):
 		self.assertFalse(
 			RE_WRONG_GREED.search('non-greedy .+? test' + RE_HOST + ' test vary catch-all .* anchored$'))
 
+	def testCombinedRegexSamples(self):
+		"""Check combined failregex finds a match iff any single failregex does"""
+		for name in os.listdir(os.path.join(CONFIG_DIR, "filter.d")):
+			if name.endswith('common.conf') or not name.endswith('.conf'):
+				continue
+			name = name.rpartition(".")[0]
+			filterConf = FilterReader(name, "jail", {}, basedir=CONFIG_DIR)
+			filterConf.read()
+			filterConf.getOptions({})
+			regexs = [FailRegex(opt[3]) for opt in filterConf.convert()
+				if opt[2] == "addfailregex"]
+			if not regexs:
+				continue
+			combined = CombinedRegex(regexs)
+			self.assertTrue(combined.getChunkCount() <= len(regexs))
+			logFile = os.path.join(TEST_FILES_DIR, "logs", name)
+			if not os.path.isfile(logFile): # pragma: no cover
+				continue
+			for line in open(logFile, 'rb'):
+				line = line.decode('utf-8', 'replace')
+				if line.startswith("#") or not line.strip():
+					continue
+				line = line.rstrip("\r\n")
+				matched = False
+				for regex in regexs:
+					regex.search([(line,)])
+					if regex.hasMatched():
+						matched = True
+						break
+				self.assertEqual(combined.search(line + "\n"), matched,
+					"%s: %r" % (name, line))
 
 def testSampleRegexsFactory(name, basedir):
 	def testFilter(self):
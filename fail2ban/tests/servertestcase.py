@@ -32,7 +32,8 @@ import locale
 import sys
 import platform
 
-from ..server.failregex import Regex, FailRegex, RegexException
+from ..server.failregex import Regex, FailRegex, RegexException, \
+	CombinedRegex, LineBuffer
 from ..server.server import Server
 from ..server.jail import Jail
 from ..server.jailthread import JailThread
@@ -178,6 +179,9 @@ class Transmitter(TransmitterBase):
 		self.setGetTest("dbfile", tmpFilename)
 		self.setGetTest("dbpurgeage", "600", 600)
 		self.setGetTestNOK("dbpurgeage", "LIZARD")
+		self.setGetTest("dblogcheckpoint", "30", 30)
+		self.setGetTestNOK("dblogcheckpoint", "-1")
+		self.setGetTest("dblogcheckpoint", "0", 0)
 		# the same file name (again with jails / not changed):
 		self.server.addJail(self.jailName, "auto")
 		self.setGetTest("dbfile", tmpFilename)
@@ -196,6 +200,9 @@ class Transmitter(TransmitterBase):
 		self.assertEqual(self.transm.proceed(
 			["get", "dbpurgeage"]),
 			(0, None))
+		self.assertEqual(self.transm.proceed(
+			["set", "dblogcheckpoint", "30"]),
+			(0, None))
 		# the same (again with jails / not changed):
 		self.server.addJail(self.jailName, "auto")
 		self.assertEqual(self.transm.proceed(
@@ -289,6 +296,11 @@ class Transmitter(TransmitterBase):
 			self.transm.proceed(["set", self.jailName, "usedns", value]),
 			(0, "no"))
 
+	def testJailCombineRegex(self):
+		self.setGetTest("combineregex", "true", True, jail=self.jailName)
+		self.setGetTest("combineregex", False, jail=self.jailName)
+		self.setGetTest("combineregex", "yes", True, jail=self.jailName)
+
 	def testJailBanIP(self):
 		self.server.startJail(self.jailName) # Jail must be started
 
@@ -329,6 +341,19 @@ class Transmitter(TransmitterBase):
 			jail=self.jailName)
 		self.setGetTestNOK("logencoding", "Monkey", jail=self.jailName)
 
+	def testJailLogKeepOpen(self):
+		self.setGetTest("logkeepopen", "true", True, jail=self.jailName)
+		self.setGetTest("logkeepopen", "false", False, jail=self.jailName)
+
+	def testJailLogRotated(self):
+		self.setGetTest("logrotated", "true", True, jail=self.jailName)
+		self.setGetTest("logrotated", "false", False, jail=self.jailName)
+
+	def testJailLogWorkers(self):
+		self.setGetTest("logworkers", "4", 4, jail=self.jailName)
+		self.setGetTest("logworkers", "1", 1, jail=self.jailName)
+		self.setGetTestNOK("logworkers", "0", jail=self.jailName)
+
 	def testJailLogPath(self):
 		self.jailAddDelTest(
 			"logpath",
@@ -559,6 +584,40 @@ class Transmitter(TransmitterBase):
 			)
 		)
 
+	def testJailStatusPerf(self):
+		self.setGetTest("perfsample", "10", 10, jail=self.jailName)
+		self.setGetTestNOK("perfsample", "-1", jail=self.jailName)
+		self.setGetTestNOK("perfsample", "Duck", jail=self.jailName)
+		self.transm.proceed(["set", self.jailName, "addfailregex", "^failed from <HOST>$"])
+		self.transm.proceed(["set", self.jailName, "addignoreregex", "^ignored"])
+		flt = self.server._Server__jails[self.jailName].filter
+		for i in xrange(20):
+			flt.processLine("failed from 192.0.2.%d" % i)
+		ret = self.transm.proceed(["status", self.jailName, "perf"])
+		self.assertEqual(ret[0], 0)
+		status = dict(ret[1][0][1])
+		self.assertEqual(status['Perf sample'], 10)
+		self.assertTrue(status['Shared log blocks'].startswith("hits: "))
+		self.assertTrue(status['Failregex #0'].startswith("calls: 20, hits: 20,"))
+		# checked for the line and for the matched lines (20 matches):
+		self.assertTrue(status['Ignoreregex #0'].startswith("calls: 40, hits: 0,"))
+		self.assertEqual(
+			self.transm.proceed(["set", self.jailName, "resetperf"]), (0, None))
+		status = dict(self.transm.proceed(["status", self.jailName, "perf"])[1][0][1])
+		self.assertTrue(status['Failregex #0'].startswith("calls: 0, hits: 0,"))
+		# the same date is parsed once:
+		for i in xrange(2):
+			flt.processLine("Jan 23 21:59:59 failed from 192.0.2.1")
+		status = dict(self.transm.proceed(["status", self.jailName, "perf"])[1][0][1])
+		cache = [v for k, v in status.iteritems() if k.startswith("Date cache ")]
+		self.assertEqual(len(cache), 1)
+		self.assertTrue(cache[0].startswith("hits: 1, misses: 1,"))
+		# disable:
+		self.setGetTest("perfsample", "0", 0, jail=self.jailName)
+		status = dict(self.transm.proceed(["status", self.jailName, "perf"])[1][0][1])
+		self.assertEqual(status['Perf sample'], "off")
+		self.assertFalse('Failregex #0' in status)
+
 	def testAction(self):
 		action = "TestCaseAction"
 		cmdList = [
@@ -905,6 +964,84 @@ class RegexTests(unittest.TestCase):
 		self.assertTrue(fr.hasMatched())
 		self.assertRaises(RegexException, fr.getHost)
 
+	def testRegexRequiredLiterals(self):
+		regex = FailRegex("^(?:\\[\\])?\\s*Failed (?P<m>\\S+) for (?:invalid user )?.* from <HOST>( port \\d+)+$")
+		self.assertEqual(regex.getLiterals(), ['Failed ', ' from ', ' port ', ' for '])
+		self.assertFalse(regex.prefilter("Failed password for root from"))
+		self.assertTrue(regex.prefilter("Failed password for root from 192.0.2.1 port 22"))
+		# no literals in alternatives or ignore case expressions:
+		self.assertEqual(Regex("^(?:foo|bar) baz").getLiterals(), [' baz'])
+		self.assertEqual(Regex("(?i)^foo bar").getLiterals(), [])
+		self.assertEqual(Regex("^f.o").getLiterals(), [])
+		# rejected lines are not matched:
+		regex.search([("Accepted password for root from 192.0.2.1 port 22",)])
+		self.assertFalse(regex.hasMatched())
+		regex.search([("Failed password for root from 192.0.2.1 port 22",)])
+		self.assertTrue(regex.hasMatched())
+		self.assertEqual(regex.getHost(), "192.0.2.1")
+
+	def testLineBuffer(self):
+		buf = LineBuffer(3)
+		for i in xrange(5):
+			buf.append(("pre%d " % i, "date", " post%d" % i))
+		self.assertEqual(len(buf), 3)
+		self.assertEqual(buf.getText(), "pre2  post2\npre3  post3\npre4  post4\n")
+		self.assertEqual([buf.countLines(p) for p in (0, 11, 12, 35)], [0, 0, 1, 2])
+		# multi-line match maps to lines, skipped lines are unmatched:
+		regex = FailRegex("^pre2 .*$<SKIPLINES>^pre4 .* post4(?: <HOST>)?")
+		regex.search(buf)
+		self.assertTrue(regex.hasMatched())
+		self.assertEqual(regex.getMatchedLines(), ["pre2 date post2", "pre4 date post4"])
+		self.assertEqual(regex.getUnmatchedLines(), ["pre3 date post3"])
+		# the same as by search in the list of lines:
+		regex.search(buf.getLines())
+		self.assertEqual(regex.getMatchedLines(), ["pre2 date post2", "pre4 date post4"])
+		self.assertEqual(regex.getUnmatchedLines(), ["pre3 date post3"])
+		# replace content and shrink:
+		buf.setLines(regex.getUnmatchedTupleLines())
+		self.assertEqual(buf.getText(), "pre3  post3\n")
+		buf.append(("pre5 ", "", ""))
+		buf.setMaxLines(1)
+		self.assertEqual(buf.getText(), "pre5 \n")
+		self.assertEqual(buf.countLines(0), 0)
+
+	def testCombinedRegex(self):
+		regexs = [FailRegex(r) for r in (
+			"^Failed .* from <HOST>$",
+			"^(?P<user>\w+) invalid from <HOST> by (?P=user)$",
+			"(?i)^accepted .* from <HOST>$",
+			"^(\w+) \\1 from <HOST>$",
+		)]
+		combined = CombinedRegex(regexs)
+		# 2 first combined, both last in own chunk (inline flags, numeric ref):
+		self.assertEqual(combined.getChunkCount(), 3)
+		self.assertTrue(combined.search("Failed x from 192.0.2.1\n"))
+		self.assertTrue(combined.search("joe invalid from 192.0.2.1 by joe\n"))
+		self.assertFalse(combined.search("joe invalid from 192.0.2.1 by bob\n"))
+		self.assertTrue(combined.search("ACCEPTED x from 192.0.2.1\n"))
+		self.assertTrue(combined.search("dup dup from 192.0.2.1\n"))
+		self.assertFalse(combined.search("dup dip from 192.0.2.1\n"))
+		self.assertTrue(combined.search(
+			"ACCEPTED x from 192.0.2.1\nFailed x from 192.0.2.2\n"))
+		self.assertFalse(combined.search("Failed x to 192.0.2.1\n"))
+		# many groups - split in several chunks:
+		combined = CombinedRegex([FailRegex("^(a)(b)(c)(d)(e)(f)(g)(h)(i)(j) %d <HOST>$" % i)
+			for i in xrange(20)])
+		self.assertTrue(combined.getChunkCount() > 1)
+		self.assertTrue(combined.search("abcdefghij 17 192.0.2.1\n"))
+		self.assertFalse(combined.search("abcdefghij 20 192.0.2.1\n"))
+		# common prefix ends within different escape sequences:
+		for tails, samples, wrong in (
+			(("\\d", "\\s"), ("1", " "), "a"),
+			(("\\x41", "\\x42"), ("A", "B"), "C"),
+			(("\\061", "\\062"), ("1", "2"), "3"),
+		):
+			combined = CombinedRegex([FailRegex("^x%s from <HOST>$" % t)
+				for t in tails])
+			for c in samples:
+				self.assertTrue(combined.search("x%s from 192.0.2.1\n" % c))
+			self.assertFalse(combined.search("x%s from 192.0.2.1\n" % wrong))
+
 
 class _BadThread(JailThread):
 	def run(self):
@@ -183,6 +183,7 @@ def gatherTests(regexps=None, no_network=False):
 	tests.addTest(unittest.makeSuite(filtertestcase.LogFile))
 	tests.addTest(unittest.makeSuite(filtertestcase.LogFileMonitor))
 	tests.addTest(unittest.makeSuite(filtertestcase.LogFileFilterPoll))
+	tests.addTest(unittest.makeSuite(filtertestcase.MonitorInotifyFailures))
 	if not no_network:
 		tests.addTest(unittest.makeSuite(filtertestcase.IgnoreIPDNS))
 		tests.addTest(unittest.makeSuite(filtertestcase.GetFailures))
@@ -227,6 +228,12 @@ def gatherTests(regexps=None, no_network=False):
 	except Exception as e: # pragma: no cover
 		logSys.warning("Skipping gamin backend testing. Got exception '%s'" % e)
 
+	try:
+		from ..server.filterinotify import FilterInotify
+		filters.append(FilterInotify)
+	except Exception as e: # pragma: no cover
+		logSys.warning("I: Skipping inotify backend testing. Got exception '%s'" % e)
+
 	try:
 		from ..server.filterpyinotify import FilterPyinotify
 		filters.append(FilterPyinotify)